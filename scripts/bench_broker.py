@@ -0,0 +1,78 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+
+from alpaca.trading.enums import OrderSide, TimeInForce
+
+from src.broker import create_broker
+from src.utils.histogram import LatencyHistogram
+
+
+async def run(args: argparse.Namespace, kind: str) -> None:
+    broker = create_broker(kind, "key", "secret", max_per_min=1_000_000, base_url=f"http://127.0.0.1:{args.http_port}", concurrency=args.concurrency)
+    sem = asyncio.Semaphore(args.concurrency)
+    submit = LatencyHistogram()
+    cancel = LatencyHistogram()
+
+    async def one(i: int) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            order = await broker.submit_limit(f"S{i % 50:03d}", 1, OrderSide.BUY, 1.0, TimeInForce.DAY, f"bench:{kind}:{i}")
+            t1 = time.perf_counter()
+            await broker.cancel(str(order.id))
+            submit.record(t1 - t0)
+            cancel.record(time.perf_counter() - t1)
+
+    await asyncio.gather(*(one(-i - 1) for i in range(args.concurrency)))
+    cpu, wall = time.process_time(), time.perf_counter()
+    submit.reset()
+    cancel.reset()
+    await asyncio.gather(*(one(i) for i in range(args.orders)))
+    elapsed = time.perf_counter() - wall
+    cpu_ms = (time.process_time() - cpu) * 1000
+    print(f"{kind:<8} {args.orders * 2 / elapsed:7.0f} req/s  client cpu {cpu_ms / (args.orders * 2):.2f}ms/req")
+    print(f"         submit {submit.snapshot()}")
+    print(f"         cancel {cancel.snapshot()}")
+    if kind == "pooled":
+        stats = broker.stats()
+        print(f"         pool opened={stats['opened']} reused={stats['reused']} retried={stats['retried']} errors={stats['errors']}")
+    await broker.close()
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--orders", type=int, default=1000)
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--ack-ms", type=float, default=5.0, help="stand-in REST latency")
+    p.add_argument("--clients", default="threaded,pooled")
+    p.add_argument("--http-port", type=int, default=8900)
+    p.add_argument("--ws-port", type=int, default=8901)
+    args = p.parse_args()
+    server = subprocess.Popen([
+        sys.executable, "-m", "src.sim_server",
+        "--http-port", str(args.http_port), "--ws-port", str(args.ws_port),
+        "--ack-ms", str(args.ack_ms), "--ack-jitter-ms", "0", "--stats-sec", "3600",
+    ])
+    try:
+        deadline = time.time() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", args.http_port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+        for kind in args.clients.split(","):
+            asyncio.run(run(args, kind))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
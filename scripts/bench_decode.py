@@ -0,0 +1,67 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import time
+
+import msgpack
+import numpy as np
+
+from src.data_stream import MarketDataStream
+
+
+def make_frames(symbols: list[str], messages: int, per_frame: int = 20, seed: int = 3) -> list[bytes]:
+    rng = np.random.default_rng(seed)
+    frames = []
+    base = 1_700_000_000
+    batch = []
+    for i in range(messages):
+        sym = symbols[i % len(symbols)]
+        ts = msgpack.Timestamp(base + i // 1000, (i % 1000) * 1_000_000)
+        if i % 4 == 3:
+            batch.append({"T": "t", "S": sym, "i": i, "x": "V", "p": 100.0 + rng.normal(), "s": 100, "c": ["@"], "z": "C", "t": ts})
+        else:
+            mid = 100.0 + rng.normal()
+            batch.append({"T": "q", "S": sym, "bx": "V", "bp": mid - 0.01, "bs": 3, "ax": "V", "ap": mid + 0.01, "as": 4, "c": ["R"], "z": "C", "t": ts})
+        if len(batch) == per_frame:
+            frames.append(msgpack.packb(batch))
+            batch = []
+    if batch:
+        frames.append(msgpack.packb(batch))
+    return frames
+
+
+async def run(fast: bool, symbols: list[str], frames: list[bytes]) -> float:
+    ds = MarketDataStream("key", "secret", symbols, subscribe_bars=False, fast_decode=fast)
+    # register handlers exactly as start() does, without opening the socket
+    ds._stream.subscribe_quotes(ds._on_quote, *symbols)
+    ds._stream.subscribe_trades(ds._on_trade, *symbols)
+    ds._running = True
+    drain = asyncio.create_task(ds._drain())
+    count = 0
+    start = time.perf_counter()
+    for frame in frames:
+        msgs = msgpack.unpackb(frame)
+        for msg in msgs:
+            await ds._stream._dispatch(msg)
+        count += len(msgs)
+        await asyncio.sleep(0)
+    ds._running = False
+    ds._queue.close()
+    await drain
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--symbols", type=int, default=50)
+    p.add_argument("--messages", type=int, default=200_000)
+    args = p.parse_args()
+    symbols = [f"S{i}" for i in range(args.symbols)]
+    frames = make_frames(symbols, args.messages)
+    model_rate = asyncio.run(run(False, symbols, frames))
+    raw_rate = asyncio.run(run(True, symbols, frames))
+    print(f"model path {model_rate:,.0f} msg/s  raw path {raw_rate:,.0f} msg/s  speedup {raw_rate / model_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
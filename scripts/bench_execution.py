@@ -0,0 +1,87 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+
+from alpaca.trading.enums import OrderSide, TimeInForce
+
+from src.broker import Broker
+from src.execution import ExecutionEngine, OrderIntent
+from src.utils.histogram import LatencyHistogram
+
+MM_SYMBOLS = ["SPY", "QQQ", "AAPL", "MSFT", "NVDA", "AMZN", "META"]
+
+
+def intents_for(rnd: int) -> list:
+    # 14 market-maker quotes re-priced every round plus both legs of one pair entry
+    out = []
+    for k, sym in enumerate(MM_SYMBOLS):
+        mid = 100.0 + 10 * k + (rnd % 7) * 0.01
+        out.append(OrderIntent(sym, OrderSide.BUY, 1, round(mid - 0.05, 2), TimeInForce.DAY, "mm", f"{sym}-bid"))
+        out.append(OrderIntent(sym, OrderSide.SELL, 1, round(mid + 0.05, 2), TimeInForce.DAY, "mm", f"{sym}-ask"))
+    out.append(OrderIntent("KO", OrderSide.BUY, 1, 50.0, TimeInForce.DAY, "pairs", f"KO-PEP-long-{rnd}"))
+    out.append(OrderIntent("PEP", OrderSide.SELL, 1, 250.0, TimeInForce.DAY, "pairs", f"KO-PEP-long2-{rnd}"))
+    return out
+
+
+async def run(args: argparse.Namespace, concurrency: int) -> None:
+    broker = Broker("key", "secret", max_per_min=1_000_000, base_url=f"http://127.0.0.1:{args.http_port}", workers=concurrency)
+    engine = ExecutionEngine(broker, max_open_orders=100, max_concurrency=concurrency)
+    returned = {}
+    submit_limit = broker.submit_limit
+
+    async def timed_submit(symbol, qty, side, limit_price, tif, client_order_id):
+        order = await submit_limit(symbol, qty, side, limit_price, tif, client_order_id)
+        returned[symbol] = time.perf_counter()
+        return order
+
+    broker.submit_limit = timed_submit
+    await engine.sync(intents_for(0))
+    sync_hist = LatencyHistogram()
+    skew_hist = LatencyHistogram()
+    for rnd in range(1, args.rounds + 1):
+        t0 = time.perf_counter()
+        await engine.sync(intents_for(rnd))
+        sync_hist.record(time.perf_counter() - t0)
+        skew_hist.record(abs(returned["KO"] - returned["PEP"]))
+    await engine.sync([])
+    print(f"concurrency={concurrency:<2} sync {sync_hist.snapshot()}")
+    print(f"               pair leg skew {skew_hist.snapshot()}")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rounds", type=int, default=30)
+    p.add_argument("--ack-ms", type=float, default=20.0, help="stand-in REST latency")
+    p.add_argument("--concurrency", default="1,8")
+    p.add_argument("--http-port", type=int, default=8900)
+    p.add_argument("--ws-port", type=int, default=8901)
+    args = p.parse_args()
+    server = subprocess.Popen([
+        sys.executable, "-m", "src.sim_server",
+        "--http-port", str(args.http_port), "--ws-port", str(args.ws_port),
+        "--ack-ms", str(args.ack_ms), "--stats-sec", "3600",
+    ])
+    try:
+        deadline = time.time() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", args.http_port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+        print(f"{len(intents_for(0))} intents per sync: 14 re-priced quotes (replace), 2 new pair legs, 2 stale pair legs (cancel)")
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            asyncio.run(run(args, concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
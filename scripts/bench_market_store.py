@@ -0,0 +1,60 @@
+from __future__ import annotations
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.data_stream import SymbolState
+from src.market_store import ColumnarMarketState
+
+
+def fill(states: dict, quotes: int, seed: int = 11) -> None:
+    rng = np.random.default_rng(seed)
+    mids = 100.0 + np.cumsum(rng.normal(0, 0.01, size=(quotes, len(states))), axis=0)
+    for row in mids:
+        for st, mid in zip(states.values(), row):
+            st.update_quote(mid - 0.01, mid + 0.01, 100.0, 100.0, 0.0)
+
+
+def measure(build, symbols: list[str], quotes: int):
+    tracemalloc.start()
+    holder = build(symbols)
+    states = holder if isinstance(holder, dict) else holder.views()
+    fill(states, quotes)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return holder, states, used / len(symbols)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--symbols", type=int, default=1000)
+    p.add_argument("--quotes", type=int, default=650)
+    # share of the universe some strategy trades; the rest keep the short history
+    p.add_argument("--traded", type=float, default=0.05)
+    args = p.parse_args()
+    symbols = [f"S{i}" for i in range(args.symbols)]
+    traded = symbols[:int(len(symbols) * args.traded)]
+
+    _, states, obj_bytes = measure(lambda syms: {s: SymbolState(symbol=s) for s in syms}, symbols, args.quotes)
+    store, _, col_bytes = measure(ColumnarMarketState, symbols, args.quotes)
+    _, _, short_bytes = measure(lambda syms: ColumnarMarketState(syms, history_symbols=()), symbols, args.quotes)
+    _, _, mixed_bytes = measure(lambda syms: ColumnarMarketState(syms, history_symbols=traded), symbols, args.quotes)
+    print(f"bytes/symbol  dataclass={obj_bytes:,.0f}")
+    print(f"  columnar, all traded={col_bytes:,.0f}  ratio={obj_bytes / col_bytes:.1f}x")
+    print(f"  columnar, none traded={short_bytes:,.0f}  ratio={obj_bytes / short_bytes:.1f}x")
+    print(f"  columnar, {len(traded)} traded={mixed_bytes:,.0f}  ratio={obj_bytes / mixed_bytes:.1f}x")
+
+    start = time.perf_counter()
+    per_symbol = [st.mid_returns_std() for st in states.values()]
+    loop_sec = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = store.ret_hist.stds()
+    vec_sec = time.perf_counter() - start
+    assert np.allclose(per_symbol, vectorized, rtol=1e-3)
+    print(f"universe return std  per-symbol={loop_sec * 1e3:.3f}ms  vectorized={vec_sec * 1e3:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
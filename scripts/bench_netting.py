@@ -0,0 +1,80 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from alpaca.trading.enums import OrderSide, TimeInForce
+
+from src.data_stream import SymbolState
+from src.execution import ExecutionEngine, OrderIntent
+from src.netting import IntentNetter
+from src.replay import SimBroker
+
+SYMBOLS = ["SPY", "QQQ", "AAPL", "MSFT", "NVDA", "AMZN", "META", "KO", "PEP", "XOM"]
+STRATEGIES = ["pairs", "leadlag", "ml", "news"]
+
+
+def intents_for(rng: random.Random, rnd: int, states: dict, signal_prob: float) -> list:
+    # passive mm quotes on every symbol, plus marketable entries/exits from the
+    # directional strategies, each firing on a random symbol and side
+    out = []
+    for sym in SYMBOLS:
+        mid = states[sym].mid
+        out.append(OrderIntent(sym, OrderSide.BUY, 1, round(mid - 0.05, 2), TimeInForce.DAY, "mm", f"{sym}-bid"))
+        out.append(OrderIntent(sym, OrderSide.SELL, 1, round(mid + 0.05, 2), TimeInForce.DAY, "mm", f"{sym}-ask"))
+    for strat in STRATEGIES:
+        if rng.random() >= signal_prob:
+            continue
+        sym = rng.choice(SYMBOLS)
+        mid = states[sym].mid
+        if rng.random() < 0.5:
+            out.append(OrderIntent(sym, OrderSide.BUY, rng.randint(1, 20), round(mid * 1.001, 2), TimeInForce.DAY, strat, f"{sym}-long-{rnd}"))
+        else:
+            out.append(OrderIntent(sym, OrderSide.SELL, rng.randint(1, 20), round(mid * 0.999, 2), TimeInForce.DAY, strat, f"{sym}-short-{rnd}"))
+    return out
+
+
+async def run(args: argparse.Namespace, net: bool) -> None:
+    rng = random.Random(args.seed)
+    states = {sym: SymbolState(sym) for sym in SYMBOLS}
+    data = SimpleNamespace(states=states)
+    broker = SimBroker(states)
+    # a wide replace band keeps the mm quotes resting, so the counts are mostly directional flow
+    engine = ExecutionEngine(broker, max_open_orders=200, max_concurrency=1, replace_tolerance_ticks=50)
+    netter = IntentNetter(orders=engine.orders) if net else None
+    net_us = 0.0
+    for rnd in range(args.rounds):
+        for k, sym in enumerate(SYMBOLS):
+            mid = (100.0 + 10 * k) * (1 + rng.gauss(0, 1e-4))
+            states[sym].update_quote(round(mid - 0.01, 2), round(mid + 0.01, 2), 5, 5, float(rnd))
+            broker.on_quote(sym)
+        intents = intents_for(rng, rnd, states, args.signal_prob)
+        if netter:
+            t0 = time.perf_counter()
+            intents = netter.net(intents, data)
+            net_us += (time.perf_counter() - t0) * 1e6
+        await engine.sync(intents)
+        updates, broker.updates = broker.updates, []
+        for update in updates:
+            await engine.on_trade_update(update)
+    line = f"netting={'on ' if net else 'off'} requests={broker.requests} orders={broker.submitted} fills={broker.filled}"
+    if netter:
+        line += f" net_us_per_tick={net_us / args.rounds:.1f} {netter.stats()}"
+    print(line)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rounds", type=int, default=5000)
+    p.add_argument("--signal-prob", type=float, default=0.3, help="chance a directional strategy fires per tick")
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args()
+    print(f"{len(SYMBOLS)} symbols, mm quotes plus {len(STRATEGIES)} directional strategies, {args.rounds} ticks")
+    for net in (False, True):
+        asyncio.run(run(args, net))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from alpaca.trading.enums import OrderSide, TimeInForce
+
+from src.data_stream import SymbolState
+from src.execution import OrderIntent, intent_client_id
+from src.orders import LIVE, ManagedOrder, OrderTracker
+from src.risk import PositionState, RiskManager
+from src.pretrade import PreTradeRisk
+
+STRATEGIES = ["mm", "pairs", "leadlag", "etf", "news", "ml"]
+
+
+def setup(args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    symbols = [f"S{i}" for i in range(args.symbols)]
+    states = {}
+    for sym in symbols:
+        st = states[sym] = SymbolState(sym)
+        mid = rng.uniform(10, 200)
+        st.update_quote(round(mid - 0.01, 2), round(mid + 0.01, 2), 5, 5, 0.0)
+    positions = {}
+    for sym in rng.sample(symbols, len(symbols) // 4):
+        positions[sym] = PositionState(sym, rng.choice([-3, -2, -1, 1, 2, 3]), states[sym].mid)
+    # the batch comes from the directional strategies
+    intents = [
+        OrderIntent(rng.choice(symbols), rng.choice([OrderSide.BUY, OrderSide.SELL]), rng.randint(1, 6), 1.0, TimeInForce.DAY, rng.choice(STRATEGIES[1:]), f"i{k}")
+        for k in range(args.intents)
+    ]
+    # half the working orders belong to intents the batch re-sends, half are mm's resting quotes
+    working = []
+    for k in range(args.working):
+        if k % 2:
+            intent = rng.choice(intents)
+            working.append((intent_client_id(intent), intent.strategy, intent.symbol, intent.side.value, rng.randint(1, 3)))
+        else:
+            sym, side = rng.choice(symbols), rng.choice(["buy", "sell"])
+            working.append((f"mm:{sym}-{k}:{sym}:{side}", "mm", sym, side, rng.randint(1, 3)))
+    return states, positions, working, intents
+
+
+def timed(fn, rounds: int) -> np.ndarray:
+    out = np.empty(rounds)
+    for k in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        out[k] = (time.perf_counter() - t0) * 1e6
+    return out
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--intents", type=int, default=200)
+    p.add_argument("--symbols", type=int, default=100)
+    p.add_argument("--working", type=int, default=50, help="working orders across all strategies")
+    p.add_argument("--rounds", type=int, default=5000)
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args()
+    states, positions, working, intents = setup(args)
+    data = SimpleNamespace(states=states)
+    limits = (25000.0, 10000.0, 2000.0, 5000.0)
+
+    legacy = RiskManager(*limits, daily_loss_limit=250.0)
+    print(f"{args.intents} intents, {args.symbols} symbols, {len(positions)} positions, {args.working} working orders")
+    accepted = len(legacy.check(intents, positions, data))
+    lat = timed(lambda: legacy.check(intents, positions, data), args.rounds)
+    print(f"per-intent (positions only):   min={lat.min():.1f}us mean={lat.mean():.1f}us p50={np.percentile(lat, 50):.1f}us p99={np.percentile(lat, 99):.1f}us accepted={accepted}")
+    # binding limits take the sequential path; with 4x the limits the batch clears on the end state
+    for label, scale, cancel_stale in (("timer sync", 1.0, True), ("event-driven", 1.0, False), ("within limits", 4.0, True)):
+        tracker = OrderTracker()
+        pretrade = PreTradeRisk(*(limit * scale for limit in limits), states=states, orders=tracker)
+        tracker.listener = pretrade.on_order
+        for sym, pos in positions.items():
+            pretrade.on_position(sym, pos.qty)
+        for key, strategy, sym, side, qty in working:
+            order = ManagedOrder(key, key, sym, side, float(qty), 1.0, strategy, state=LIVE)
+            tracker.add(order)
+        ok, rejected = pretrade.check(intents, cancel_stale)
+        lat = timed(lambda: pretrade.check(intents, cancel_stale), args.rounds)
+        reasons = {}
+        for _, reason in rejected:
+            reasons[reason] = reasons.get(reason, 0) + 1
+        print(f"batch, {label + ':':15s}  min={lat.min():.1f}us mean={lat.mean():.1f}us p50={np.percentile(lat, 50):.1f}us p99={np.percentile(lat, 99):.1f}us accepted={len(ok)} rejected={reasons}")
+
+
+if __name__ == "__main__":
+    main()
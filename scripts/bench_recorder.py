@@ -0,0 +1,41 @@
+from __future__ import annotations
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.recorder import TickRecorder, open_ticks
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--symbols", type=int, default=50)
+    p.add_argument("--quotes", type=int, default=2_000_000)
+    args = p.parse_args()
+    symbols = [f"S{i}" for i in range(args.symbols)]
+    rng = np.random.default_rng(5)
+    mids = (100.0 + rng.normal(0, 1, size=args.quotes)).tolist()
+    with tempfile.TemporaryDirectory() as root:
+        rec = TickRecorder(root, symbols)
+        rec.start()
+        quote = rec.quote
+        start = time.perf_counter()
+        for i, mid in enumerate(mids):
+            quote(symbols[i % args.symbols], mid - 0.01, mid + 0.01, 3.0, 4.0, float(i), float(i))
+        hot = time.perf_counter() - start
+        rec.close()
+        path = glob.glob(os.path.join(root, "*", "quotes.bin"))[0]
+        start = time.perf_counter()
+        feed, syms, recs = open_ticks(path)
+        spy = recs[recs["sym"] == 0]
+        load = time.perf_counter() - start
+        size_mb = os.path.getsize(path) / 1e6
+    assert len(recs) == args.quotes and syms == symbols
+    print(f"hot path {hot / args.quotes * 1e9:.0f} ns/quote  file {size_mb:.1f}MB  memmap+filter {load * 1e3:.1f}ms ({len(spy)} rows for {syms[0]})")
+
+
+if __name__ == "__main__":
+    main()
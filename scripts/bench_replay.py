@@ -0,0 +1,87 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import tempfile
+
+import numpy as np
+
+from src.config import AppConfig, StrategyToggles
+from src.main import build_strategies
+from src.metrics import Metrics
+from src.recorder import QUOTE_DTYPE, TRADE_DTYPE, encode_header
+from src.replay import ReplayEngine
+from src.risk import RiskManager
+
+SYMBOLS = ["SPY", "QQQ", "AAPL", "MSFT", "NVDA", "AMZN", "META", "KO", "PEP", "XOM", "CVX", "IVV"]
+
+
+def synth_day(day_dir: str, symbols: list[str], seconds: int, quotes_per_sec: float, seed: int = 17) -> int:
+    # Correlated random-walk quotes (plus one trade per ten quotes) written in the recorder's file format.
+    rng = np.random.default_rng(seed)
+    n = int(seconds * quotes_per_sec * len(symbols))
+    start = 1_700_000_000.0 + 14.5 * 3600
+    recv = np.sort(start + rng.uniform(0, seconds, n))
+    sym = rng.integers(0, len(symbols), n).astype(np.uint32)
+    market = np.cumsum(rng.normal(0, 2e-5, n))
+    idio = np.zeros(n)
+    for i in range(len(symbols)):
+        mask = sym == i
+        idio[mask] = np.cumsum(rng.normal(0, 3e-5, int(mask.sum())))
+    mid = 100.0 * (1 + 0.05 * sym) * np.exp(market + idio)
+    quotes = np.zeros(n, dtype=QUOTE_DTYPE)
+    quotes["sym"] = sym
+    quotes["ts"] = recv - 0.002
+    quotes["recv_ts"] = recv
+    quotes["bid"] = np.round(mid - 0.01, 2)
+    quotes["ask"] = np.round(mid + 0.01, 2)
+    quotes["bid_size"] = rng.integers(1, 10, n)
+    quotes["ask_size"] = rng.integers(1, 10, n)
+    trades = np.zeros(n // 10, dtype=TRADE_DTYPE)
+    pick = np.sort(rng.choice(n, n // 10, replace=False))
+    trades["sym"] = sym[pick]
+    trades["ts"] = quotes["ts"][pick]
+    trades["recv_ts"] = recv[pick] + 1e-4
+    trades["price"] = np.where(rng.random(len(pick)) > 0.5, quotes["ask"][pick], quotes["bid"][pick])
+    trades["size"] = rng.integers(1, 500, len(pick))
+    os.makedirs(day_dir, exist_ok=True)
+    for feed, recs in (("quotes", quotes), ("trades", trades)):
+        with open(os.path.join(day_dir, f"{feed}.bin"), "wb") as f:
+            f.write(encode_header(feed, symbols))
+            f.write(recs.tobytes())
+    return n + len(trades)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--seconds", type=int, default=23400)
+    p.add_argument("--quotes-per-sec", type=float, default=1.0, help="per symbol")
+    p.add_argument("--extra-symbols", type=int, default=38)
+    p.add_argument("--strategies", default="pairs,mm,leadlag,etf")
+    p.add_argument("--replace-tolerance-ticks", type=float, default=0.0)
+    p.add_argument("--replace-tolerance-bps", type=float, default=0.0)
+    p.add_argument("--net-intents", action="store_true", help="cross opposite intents from different strategies internally")
+    args = p.parse_args()
+    symbols = SYMBOLS + [f"X{i}" for i in range(args.extra_symbols)]
+    cfg = AppConfig(
+        api_key_id="",
+        api_secret_key="",
+        symbols=SYMBOLS[:7],
+        pairs=["KO/PEP", "XOM/CVX"],
+        lead_lag_symbols=["AAPL", "MSFT", "NVDA", "AMZN"],
+        etf_pairs=["SPY/IVV"],
+        strategies=StrategyToggles(**{name: True for name in args.strategies.split(",") if name}),
+    )
+    with tempfile.TemporaryDirectory() as root:
+        day_dir = os.path.join(root, "20240101")
+        total = synth_day(day_dir, symbols, args.seconds, args.quotes_per_sec)
+        risk = RiskManager(cfg.risk.max_gross_exposure_usd, cfg.risk.max_net_exposure_usd, cfg.risk.max_order_notional_usd, cfg.risk.max_position_notional_usd, cfg.risk.daily_loss_limit_usd)
+        engine = ReplayEngine(lambda: build_strategies(cfg), risk, Metrics(os.path.join(root, "logs")), day_dir, replace_tolerance_bps=args.replace_tolerance_bps, replace_tolerance_ticks=args.replace_tolerance_ticks, net_intents=args.net_intents)
+        summary = asyncio.run(engine.run())
+    print(f"synthesised {total:,} events for {len(symbols)} symbols")
+    for key, value in summary.items():
+        print(f"{key}={value}")
+
+
+if __name__ == "__main__":
+    main()
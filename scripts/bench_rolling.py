@@ -0,0 +1,83 @@
+from __future__ import annotations
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+
+from src.data_stream import SymbolState
+from src.utils.rolling import RollingWindow
+
+
+class DequeWindow:
+    # The previous deque-backed RollingWindow, kept here as the baseline.
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._data = deque(maxlen=maxlen)
+
+    def add(self, x: float) -> None:
+        self._data.append(x)
+
+    def values(self) -> np.ndarray:
+        if not self._data:
+            return np.array([], dtype=float)
+        return np.fromiter(self._data, dtype=float)
+
+    def mean(self) -> float:
+        if not self._data:
+            return 0.0
+        return float(np.mean(self.values()))
+
+    def std(self) -> float:
+        if len(self._data) < 2:
+            return 0.0
+        return float(np.std(self.values(), ddof=1))
+
+    def last(self) -> float:
+        return self._data[-1] if self._data else 0.0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def make_states(symbols: int, window_cls) -> list[SymbolState]:
+    return [
+        SymbolState(
+            symbol=f"S{i}",
+            mid_window=window_cls(600),
+            ret_window=window_cls(600),
+            spread_window=window_cls(600),
+        )
+        for i in range(symbols)
+    ]
+
+
+def run(states: list[SymbolState], quotes: int, seed: int = 7) -> float:
+    rng = np.random.default_rng(seed)
+    mids = 100.0 + np.cumsum(rng.normal(0, 0.01, size=(quotes, len(states))), axis=0)
+    start = time.perf_counter()
+    for row in mids:
+        for st, mid in zip(states, row):
+            st.update_quote(mid - 0.01, mid + 0.01, 100.0, 100.0, 0.0)
+            # what a strategy typically reads per symbol per tick
+            st.mid_returns_std()
+            st.mid_window.mean()
+            st.mid_window.values()
+    elapsed = time.perf_counter() - start
+    return elapsed / (quotes * len(states))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--symbols", type=int, nargs="+", default=[10, 50, 200])
+    p.add_argument("--quotes", type=int, default=2000)
+    args = p.parse_args()
+    print(f"{'symbols':>8} {'deque us/quote':>15} {'ring us/quote':>14} {'speedup':>8}")
+    for n in args.symbols:
+        old = run(make_states(n, DequeWindow), args.quotes)
+        new = run(make_states(n, RollingWindow), args.quotes)
+        print(f"{n:>8} {old * 1e6:>15.2f} {new * 1e6:>14.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+
+from alpaca.trading.enums import OrderSide, TimeInForce
+
+from src.broker import Broker
+from src.data_stream import MarketDataStream
+from src.trade_stream import TradeStream
+from src.utils.histogram import LatencyHistogram
+
+
+async def run(args: argparse.Namespace) -> None:
+    base = f"127.0.0.1:{args.http_port}"
+    ws = f"127.0.0.1:{args.ws_port}"
+    symbols = [f"S{i:04d}" for i in range(args.symbols)]
+    data = MarketDataStream("key", "secret", symbols, subscribe_bars=False, subscribe_trades=True, fast_decode=args.fast_decode, url=f"ws://{ws}/v2/iex")
+    trades = TradeStream("key", "secret", url=f"ws://{ws}/stream")
+    broker = Broker("key", "secret", max_per_min=1_000_000, base_url=f"http://{base}")
+    ack = LatencyHistogram()
+    fill = LatencyHistogram()
+    sent = {}
+
+    async def on_update(update: dict) -> None:
+        if update.get("event") == "fill":
+            t0 = sent.pop(update["order"]["client_order_id"], None)
+            if t0 is not None:
+                fill.record(time.perf_counter() - t0)
+
+    trades.add_handler(on_update)
+    await data.start()
+    await trades.start()
+    await asyncio.sleep(2.0)
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int) -> None:
+        sym = symbols[i % len(symbols)]
+        st = data.states[sym]
+        client_id = f"bench:{i}:{sym}:buy"
+        async with sem:
+            t0 = time.perf_counter()
+            sent[client_id] = t0
+            await broker.submit_limit(sym, 1, OrderSide.BUY, round(st.ask * 1.01, 2) if st.ask > 0 else 1e6, TimeInForce.DAY, client_id)
+            ack.record(time.perf_counter() - t0)
+
+    received = data.ingest_stats()["received"]
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.orders)))
+    remaining = args.seconds - (time.perf_counter() - wall)
+    if remaining > 0:
+        await asyncio.sleep(remaining)
+    elapsed = time.perf_counter() - wall
+    msgs = data.ingest_stats()["received"] - received
+    cpu_pct = (time.process_time() - cpu) / elapsed * 100
+    await trades.stop()
+    await data.stop()
+    print(f"symbols={len(symbols)} market data {msgs / elapsed:,.0f} msgs/sec  client cpu {cpu_pct:.0f}%")
+    print(f"order ack  {ack.snapshot()}")
+    print(f"order fill {fill.snapshot()}")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--symbols", type=int, default=500)
+    p.add_argument("--quote-rate", type=float, default=5.0)
+    p.add_argument("--orders", type=int, default=500)
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--seconds", type=float, default=10.0)
+    p.add_argument("--ack-ms", type=float, default=5.0)
+    p.add_argument("--fast-decode", action="store_true")
+    p.add_argument("--http-port", type=int, default=8900)
+    p.add_argument("--ws-port", type=int, default=8901)
+    args = p.parse_args()
+    server = subprocess.Popen([
+        sys.executable, "-m", "src.sim_server",
+        "--http-port", str(args.http_port), "--ws-port", str(args.ws_port),
+        "--quote-rate", str(args.quote_rate), "--ack-ms", str(args.ack_ms), "--stats-sec", "3600",
+    ])
+    try:
+        deadline = time.time() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", args.ws_port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
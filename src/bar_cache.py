@@ -0,0 +1,108 @@
+from __future__ import annotations
+import asyncio
+import datetime as dt
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .utils.rate_limit import TokenBucket
+from .utils.time import EASTERN
+
+COLUMNS = ("ts", "open", "high", "low", "close", "volume", "trade_count", "vwap")
+
+
+def trading_days(start: dt.date, end: dt.date) -> List[dt.date]:
+    days = []
+    d = start
+    while d <= end:
+        if d.weekday() < 5:
+            days.append(d)
+        d += dt.timedelta(days=1)
+    return days
+
+
+def _empty() -> Dict[str, np.ndarray]:
+    return {c: np.zeros(0, dtype=np.float64) for c in COLUMNS}
+
+
+class BarCache:
+    # Minute bars on disk as <root>/<SYMBOL>/<YYYY-MM-DD>.npz, one file per
+    # symbol and Eastern trading day. Days with no bars are stored as empty files
+    # so they are not fetched again; the current day is never cached.
+    def __init__(self, root: str, client=None, max_per_min: int = 180, concurrency: int = 4, chunk_days: int = 5):
+        self.root = root
+        self.client = client
+        self.concurrency = concurrency
+        self.chunk_days = chunk_days
+        self._bucket = TokenBucket(rate_per_sec=max_per_min / 60.0, capacity=max(1, concurrency))
+        self.requests = 0
+
+    def path(self, symbol: str, day: dt.date) -> str:
+        return os.path.join(self.root, symbol.upper(), f"{day.isoformat()}.npz")
+
+    def missing_days(self, symbol: str, days: Iterable[dt.date]) -> List[dt.date]:
+        return [d for d in days if not os.path.exists(self.path(symbol, d))]
+
+    async def fill(self, symbols: List[str], start: dt.date, end: dt.date) -> int:
+        # Downloads only the days not already on disk; each day is written
+        # atomically as soon as its chunk returns, so an interrupted fill resumes.
+        today = dt.datetime.now(EASTERN).date()
+        days = [d for d in trading_days(start, end) if d < today]
+        jobs: List[Tuple[str, List[dt.date]]] = []
+        for sym in symbols:
+            missing = self.missing_days(sym, days)
+            for i in range(0, len(missing), self.chunk_days):
+                jobs.append((sym, missing[i:i + self.chunk_days]))
+        if not jobs:
+            return 0
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def run(sym: str, chunk: List[dt.date]) -> None:
+            async with sem:
+                await self._bucket.acquire()
+                bars = await asyncio.to_thread(self._fetch, sym, chunk[0], chunk[-1])
+                self._store(sym, chunk, bars)
+
+        results = await asyncio.gather(*(run(sym, chunk) for sym, chunk in jobs), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            raise errors[0]
+        return len(jobs)
+
+    def _fetch(self, symbol: str, first: dt.date, last: dt.date) -> list:
+        from alpaca.data.requests import StockBarsRequest
+        from alpaca.data.timeframe import TimeFrame
+
+        start = dt.datetime.combine(first, dt.time(0, 0), tzinfo=EASTERN)
+        end = dt.datetime.combine(last + dt.timedelta(days=1), dt.time(0, 0), tzinfo=EASTERN)
+        req = StockBarsRequest(symbol_or_symbols=[symbol], timeframe=TimeFrame.Minute, start=start, end=end)
+        self.requests += 1
+        return self.client.get_stock_bars(req).data.get(symbol, [])
+
+    def _store(self, symbol: str, days: List[dt.date], bars: list) -> None:
+        by_day: Dict[dt.date, list] = {d: [] for d in days}
+        for b in bars:
+            day = b.timestamp.astimezone(EASTERN).date()
+            if day in by_day:
+                by_day[day].append((b.timestamp.timestamp(), b.open, b.high, b.low, b.close, b.volume, b.trade_count or 0.0, b.vwap or 0.0))
+        os.makedirs(os.path.join(self.root, symbol.upper()), exist_ok=True)
+        for day, rows in by_day.items():
+            arr = np.array(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+            path = self.path(symbol, day)
+            tmp = path + ".tmp.npz"
+            np.savez(tmp, **{c: arr[:, i] for i, c in enumerate(COLUMNS)})
+            os.replace(tmp, path)
+
+    def load(self, symbol: str, start: dt.date, end: dt.date) -> Dict[str, np.ndarray]:
+        parts: List[Dict[str, np.ndarray]] = []
+        for day in trading_days(start, end):
+            path = self.path(symbol, day)
+            if not os.path.exists(path):
+                continue
+            with np.load(path) as z:
+                if len(z["ts"]):
+                    parts.append({c: z[c] for c in COLUMNS})
+        if not parts:
+            return _empty()
+        return {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
@@ -1,51 +1,130 @@
 from __future__ import annotations
 import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 
+from alpaca.common.exceptions import APIError
 from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest, LimitOrderRequest, ReplaceOrderRequest
-from alpaca.trading.enums import OrderSide, TimeInForce
+from alpaca.trading.models import Order, Position, TradeAccount
+from alpaca.trading.requests import GetOrdersRequest, MarketOrderRequest, LimitOrderRequest, ReplaceOrderRequest
+from alpaca.trading.enums import OrderSide, QueryOrderStatus, TimeInForce
 
-from .utils.rate_limit import TokenBucket
+from .utils.http_pool import HttpPool
+from .utils.rate_limit import Priority, TokenBucket
+
+PAPER_URL = "https://paper-api.alpaca.markets"
 
 
 class Broker:
-    def __init__(self, api_key: str, api_secret: str, max_per_min: int = 60):
-        self.client = TradingClient(api_key, api_secret, paper=True)
+    def __init__(self, api_key: str, api_secret: str, max_per_min: int = 60, base_url: Optional[str] = None, workers: int = 8):
+        self.client = TradingClient(api_key, api_secret, paper=True, url_override=base_url or None)
         rate_per_sec = max_per_min / 60.0
         self._bucket = TokenBucket(rate_per_sec=rate_per_sec, capacity=max_per_min)
+        # own pool so concurrent order calls are not capped by the default executor
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="broker")
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
 
-    async def submit_limit(self, symbol: str, qty: float, side: OrderSide, limit_price: float, tif: TimeInForce, client_order_id: str):
-        await self._bucket.acquire()
+    async def submit_limit(self, symbol: str, qty: float, side: OrderSide, limit_price: float, tif: TimeInForce, client_order_id: str, priority: Priority = Priority.NEW):
+        await self._bucket.acquire(priority=priority)
         req = LimitOrderRequest(symbol=symbol, qty=qty, side=side, limit_price=limit_price, time_in_force=tif, client_order_id=client_order_id)
-        return await asyncio.to_thread(self.client.submit_order, req)
+        return await self._call(self.client.submit_order, req)
 
-    async def submit_market(self, symbol: str, qty: float, side: OrderSide, tif: TimeInForce, client_order_id: str):
-        await self._bucket.acquire()
+    async def submit_market(self, symbol: str, qty: float, side: OrderSide, tif: TimeInForce, client_order_id: str, priority: Priority = Priority.NEW):
+        await self._bucket.acquire(priority=priority)
         req = MarketOrderRequest(symbol=symbol, qty=qty, side=side, time_in_force=tif, client_order_id=client_order_id)
-        return await asyncio.to_thread(self.client.submit_order, req)
+        return await self._call(self.client.submit_order, req)
 
     async def cancel(self, order_id: str) -> None:
-        await self._bucket.acquire()
-        await asyncio.to_thread(self.client.cancel_order_by_id, order_id)
+        await self._bucket.acquire(priority=Priority.URGENT)
+        await self._call(self.client.cancel_order_by_id, order_id)
 
-    async def replace(self, order_id: str, limit_price: Optional[float] = None, qty: Optional[float] = None):
-        await self._bucket.acquire()
-        req = ReplaceOrderRequest(limit_price=limit_price, qty=qty)
-        return await asyncio.to_thread(self.client.replace_order_by_id, order_id, req)
+    async def replace(self, order_id: str, limit_price: Optional[float] = None, qty: Optional[float] = None, client_order_id: Optional[str] = None):
+        await self._bucket.acquire(priority=Priority.REPLACE)
+        req = ReplaceOrderRequest(limit_price=limit_price, qty=qty, client_order_id=client_order_id)
+        return await self._call(self.client.replace_order_by_id, order_id, req)
 
     async def cancel_all(self) -> None:
-        await self._bucket.acquire()
-        await asyncio.to_thread(self.client.cancel_orders)
+        await self._bucket.acquire(priority=Priority.URGENT)
+        await self._call(self.client.cancel_orders)
 
     async def list_positions(self):
-        await self._bucket.acquire()
-        return await asyncio.to_thread(self.client.get_all_positions)
+        await self._bucket.acquire(priority=Priority.POLL)
+        return await self._call(self.client.get_all_positions)
 
     async def get_account(self):
-        await self._bucket.acquire()
-        return await asyncio.to_thread(self.client.get_account)
+        await self._bucket.acquire(priority=Priority.POLL)
+        return await self._call(self.client.get_account)
 
     async def list_orders(self, status: str = "open"):
-        await self._bucket.acquire()
-        return await asyncio.to_thread(self.client.get_orders, status=status)
+        await self._bucket.acquire(priority=Priority.POLL)
+        req = GetOrdersRequest(status=QueryOrderStatus(status), limit=500)
+        return await self._call(self.client.get_orders, filter=req)
+
+    async def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {"client": "threaded", "workers": self.workers, "rate_limit": self._bucket.stats()}
+
+
+class PooledBroker:
+    # Broker with the same methods and return models, talking to the REST API
+    # over an asyncio keep-alive connection pool instead of running the
+    # blocking TradingClient in threads.
+    def __init__(self, api_key: str, api_secret: str, max_per_min: int = 60, base_url: Optional[str] = None, max_connections: int = 8, timeout: float = 10.0, retries: int = 2):
+        headers = {"APCA-API-KEY-ID": api_key, "APCA-API-SECRET-KEY": api_secret, "User-Agent": "alpaca-hft-paper"}
+        self.http = HttpPool((base_url or PAPER_URL).rstrip("/") + "/v2", headers=headers, max_connections=max_connections, timeout=timeout, retries=retries)
+        rate_per_sec = max_per_min / 60.0
+        self._bucket = TokenBucket(rate_per_sec=rate_per_sec, capacity=max_per_min)
+
+    async def _request(self, method: str, path: str, priority: Priority, params: Optional[dict] = None, body: Optional[dict] = None):
+        await self._bucket.acquire(priority=priority)
+        status, data = await self.http.request(method, path, params, body)
+        if status >= 400:
+            raise APIError(data.decode("utf-8", "replace"))
+        return json.loads(data) if data else None
+
+    async def submit_limit(self, symbol: str, qty: float, side: OrderSide, limit_price: float, tif: TimeInForce, client_order_id: str, priority: Priority = Priority.NEW) -> Order:
+        req = LimitOrderRequest(symbol=symbol, qty=qty, side=side, limit_price=limit_price, time_in_force=tif, client_order_id=client_order_id)
+        return Order(**await self._request("POST", "/orders", priority, body=req.to_request_fields()))
+
+    async def submit_market(self, symbol: str, qty: float, side: OrderSide, tif: TimeInForce, client_order_id: str, priority: Priority = Priority.NEW) -> Order:
+        req = MarketOrderRequest(symbol=symbol, qty=qty, side=side, time_in_force=tif, client_order_id=client_order_id)
+        return Order(**await self._request("POST", "/orders", priority, body=req.to_request_fields()))
+
+    async def cancel(self, order_id: str) -> None:
+        await self._request("DELETE", f"/orders/{order_id}", Priority.URGENT)
+
+    async def replace(self, order_id: str, limit_price: Optional[float] = None, qty: Optional[float] = None, client_order_id: Optional[str] = None) -> Order:
+        req = ReplaceOrderRequest(limit_price=limit_price, qty=qty, client_order_id=client_order_id)
+        return Order(**await self._request("PATCH", f"/orders/{order_id}", Priority.REPLACE, body=req.to_request_fields()))
+
+    async def cancel_all(self) -> None:
+        await self._request("DELETE", "/orders", Priority.URGENT)
+
+    async def list_positions(self) -> List[Position]:
+        return [Position(**p) for p in await self._request("GET", "/positions", Priority.POLL) or []]
+
+    async def get_account(self) -> TradeAccount:
+        return TradeAccount(**await self._request("GET", "/account", Priority.POLL))
+
+    async def list_orders(self, status: str = "open") -> List[Order]:
+        return [Order(**o) for o in await self._request("GET", "/orders", Priority.POLL, params={"status": status, "limit": 500}) or []]
+
+    async def close(self) -> None:
+        await self.http.close()
+
+    def stats(self) -> dict:
+        return {"client": "pooled", **self.http.stats(), "rate_limit": self._bucket.stats()}
+
+
+def create_broker(kind: str, api_key: str, api_secret: str, max_per_min: int = 60, base_url: Optional[str] = None, concurrency: int = 8, timeout: float = 10.0):
+    if kind == "pooled":
+        return PooledBroker(api_key, api_secret, max_per_min=max_per_min, base_url=base_url, max_connections=concurrency, timeout=timeout)
+    return Broker(api_key, api_secret, max_per_min=max_per_min, base_url=base_url, workers=concurrency)
@@ -14,6 +14,8 @@ class RiskConfig:
     max_open_orders: int = 50
     daily_loss_limit_usd: float = 250.0
     max_trades_per_min: int = 30
+    batch_pretrade: bool = False
+    streaming_pnl: bool = True
 
 
 @dataclass
@@ -21,6 +23,7 @@ class SessionConfig:
     trade_only_regular_hours: bool = True
     flatten_before_close_minutes: int = 10
     cancel_all_on_shutdown: bool = True
+    reconcile_orders: str = "adopt"
 
 
 @dataclass
@@ -38,6 +41,8 @@ class AppConfig:
     api_key_id: str
     api_secret_key: str
     paper_rest: str = "https://paper-api.alpaca.markets/v2"
+    data_stream_url: str = ""
+    trade_stream_url: str = ""
     feed: str = "iex"
     symbols: List[str] = field(default_factory=list)
     pairs: List[str] = field(default_factory=list)
@@ -46,11 +51,33 @@ class AppConfig:
     etf_pairs: List[str] = field(default_factory=list)
     etf_baskets: Dict[str, str] = field(default_factory=dict)
     tick_interval_sec: float = 1.0
+    event_driven: bool = False
+    dispatch_min_interval_ms: float = 5.0
     bars_timeframe: str = "1Min"
     subscribe_bars: bool = True
     subscribe_trades: bool = True
     max_stream_symbols: int = 50
     max_stream_subscriptions: int = 30
+    columnar_state: bool = False
+    untraded_history: int = 30
+    ingest_queue_size: int = 10000
+    fast_decode: bool = False
+    record_ticks: bool = False
+    record_dir: str = "data/ticks"
+    bar_cache_dir: str = "data/bars"
+    bar_timeframes: List[int] = field(default_factory=lambda: [1, 60, 300])
+    latency_trace: bool = True
+    replace_tolerance_bps: float = 0.0
+    replace_tolerance_ticks: float = 0.0
+    order_concurrency: int = 8
+    net_intents: bool = True
+    position_reconcile_sec: float = 60.0
+    exit_algo: str = "twap"
+    exit_horizon_sec: float = 60.0
+    exit_slice_sec: float = 2.0
+    exit_slice_min_notional: float = 2000.0
+    broker_client: str = "threaded"
+    broker_timeout_sec: float = 10.0
     log_dir: str = "logs"
     discord_webhook_url: str = ""
     risk: RiskConfig = field(default_factory=RiskConfig)
@@ -99,13 +126,32 @@ def parse_args() -> argparse.Namespace:
     run.add_argument("--symbols", default="")
     run.add_argument("--tick", type=float, default=None)
     run.add_argument("--paper", action="store_true")
+    run.add_argument("--event-driven", action="store_true")
 
     sub.add_parser("status")
     sub.add_parser("flatten")
 
+    replay = sub.add_parser("replay")
+    replay.add_argument("--date", required=True, help="YYYYMMDD directory under --dir")
+    replay.add_argument("--dir", default="")
+    replay.add_argument("--strategies", default="")
+    replay.add_argument("--tick", type=float, default=None)
+    replay.add_argument("--speed", type=float, default=0.0, help="1.0 = original cadence, 0 = as fast as possible")
+    replay.add_argument("--log-dir", default="")
+
     backtest = sub.add_parser("backtest_pairs")
     backtest.add_argument("--pairs", default="")
     backtest.add_argument("--days", type=int, default=7)
+    backtest.add_argument("--refresh", action="store_true", help="only fill the bar cache")
+    backtest.add_argument("--window", default="120,240,480", help="bars, comma-separated grid")
+    backtest.add_argument("--entry-z", default="1.5,2.0,2.5")
+    backtest.add_argument("--exit-z", default="0.25,0.5")
+    backtest.add_argument("--max-hold", default="300,900,1800", help="seconds")
+    backtest.add_argument("--notional", default="1000")
+    backtest.add_argument("--cost-bps", type=float, default=1.0, help="per leg, on traded notional")
+    backtest.add_argument("--workers", type=int, default=0, help="0 = one per CPU")
+    backtest.add_argument("--top", type=int, default=20)
+    backtest.add_argument("--out", default="", help="write every grid row to this CSV")
 
     return p.parse_args()
 
@@ -142,7 +188,7 @@ def load_config(args: argparse.Namespace) -> AppConfig:
         ml=env_bool("STRAT_ML", False),
     )
 
-    if args.cmd == "run" and args.strategies:
+    if args.cmd in {"run", "replay"} and args.strategies:
         names = {s.strip().lower() for s in args.strategies.split(",") if s.strip()}
         strat_flags = StrategyToggles(
             pairs="pairs" in names,
@@ -154,9 +200,13 @@ def load_config(args: argparse.Namespace) -> AppConfig:
         )
 
     tick_interval_sec = float(env_default("TICK_INTERVAL_SEC", "1.0"))
-    if args.cmd == "run" and args.tick is not None:
+    if args.cmd in {"run", "replay"} and args.tick is not None:
         tick_interval_sec = args.tick
 
+    event_driven = env_bool("EVENT_DRIVEN", False)
+    if args.cmd == "run" and args.event_driven:
+        event_driven = True
+
     paper_rest = env_default("ALPACA_PAPER_REST", "https://paper-api.alpaca.markets/v2")
     if paper_rest.endswith("/v2"):
         paper_rest = paper_rest[:-3]
@@ -169,6 +219,8 @@ def load_config(args: argparse.Namespace) -> AppConfig:
         api_key_id=api_key_id,
         api_secret_key=api_secret_key,
         paper_rest=paper_rest,
+        data_stream_url=env_default("ALPACA_DATA_STREAM_URL", ""),
+        trade_stream_url=env_default("ALPACA_TRADE_STREAM_URL", ""),
         feed=feed,
         symbols=symbols,
         pairs=pairs,
@@ -177,11 +229,33 @@ def load_config(args: argparse.Namespace) -> AppConfig:
         etf_pairs=etf_pairs,
         etf_baskets=baskets,
         tick_interval_sec=tick_interval_sec,
+        event_driven=event_driven,
+        dispatch_min_interval_ms=float(env_default("DISPATCH_MIN_INTERVAL_MS", "5")),
         bars_timeframe=env_default("BARS_TIMEFRAME", "1Min"),
         subscribe_bars=env_bool("SUBSCRIBE_BARS", True),
         subscribe_trades=env_bool("SUBSCRIBE_TRADES", True),
         max_stream_symbols=int(env_default("MAX_STREAM_SYMBOLS", "50")),
         max_stream_subscriptions=int(env_default("MAX_STREAM_SUBSCRIPTIONS", "30")),
+        columnar_state=env_bool("COLUMNAR_STATE", False),
+        untraded_history=int(env_default("UNTRADED_HISTORY", "30")),
+        ingest_queue_size=int(env_default("INGEST_QUEUE_SIZE", "10000")),
+        fast_decode=env_bool("FAST_DECODE", False),
+        record_ticks=env_bool("RECORD_TICKS", False),
+        record_dir=env_default("RECORD_DIR", "data/ticks"),
+        bar_cache_dir=env_default("BAR_CACHE_DIR", "data/bars"),
+        bar_timeframes=[int(s) for s in env_list("BAR_TIMEFRAMES", "1,60,300")],
+        latency_trace=env_bool("LATENCY_TRACE", True),
+        replace_tolerance_bps=float(env_default("REPLACE_TOLERANCE_BPS", "0")),
+        replace_tolerance_ticks=float(env_default("REPLACE_TOLERANCE_TICKS", "0")),
+        order_concurrency=int(env_default("ORDER_CONCURRENCY", "8")),
+        net_intents=env_bool("NET_INTENTS", True),
+        position_reconcile_sec=float(env_default("POSITION_RECONCILE_SEC", "60")),
+        exit_algo=env_default("EXIT_ALGO", "twap").lower(),
+        exit_horizon_sec=float(env_default("EXIT_HORIZON_SEC", "60")),
+        exit_slice_sec=float(env_default("EXIT_SLICE_SEC", "2")),
+        exit_slice_min_notional=float(env_default("EXIT_SLICE_MIN_NOTIONAL", "2000")),
+        broker_client=env_default("BROKER_CLIENT", "threaded").lower(),
+        broker_timeout_sec=float(env_default("BROKER_TIMEOUT_SEC", "10")),
         log_dir=env_default("LOG_DIR", "logs"),
         discord_webhook_url=env_default("DISCORD_WEBHOOK_URL", ""),
         risk=RiskConfig(
@@ -192,11 +266,14 @@ def load_config(args: argparse.Namespace) -> AppConfig:
             max_open_orders=int(env_default("MAX_OPEN_ORDERS", "50")),
             daily_loss_limit_usd=float(env_default("DAILY_LOSS_LIMIT_USD", "250")),
             max_trades_per_min=int(env_default("MAX_TRADES_PER_MIN", "30")),
+            batch_pretrade=env_bool("BATCH_PRETRADE", False),
+            streaming_pnl=env_bool("STREAMING_PNL", True),
         ),
         session=SessionConfig(
             trade_only_regular_hours=env_bool("TRADE_ONLY_REGULAR_HOURS", True),
             flatten_before_close_minutes=int(env_default("FLATTEN_BEFORE_CLOSE_MINUTES", "10")),
             cancel_all_on_shutdown=env_bool("CANCEL_ALL_ON_SHUTDOWN", True),
+            reconcile_orders=env_default("RECONCILE_ORDERS", "adopt").lower(),
         ),
         strategies=strat_flags,
         strategy_params={},
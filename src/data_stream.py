@@ -1,13 +1,24 @@
 from __future__ import annotations
 import asyncio
+import functools
 import time
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Callable, Collection, Dict, List, Optional, Sequence
 
 from alpaca.data.live import StockDataStream
 from alpaca.data.enums import DataFeed
 
+from .latency import LatencyTracer
+from .market_store import ColumnarMarketState
+from .raw_stream import RawStockDataStream
+from .recorder import TickRecorder
+from .utils import clock
+from .utils.bar_builder import DEFAULT_TIMEFRAMES, BarBuilder, LocalBar
+from .utils.conflation import ConflatingQueue
 from .utils.rolling import RollingWindow
+from .utils.trade_flow import TradeFlow
+
+STABLE_CONNECTION_SEC = 30.0
 
 
 @dataclass
@@ -26,6 +37,8 @@ class SymbolState:
     mid_window: RollingWindow = field(default_factory=lambda: RollingWindow(600))
     ret_window: RollingWindow = field(default_factory=lambda: RollingWindow(600))
     spread_window: RollingWindow = field(default_factory=lambda: RollingWindow(600))
+    flow: TradeFlow = field(default_factory=TradeFlow)
+    bars: BarBuilder = field(default_factory=BarBuilder)
 
     def update_quote(self, bid: float, ask: float, bid_size: float, ask_size: float, ts: float) -> None:
         self.bid = bid
@@ -41,36 +54,98 @@ class SymbolState:
             self.mid = mid
             self.mid_window.add(mid)
             self.spread_window.add(ask - bid)
+            self.bars.on_quote(mid, ts)
 
     def update_trade(self, price: float, size: float, ts: float) -> None:
         self.last_trade = price
         self.last_trade_size = size
         self.last_trade_ts = ts
+        self.flow.add(price, size, ts, self.bid, self.ask)
+        self.bars.on_trade(price, size, ts)
 
     def update_bar(self, close: float, ts: float) -> None:
         self.last_bar_close = close
         self.last_update_ts = ts
 
     def quote_stale(self, max_age_sec: float) -> bool:
-        return time.time() - self.last_update_ts > max_age_sec
+        return clock.now() - self.last_update_ts > max_age_sec
 
     def mid_returns_std(self) -> float:
         return self.ret_window.std()
 
 
 class MarketDataStream:
-    def __init__(self, api_key: str, api_secret: str, symbols: List[str], feed: str = "iex", subscribe_bars: bool = True, subscribe_trades: bool = True):
+    def __init__(self, api_key: str, api_secret: str, symbols: List[str], feed: str = "iex", subscribe_bars: bool = True, subscribe_trades: bool = True, columnar_state: bool = False, queue_size: int = 10000, fast_decode: bool = False, recorder: Optional[TickRecorder] = None, url: Optional[str] = None, bar_timeframes: Sequence[int] = DEFAULT_TIMEFRAMES, latency: Optional[LatencyTracer] = None, history_symbols: Optional[Collection[str]] = None, untraded_history: int = 30):
         self.api_key = api_key
         self.api_secret = api_secret
         self.symbols = symbols
         self.feed = feed
         self.subscribe_bars = subscribe_bars
         self.subscribe_trades = subscribe_trades
-        self.states: Dict[str, SymbolState] = {s: SymbolState(symbol=s) for s in symbols}
+        self.store: Optional[ColumnarMarketState] = None
+        if columnar_state:
+            self.store = ColumnarMarketState(symbols, bar_timeframes=bar_timeframes, history_symbols=history_symbols, short_window=untraded_history)
+            self.states: Dict[str, SymbolState] = self.store.views()
+        else:
+            self.states = {s: SymbolState(symbol=s, bars=BarBuilder(bar_timeframes)) for s in symbols}
+        self._bar_listeners: List[Callable[[str, LocalBar], None]] = []
+        for sym, state in self.states.items():
+            state.bars.listener = functools.partial(self._emit_bar, sym)
+        # stands in for the subscribed minute bars when SUBSCRIBE_BARS is off: the
+        # local timeframe nearest a minute
+        self._minute_tf = min(bar_timeframes, key=lambda tf: abs(tf - 60)) if bar_timeframes else None
+        if not subscribe_bars and self._minute_tf is not None:
+            self._bar_listeners.append(self._local_minute_bar)
         feed_enum = DataFeed.IEX if str(feed).lower() == "iex" else DataFeed.IEX
-        self._stream = StockDataStream(api_key, api_secret, feed=feed_enum)
+        self.fast_decode = fast_decode
+        self.recorder = recorder
+        self.latency = latency
+        if fast_decode:
+            self._stream = RawStockDataStream(api_key, api_secret, feed=feed_enum, url_override=url or None)
+            self._stream.on_quote = self._raw_quote
+            self._stream.on_trade = self._raw_trade
+            self._stream.on_bar = self._raw_bar
+        else:
+            self._stream = StockDataStream(api_key, api_secret, feed=feed_enum, url_override=url or None)
+        self._queue = ConflatingQueue(queue_size)
         self._task: Optional[asyncio.Task] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self._roll_task: Optional[asyncio.Task] = None
         self._running = False
+        self._stopped = asyncio.Event()
+        self.reconnects = 0
+        self.last_error = ""
+        self._listeners: List[Callable[[str, float], None]] = []
+
+    def add_listener(self, listener: Callable[[str, float], None]) -> None:
+        self._listeners.append(listener)
+
+    def add_bar_listener(self, listener: Callable[[str, LocalBar], None]) -> None:
+        self._bar_listeners.append(listener)
+
+    def _emit_bar(self, symbol: str, bar: LocalBar) -> None:
+        for listener in self._bar_listeners:
+            listener(symbol, bar)
+
+    def _local_minute_bar(self, symbol: str, bar: LocalBar) -> None:
+        # only the close: last_update_ts stays with quotes and trades, since roll()
+        # closes a quiet symbol's bar on the clock and must not make its quote look fresh
+        if bar.timeframe == self._minute_tf:
+            self.states[symbol].last_bar_close = bar.close
+
+    def _notify(self, symbol: str, recv_ts: float) -> None:
+        for listener in self._listeners:
+            listener(symbol, recv_ts)
+
+    def ingest_stats(self) -> dict:
+        stats = self._queue.stats()
+        stats["late_bar_events"] = sum(state.bars.late for state in self.states.values())
+        stats["reconnects"] = self.reconnects
+        if self.last_error:
+            stats["last_error"] = self.last_error
+        if self.recorder:
+            stats.update(self.recorder.stats())
+        return stats
 
     async def start(self) -> None:
         self._running = True
@@ -79,42 +154,156 @@ class MarketDataStream:
             self._stream.subscribe_trades(self._on_trade, *self.symbols)
         if self.subscribe_bars:
             self._stream.subscribe_bars(self._on_bar, *self.symbols)
+        self._drain_task = asyncio.create_task(self._drain())
+        self._roll_task = asyncio.create_task(self._roll_bars())
         self._task = asyncio.create_task(self._run_loop())
 
     async def stop(self) -> None:
         self._running = False
+        self._stopped.set()
         if self._stream:
             await self._stream.stop_ws()
         if self._task:
             await self._task
+        self._queue.close()
+        if self._drain_task:
+            await self._drain_task
+        if self._roll_task:
+            self._roll_task.cancel()
 
     async def _run_loop(self) -> None:
+        # Run the websocket consumer on this loop (rather than StockDataStream.run
+        # in a worker thread) so handlers and strategies never touch state concurrently.
+        # alpaca-py's _run_forever retries a failed connect, auth or dropped socket
+        # itself with no delay, so its connect/subscribe/consume steps are driven
+        # from here instead (private API; pyproject pins the version). Every attempt
+        # after the first waits out the backoff, which resets once a connection has
+        # stayed up for STABLE_CONNECTION_SEC.
+        stream = self._stream
         backoff = 1.0
         while self._running:
+            connected = None
             try:
-                await asyncio.to_thread(self._stream.run)
+                await stream._start_ws()
+                await stream._subscribe_all()
+                connected = time.monotonic()
+                await stream._consume()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                try:
+                    await stream.close()
+                except Exception:
+                    pass
+            if not self._running:
+                break
+            self.reconnects += 1
+            if connected is not None and time.monotonic() - connected >= STABLE_CONNECTION_SEC:
                 backoff = 1.0
-            except Exception:
-                await asyncio.sleep(backoff)
-                backoff = min(backoff * 2, 60.0)
+            try:
+                await asyncio.wait_for(self._stopped.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, 60.0)
 
+    async def _roll_bars(self) -> None:
+        # closes local bars on symbols that went quiet across a boundary
+        while self._running:
+            await asyncio.sleep(1.0)
+            now = clock.now()
+            for state in self.states.values():
+                state.bars.roll(now)
+
+    async def _drain(self) -> None:
+        while self._running or len(self._queue):
+            batch = await self._queue.get_batch()
+            for apply, msg, recv_ts in batch:
+                apply(msg, recv_ts)
+
+    # Handlers only enqueue; quotes and bars conflate per symbol so a burst is
+    # applied as the newest value, trades are kept in order.
     async def _on_quote(self, q) -> None:
+        if self.recorder:
+            ts = q.timestamp.timestamp() if q.timestamp else 0.0
+            self.recorder.quote(q.symbol, float(q.bid_price), float(q.ask_price), float(q.bid_size), float(q.ask_size), ts, time.time())
+        self._queue.put(("q", q.symbol), (self._apply_quote, q, time.perf_counter()))
+
+    async def _on_trade(self, t) -> None:
+        if self.recorder:
+            ts = t.timestamp.timestamp() if t.timestamp else 0.0
+            self.recorder.trade(t.symbol, float(t.price), float(t.size), ts, time.time())
+        self._queue.put_fifo((self._apply_trade, t, time.perf_counter()))
+
+    async def _on_bar(self, b) -> None:
+        if self.recorder:
+            ts = b.timestamp.timestamp() if b.timestamp else 0.0
+            self.recorder.bar(b.symbol, float(b.open), float(b.high), float(b.low), float(b.close), float(b.volume), ts, time.time())
+        self._queue.put(("b", b.symbol), (self._apply_bar, b, time.perf_counter()))
+
+    def _raw_quote(self, symbol: str, bid: float, ask: float, bid_size: float, ask_size: float, ts: float) -> None:
+        if self.recorder:
+            self.recorder.quote(symbol, bid, ask, bid_size, ask_size, ts, time.time())
+        self._queue.put(("q", symbol), (self._apply_quote_row, (symbol, bid, ask, bid_size, ask_size, ts), time.perf_counter()))
+
+    def _raw_trade(self, symbol: str, price: float, size: float, ts: float) -> None:
+        if self.recorder:
+            self.recorder.trade(symbol, price, size, ts, time.time())
+        self._queue.put_fifo((self._apply_trade_row, (symbol, price, size, ts), time.perf_counter()))
+
+    def _raw_bar(self, symbol: str, open_: float, high: float, low: float, close: float, volume: float, ts: float) -> None:
+        if self.recorder:
+            self.recorder.bar(symbol, open_, high, low, close, volume, ts, time.time())
+        self._queue.put(("b", symbol), (self._apply_bar_row, (symbol, open_, high, low, close, volume, ts), time.perf_counter()))
+
+    def _apply_quote_row(self, row: tuple, recv_ts: float) -> None:
+        state = self.states.get(row[0])
+        if not state:
+            return
+        state.update_quote(row[1], row[2], row[3], row[4], row[5])
+        if self.latency:
+            self.latency.on_tick(row[0], row[5], recv_ts)
+        self._notify(row[0], recv_ts)
+
+    def _apply_trade_row(self, row: tuple, recv_ts: float) -> None:
+        state = self.states.get(row[0])
+        if not state:
+            return
+        state.update_trade(row[1], row[2], row[3])
+        if self.latency:
+            self.latency.on_tick(row[0], row[3], recv_ts)
+        self._notify(row[0], recv_ts)
+
+    def _apply_bar_row(self, row: tuple, recv_ts: float) -> None:
+        state = self.states.get(row[0])
+        if not state:
+            return
+        state.update_bar(row[4], row[6])
+        self._notify(row[0], recv_ts)
+
+    def _apply_quote(self, q, recv_ts: float) -> None:
         state = self.states.get(q.symbol)
         if not state:
             return
         ts = q.timestamp.timestamp() if q.timestamp else time.time()
         state.update_quote(float(q.bid_price), float(q.ask_price), float(q.bid_size), float(q.ask_size), ts)
+        if self.latency:
+            self.latency.on_tick(q.symbol, ts, recv_ts)
+        self._notify(q.symbol, recv_ts)
 
-    async def _on_trade(self, t) -> None:
+    def _apply_trade(self, t, recv_ts: float) -> None:
         state = self.states.get(t.symbol)
         if not state:
             return
         ts = t.timestamp.timestamp() if t.timestamp else time.time()
         state.update_trade(float(t.price), float(t.size), ts)
+        if self.latency:
+            self.latency.on_tick(t.symbol, ts, recv_ts)
+        self._notify(t.symbol, recv_ts)
 
-    async def _on_bar(self, b) -> None:
+    def _apply_bar(self, b, recv_ts: float) -> None:
         state = self.states.get(b.symbol)
         if not state:
             return
         ts = b.timestamp.timestamp() if b.timestamp else time.time()
         state.update_bar(float(b.close), ts)
+        self._notify(b.symbol, recv_ts)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .strategies.base import Strategy
+from .utils.histogram import LatencyHistogram
+
+
+class StrategyDispatcher:
+    # Market-data handlers mark symbols dirty; run() wakes on the first mark,
+    # waits out min_interval_sec to coalesce bursts, then hands the strategies
+    # subscribed to the dirty symbols to the dispatch callback.
+    def __init__(self, min_interval_sec: float = 0.0):
+        self.min_interval_sec = min_interval_sec
+        self.latency = LatencyHistogram()
+        self.dispatches = 0
+        self.coalesced = 0
+        self._subs: Dict[str, List[Strategy]] = {}
+        self._order: Dict[str, int] = {}
+        self._dirty: Dict[str, float] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._running = False
+        self._last_dispatch = 0.0
+
+    def subscribe(self, strategy: Strategy, symbols: List[str] | None = None) -> None:
+        self._order.setdefault(strategy.name, len(self._order))
+        for sym in symbols if symbols is not None else strategy.symbols:
+            subs = self._subs.setdefault(sym, [])
+            if strategy not in subs:
+                subs.append(strategy)
+
+    def mark_dirty(self, symbol: str, recv_ts: float | None = None) -> None:
+        if symbol not in self._subs:
+            return
+        recv_ts = time.perf_counter() if recv_ts is None else recv_ts
+        if self._loop is not None and threading.get_ident() != self._loop_thread:
+            self._loop.call_soon_threadsafe(self._mark, symbol, recv_ts)
+            return
+        self._mark(symbol, recv_ts)
+
+    def _mark(self, symbol: str, recv_ts: float) -> None:
+        if symbol in self._dirty:
+            self.coalesced += 1
+            return
+        self._dirty[symbol] = recv_ts
+        if self._wake is not None:
+            self._wake.set()
+
+    def record_decision(self, since: float) -> None:
+        self.latency.record(time.perf_counter() - since)
+
+    async def run(self, dispatch: Callable[[List[Strategy], float], Awaitable[None]]) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._wake = asyncio.Event()
+        self._running = True
+        if self._dirty:
+            self._wake.set()
+        while self._running:
+            await self._wake.wait()
+            self._wake.clear()
+            if not self._running:
+                break
+            wait = self._last_dispatch + self.min_interval_sec - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                continue
+            strategies: Dict[str, Strategy] = {}
+            for sym in dirty:
+                for strat in self._subs.get(sym, ()):
+                    strategies.setdefault(strat.name, strat)
+            ordered = sorted(strategies.values(), key=lambda s: self._order[s.name])
+            self._last_dispatch = time.perf_counter()
+            self.dispatches += 1
+            await dispatch(ordered, min(dirty.values()))
+
+    def stop(self) -> None:
+        self._running = False
+        if self._wake is not None:
+            self._wake.set()
+
+    def snapshot(self) -> dict:
+        return {"dispatches": self.dispatches, "coalesced": self.coalesced, **self.latency.snapshot()}
@@ -1,12 +1,16 @@
 from __future__ import annotations
 import asyncio
-import time
+import functools
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Container, Dict, Iterable, List, Optional, Tuple
 
 from alpaca.trading.enums import OrderSide, TimeInForce
 
 from .broker import Broker
+from .latency import LatencyTracer
+from .orders import DONE, IN_FLIGHT, LIVE, PARTIALLY_FILLED, PENDING_CANCEL, PENDING_NEW, WORKING, ManagedOrder, OrderTracker
+from .utils import clock
+from .utils.rate_limit import Priority
 
 
 @dataclass
@@ -21,68 +25,339 @@ class OrderIntent:
     order_type: str = "limit"
 
 
+TICK_SIZE = 0.01
+# a cancel the broker accepted but whose trade update never came is dropped after this
+CANCEL_CONFIRM_SEC = 10.0
+
+
+def intent_client_id(intent: OrderIntent) -> str:
+    return f"{intent.strategy}:{intent.intent_id}:{intent.symbol}:{intent.side.value}"
+
+
+def base_client_id(order_client_id: str) -> str:
+    # every order after the first for an intent carries a ":r<rev>" suffix: Alpaca
+    # wants a fresh client_order_id per order, sync tracks them under the intent's id
+    base, sep, rev = order_client_id.rpartition(":r")
+    return base if sep and rev.isdigit() else order_client_id
+
+
+def _order_gone(e: Exception) -> bool:
+    # Alpaca answers 422 (already filled/canceled) or 404 once an order is final
+    try:
+        return int(getattr(e, "code", 0) or 0) // 100_000 in (404, 422)
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
 class ExecutionEngine:
-    def __init__(self, broker: Broker, max_open_orders: int = 50):
+    def __init__(self, broker: Broker, max_open_orders: int = 50, latency: Optional[LatencyTracer] = None, replace_tolerance_bps: float = 0.0, replace_tolerance_ticks: float = 0.0, max_concurrency: int = 8):
         self.broker = broker
+        self.latency = latency
         self.max_open_orders = max_open_orders
-        self.open_orders: Dict[str, dict] = {}
+        self.replace_tolerance_bps = replace_tolerance_bps
+        self.replace_tolerance_ticks = replace_tolerance_ticks
+        self.orders = OrderTracker()
+        # ExitSlicer for market exits; None sends them whole
+        self.slicer = None
+        # strategy -> intent keys of its latest sync(cancel_stale=False) since the last sweep
+        self._decided: Dict[str, set] = {}
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # orders placed per intent id; keys come from a bounded set of intent ids
+        self._revs: Dict[str, int] = {}
+        # intent key -> (order being canceled, intent to submit once it is confirmed)
+        self._resubmit: Dict[str, Tuple[ManagedOrder, OrderIntent]] = {}
+        self.replaced = 0
 
-    def _client_id(self, intent: OrderIntent) -> str:
-        return f"{intent.strategy}:{intent.intent_id}:{intent.symbol}:{intent.side.value}"
+    def _order_client_id(self, client_id: str) -> str:
+        rev = self._revs.get(client_id, -1) + 1
+        self._revs[client_id] = rev
+        return f"{client_id}:r{rev}" if rev else client_id
 
-    async def sync(self, intents: List[OrderIntent]) -> None:
+    def _needs_replace(self, intent: OrderIntent, existing: ManagedOrder) -> bool:
+        if float(intent.qty) != existing.qty:
+            return True
+        old = existing.limit_price
+        if old is None:
+            return False
+        band = max(self.replace_tolerance_bps * old / 10_000.0, self.replace_tolerance_ticks * TICK_SIZE)
+        return abs(float(intent.limit_price) - old) > band + 1e-9
+
+    async def sync(self, intents: List[OrderIntent], cancel_stale: bool = True, slice_exits: bool = True, strategies: Optional[Iterable[str]] = None) -> None:
+        # Plans every submit/replace/cancel first, then runs them concurrently:
+        # one lane per symbol (cancels before submits and replaces), lanes in
+        # parallel under the concurrency limit so pair legs leave together.
+        # Orders with a request already in flight are left alone until it settles.
+        # With a slicer, market intents go out as paced child orders instead.
+        # strategies: the strategies whose decision the intents are (default: the
+        # intents' own); without cancel_stale their dropped orders wait for sweep_stale.
         desired_ids = set()
+        lanes: Dict[str, Tuple[list, list]] = {}
+        new_orders = 0
+        if self.slicer and self.slicer.parents:
+            self.slicer.supersede(intents)
         for intent in intents:
-            client_id = self._client_id(intent)
+            client_id = intent_client_id(intent)
+            if client_id in desired_ids:
+                continue
             desired_ids.add(client_id)
-            if client_id in self.open_orders:
-                existing = self.open_orders[client_id]
-                if intent.limit_price and existing.get("limit_price") != intent.limit_price:
-                    await self._cancel(client_id, existing)
-                    await self._submit(intent, client_id)
+            existing = self.orders.get(client_id)
+            if existing is not None and existing.state == PENDING_CANCEL and clock.now() - existing.ts > CANCEL_CONFIRM_SEC:
+                self.orders.set_state(existing, DONE)
+                existing = None
+            if existing is not None:
+                if existing.state in IN_FLIGHT:
+                    continue
+                if intent.order_type != "market" and intent.limit_price and self._needs_replace(intent, existing):
+                    lanes.setdefault(intent.symbol, ([], []))[1].append(functools.partial(self._replace, intent, client_id, existing))
                 continue
-            if len(self.open_orders) >= self.max_open_orders:
+            if len(self.orders) + new_orders >= self.max_open_orders:
                 continue
-            await self._submit(intent, client_id)
-        await self._cancel_stale(desired_ids)
+            if self.slicer and slice_exits and intent.order_type == "market":
+                intent = self.slicer.child(client_id, intent)
+                if intent is None:
+                    continue
+            new_orders += 1
+            lanes.setdefault(intent.symbol, ([], []))[1].append(functools.partial(self._submit, intent, client_id))
+        self._plan_exits(lanes, desired_ids, new_orders)
+        if cancel_stale:
+            self._decided.clear()
+            self._plan_stale(lanes, desired_ids)
+        else:
+            for name in {i.strategy for i in intents} if strategies is None else strategies:
+                self._decided[name] = set()
+            for intent in intents:
+                self._decided.setdefault(intent.strategy, set()).add(intent_client_id(intent))
+        await self._run(lanes)
 
-    async def _submit(self, intent: OrderIntent, client_id: str) -> None:
-        if intent.order_type == "market":
-            order = await self.broker.submit_market(intent.symbol, intent.qty, intent.side, intent.tif, client_id)
+    async def sweep_stale(self) -> None:
+        # cancels the orders a strategy's latest sync(cancel_stale=False) since the
+        # last sweep dropped; orders of strategies that did not run are kept
+        decided, self._decided = self._decided, {}
+        desired_ids = set().union(*decided.values())
+        lanes: Dict[str, Tuple[list, list]] = {}
+        self._plan_exits(lanes, desired_ids)
+        self._plan_stale(lanes, desired_ids, owners=decided)
+        await self._run(lanes)
+
+    async def reconcile(self, orders: Iterable, strategies: Iterable[str], adopt: bool = True) -> dict:
+        # Takes over the open orders an earlier run left behind. Limit orders with
+        # one of our strategy:intent:symbol:side ids from an active strategy are
+        # tracked as if this run had placed them, so the first sync re-prices or
+        # cancels them; everything else is cancelled in one concurrent pass.
+        active = set(strategies)
+        lanes: Dict[str, Tuple[list, list]] = {}
+        adopted = 0
+        canceled = 0
+        for order in orders:
+            order_client_id = str(getattr(order, "client_order_id", "") or "")
+            client_id = base_client_id(order_client_id)
+            parts = client_id.split(":")
+            side = str(getattr(order.side, "value", order.side))
+            limit_price = getattr(order, "limit_price", None)
+            ours = len(parts) >= 4 and parts[0] in active and parts[-2] == order.symbol and parts[-1] == side
+            if adopt and ours and limit_price is not None and client_id not in self.orders:
+                filled = float(getattr(order, "filled_qty", 0) or 0)
+                managed = ManagedOrder(
+                    key=client_id,
+                    client_order_id=order_client_id,
+                    symbol=order.symbol,
+                    side=side,
+                    qty=float(order.qty or 0),
+                    limit_price=float(limit_price),
+                    strategy=parts[0],
+                    order_id=str(order.id),
+                    filled_qty=filled,
+                )
+                self.orders.add(managed)
+                self.orders.set_state(managed, PARTIALLY_FILLED if filled > 0 else LIVE)
+                # the next order for this intent must not reuse a client id the broker has seen
+                rev = order_client_id[len(client_id) + 2:]
+                self._revs[client_id] = max(self._revs.get(client_id, 0), int(rev) if rev else 0)
+                adopted += 1
+                continue
+            stray = ManagedOrder(key=order_client_id, client_order_id=order_client_id, symbol=order.symbol, side=side, qty=float(order.qty or 0), limit_price=None, strategy="", state=LIVE, order_id=str(order.id))
+            lanes.setdefault(order.symbol, ([], []))[0].append(functools.partial(self._cancel, stray))
+            canceled += 1
+        await self._run(lanes)
+        return {"adopted": adopted, "canceled": canceled}
+
+    def _plan_exits(self, lanes: Dict[str, Tuple[list, list]], desired_ids: set, new_orders: int = 0) -> None:
+        # exits whose intent was not re-sent keep going from the parent's last
+        # intent; their keys count as desired so the working child is not canceled
+        if not self.slicer or not self.slicer.parents:
+            return
+        for key, parent in list(self.slicer.parents.items()):
+            if key in desired_ids:
+                continue
+            if key in self.orders:
+                desired_ids.add(key)
+                continue
+            if parent.last_at >= parent.deadline:
+                # the remainder already went out in one child after the deadline
+                self.slicer.expire(key)
+                continue
+            desired_ids.add(key)
+            if len(self.orders) + new_orders >= self.max_open_orders:
+                continue
+            intent = self.slicer.child(key, parent.intent)
+            if intent is not None:
+                new_orders += 1
+                lanes.setdefault(intent.symbol, ([], []))[1].append(functools.partial(self._submit, intent, key))
+
+    def _plan_stale(self, lanes: Dict[str, Tuple[list, list]], desired_ids: set, owners: Optional[Container[str]] = None) -> None:
+        # owners: only these strategies' undesired orders are canceled (default: all)
+        for key in [key for key, (_, intent) in self._resubmit.items() if key not in desired_ids and (owners is None or intent.strategy in owners)]:
+            del self._resubmit[key]
+        now = clock.now()
+        if owners is None:
+            candidates = list(self.orders)
         else:
-            if intent.limit_price is None:
+            # the owners' orders plus any cancel still waiting on its confirmation
+            candidates = [o for name in owners for o in self.orders.for_strategy(name)]
+            candidates += [o for o in self.orders.in_flight() if o.state == PENDING_CANCEL and o.strategy not in owners]
+        for existing in candidates:
+            if existing.key in desired_ids:
+                continue
+            if existing.state == PENDING_CANCEL and now - existing.ts > CANCEL_CONFIRM_SEC:
+                self.orders.set_state(existing, DONE)
+            elif existing.state in WORKING and (owners is None or existing.strategy in owners):
+                lanes.setdefault(existing.symbol, ([], []))[0].append(functools.partial(self._cancel, existing))
+
+    async def _run(self, lanes: Dict[str, Tuple[list, list]]) -> None:
+        # every call runs even if another fails; each keeps its order's state right for
+        # its own order, and the first error is raised once all have settled
+        if not lanes:
+            return
+        if self.max_concurrency == 1 or len(lanes) == 1:
+            errors = []
+            for first, then in lanes.values():
+                errors.extend(await self._lane(first, then))
+        else:
+            results = await asyncio.gather(*(self._lane(first, then) for first, then in lanes.values()))
+            errors = [e for lane in results for e in lane]
+        if errors:
+            raise errors[0]
+
+    async def _lane(self, first: list, then: list) -> List[Exception]:
+        errors: List[Exception] = []
+        for step in (first, then):
+            if self.max_concurrency == 1 or len(step) == 1:
+                for call in step:
+                    try:
+                        await self._bounded(call)
+                    except Exception as e:
+                        errors.append(e)
+            elif step:
+                results = await asyncio.gather(*(self._bounded(call) for call in step), return_exceptions=True)
+                errors.extend(r for r in results if isinstance(r, Exception))
+        return errors
+
+    async def _bounded(self, call: Callable[[], Awaitable[None]]) -> None:
+        async with self._slots:
+            await call()
+
+    async def _submit(self, intent: OrderIntent, client_id: str) -> None:
+        if intent.order_type != "market" and intent.limit_price is None:
+            return
+        order_client_id = self._order_client_id(client_id)
+        # tracked from before the request leaves, so the next tick does not resubmit
+        # it and a fill that beats the REST response still finds it
+        managed = ManagedOrder(
+            key=client_id,
+            client_order_id=order_client_id,
+            symbol=intent.symbol,
+            side=intent.side.value,
+            qty=float(intent.qty),
+            limit_price=float(intent.limit_price) if intent.limit_price else None,
+            strategy=intent.strategy,
+        )
+        self.orders.add(managed)
+        if self.latency:
+            self.latency.sending(order_client_id, intent.strategy, intent.symbol)
+        try:
+            # market orders here are exits and flattens, so they jump the new-order queue
+            if intent.order_type == "market":
+                order = await self.broker.submit_market(intent.symbol, intent.qty, intent.side, intent.tif, order_client_id, priority=Priority.URGENT)
+            else:
+                order = await self.broker.submit_limit(intent.symbol, intent.qty, intent.side, intent.limit_price, intent.tif, order_client_id)
+        except Exception:
+            if self.latency:
+                self.latency.failed(order_client_id)
+            self.orders.set_state(managed, DONE)
+            raise
+        if self.latency:
+            self.latency.sent(order_client_id)
+        if managed.order_id is None:
+            managed.order_id = str(order.id)
+        if managed.state == PENDING_NEW:
+            self.orders.set_state(managed, LIVE)
+
+    async def _replace(self, intent: OrderIntent, client_id: str, existing: ManagedOrder) -> None:
+        # one PATCH instead of cancel + submit; the broker answers with a new order id
+        order_client_id = self._order_client_id(client_id)
+        qty = float(intent.qty)
+        self.orders.begin_replace(existing, order_client_id)
+        if self.latency:
+            self.latency.sending(order_client_id, intent.strategy, intent.symbol)
+        try:
+            order = await self.broker.replace(existing.order_id, limit_price=float(intent.limit_price), qty=qty if qty != existing.qty else None, client_order_id=order_client_id)
+        except Exception as e:
+            if self.latency:
+                self.latency.failed(order_client_id)
+            self.orders.abort_replace(existing)
+            if existing.state == DONE or not _order_gone(e):
+                # 429, timeouts, 5xx: the order is unchanged and the next sync retries
                 return
-            order = await self.broker.submit_limit(intent.symbol, intent.qty, intent.side, intent.limit_price, intent.tif, client_id)
-        self.open_orders[client_id] = {
-            "order_id": order.id,
-            "symbol": intent.symbol,
-            "side": intent.side.value,
-            "qty": float(intent.qty),
-            "limit_price": float(intent.limit_price) if intent.limit_price else None,
-            "strategy": intent.strategy,
-            "ts": time.time(),
-        }
-
-    async def _cancel(self, client_id: str, existing: dict) -> None:
-        order_id = existing.get("order_id")
-        if not order_id:
+            # not replaceable any more: cancel it and submit the replacement when the
+            # canceled update confirms it, so the two are never working together
+            prior = existing.state
+            self._resubmit[client_id] = (existing, intent)
+            self.orders.set_state(existing, PENDING_CANCEL)
+            try:
+                await self.broker.cancel(existing.order_id)
+            except Exception as cancel_error:
+                # already final: its trade update still settles it; otherwise the next sync retries
+                if not _order_gone(cancel_error):
+                    del self._resubmit[client_id]
+                    if existing.state == PENDING_CANCEL:
+                        self.orders.set_state(existing, prior)
             return
-        await self.broker.cancel(order_id)
-        self.open_orders.pop(client_id, None)
+        if self.latency:
+            self.latency.sent(order_client_id)
+        self.replaced += 1
+        self.orders.finish_replace(existing, str(order.id), qty, float(intent.limit_price))
 
-    async def _cancel_stale(self, desired_ids: set) -> None:
-        for client_id, existing in list(self.open_orders.items()):
-            if client_id not in desired_ids:
-                await self._cancel(client_id, existing)
+    async def _cancel(self, existing: ManagedOrder) -> bool:
+        # stays pending_cancel until the canceled (or fill) trade update arrives
+        prior = existing.state
+        self.orders.set_state(existing, PENDING_CANCEL)
+        try:
+            await self.broker.cancel(existing.order_id)
+        except Exception as e:
+            if _order_gone(e):
+                # already filled or canceled; its trade update settles the fill side
+                self.orders.set_state(existing, DONE)
+                return False
+            if existing.state == PENDING_CANCEL:
+                self.orders.set_state(existing, prior)
+            raise
+        return True
 
     async def on_trade_update(self, update: dict) -> None:
-        order = update.get("order", {})
-        client_id = order.get("client_order_id")
-        if not client_id:
+        event = update.get("event", "")
+        payload = update.get("order") or {}
+        order = self.orders.apply(event, payload)
+        if order is None:
             return
-        event = update.get("event")
-        if event in {"fill", "partial_fill", "canceled", "rejected", "expired"}:
-            if event in {"canceled", "rejected", "expired"}:
-                self.open_orders.pop(client_id, None)
-        if event == "fill":
-            self.open_orders.pop(client_id, None)
+        if self.slicer and event in ("fill", "partial_fill"):
+            self.slicer.on_fill(order.key, order.client_order_id, payload)
+        pending = self._resubmit.get(order.key)
+        if pending is not None and pending[0] is order and order.state == DONE:
+            del self._resubmit[order.key]
+            # a fill or expiry leaves the intent to the next sync, which sees the new position
+            if event == "canceled" and order.key not in self.orders:
+                try:
+                    await self._submit(pending[1], order.key)
+                except Exception:
+                    pass
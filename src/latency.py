@@ -0,0 +1,122 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from .utils.histogram import LatencyHistogram
+
+# feed:        exchange timestamp -> websocket receive (wall clock, includes skew)
+# queue:       websocket receive -> symbol state updated
+# strategy:    state updated -> strategy on_tick returned the intent
+# risk:        strategy decision -> risk check done
+# send:        risk check done -> Broker.submit_* called
+# rest:        Broker.submit_* called -> REST response
+# ack:         Broker.submit_* called -> first trade_updates event for the order
+# tick_to_ack: websocket receive -> first trade_updates event
+STAGES: Tuple[str, ...] = ("feed", "queue", "strategy", "risk", "send", "rest", "ack", "tick_to_ack")
+
+
+class LatencyTracer:
+    # Stamps the tick-to-order path and aggregates stage deltas per
+    # (strategy, symbol). Market data stamps the latest tick per symbol, the
+    # trading loop stamps decisions and risk once per cycle, and the execution
+    # engine ties them to the order's client_order_id at submit time.
+    def __init__(self, max_pending: int = 5000, max_value_us: int = 10_000_000):
+        self.max_pending = max_pending
+        self.max_value_us = max_value_us
+        # perf_counter() + offset ~= time.time(), so the hot path only takes perf stamps
+        self._wall_offset = time.time() - time.perf_counter()
+        self._ticks: Dict[str, Tuple[float, float, float]] = {}
+        self._decided: Dict[str, float] = {}
+        self._risk_ts = 0.0
+        self._cycle_ticks: Dict[str, Tuple[float, float, float]] = {}
+        # client_id -> [strategy, symbol, call_ts, recv_ts, rest_done, ack_done]
+        self._pending: "OrderedDict[str, list]" = OrderedDict()
+        self.hists: Dict[Tuple[str, str], Dict[str, LatencyHistogram]] = {}
+
+    def on_tick(self, symbol: str, exch_ts: float, recv_ts: float) -> None:
+        self._ticks[symbol] = (exch_ts, recv_ts, time.perf_counter())
+
+    def decided(self, strategy: str) -> None:
+        self._decided[strategy] = time.perf_counter()
+
+    def risk_checked(self, symbols: Iterable[str]) -> None:
+        # pin the ticks the decision saw; newer ones arrive while orders are sent
+        self._risk_ts = time.perf_counter()
+        ticks = self._ticks
+        self._cycle_ticks = {s: ticks[s] for s in symbols if s in ticks}
+
+    def end_cycle(self) -> None:
+        self._decided.clear()
+        self._cycle_ticks = {}
+        self._risk_ts = 0.0
+
+    def _record(self, strategy: str, symbol: str, stage: str, seconds: float) -> None:
+        stages = self.hists.get((strategy, symbol))
+        if stages is None:
+            stages = self.hists[(strategy, symbol)] = {}
+        hist = stages.get(stage)
+        if hist is None:
+            hist = stages[stage] = LatencyHistogram(max_value_us=self.max_value_us)
+        hist.record(seconds)
+
+    def sending(self, client_id: str, strategy: str, symbol: str) -> None:
+        now = time.perf_counter()
+        recv_ts = 0.0
+        tick = self._cycle_ticks.get(symbol) if self._risk_ts else self._ticks.get(symbol)
+        decided = self._decided.get(strategy, 0.0)
+        if tick is not None:
+            exch_ts, recv_ts, applied_ts = tick
+            if exch_ts > 0:
+                self._record(strategy, symbol, "feed", recv_ts + self._wall_offset - exch_ts)
+            self._record(strategy, symbol, "queue", applied_ts - recv_ts)
+            if decided >= applied_ts:
+                self._record(strategy, symbol, "strategy", decided - applied_ts)
+        if decided and self._risk_ts >= decided:
+            self._record(strategy, symbol, "risk", self._risk_ts - decided)
+        if self._risk_ts:
+            self._record(strategy, symbol, "send", now - self._risk_ts)
+        self._pending[client_id] = [strategy, symbol, now, recv_ts, False, False]
+        self._pending.move_to_end(client_id)
+        while len(self._pending) > self.max_pending:
+            self._pending.popitem(last=False)
+
+    def sent(self, client_id: str) -> None:
+        entry = self._pending.get(client_id)
+        if entry is None or entry[4]:
+            return
+        self._record(entry[0], entry[1], "rest", time.perf_counter() - entry[2])
+        entry[4] = True
+        if entry[5]:
+            del self._pending[client_id]
+
+    def failed(self, client_id: str) -> None:
+        self._pending.pop(client_id, None)
+
+    def on_trade_update(self, update: dict) -> None:
+        # the ack can arrive before the REST response returns
+        client_id = update.get("order", {}).get("client_order_id")
+        entry = self._pending.get(client_id) if client_id else None
+        if entry is None or entry[5]:
+            return
+        now = time.perf_counter()
+        self._record(entry[0], entry[1], "ack", now - entry[2])
+        if entry[3]:
+            self._record(entry[0], entry[1], "tick_to_ack", now - entry[3])
+        entry[5] = True
+        if entry[4]:
+            del self._pending[client_id]
+
+    def snapshot(self, by_symbol: bool = True) -> Dict[str, Dict[str, dict]]:
+        merged: Dict[str, Dict[str, LatencyHistogram]] = {}
+        for (strategy, symbol), stages in self.hists.items():
+            key = f"{strategy}:{symbol}" if by_symbol else strategy
+            out = merged.setdefault(key, {})
+            for stage, hist in stages.items():
+                if stage not in out:
+                    out[stage] = LatencyHistogram(max_value_us=self.max_value_us)
+                out[stage].merge(hist)
+        return {key: {stage: out[stage].snapshot() for stage in STAGES if stage in out} for key, out in sorted(merged.items())}
+
+    def pending(self) -> int:
+        return len(self._pending)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from .risk import PositionState
+
+FINAL_EVENTS = frozenset({"fill", "canceled", "expired", "rejected", "done_for_day"})
+
+
+class PositionLedger:
+    # Positions kept current from trade_updates fills instead of REST polls.
+    # Each symbol's notional is re-marked on its own quotes and on fills, and
+    # gross/net exposure are adjusted by the change, so reading them is O(1).
+    # Broker positions are pulled only as a drift check (reconcile).
+    # `on_change(symbol, qty)` is called whenever a symbol's quantity is set.
+    def __init__(self, states: Optional[Mapping] = None, max_orders: int = 10_000, on_change: Optional[Callable[[str, float], None]] = None):
+        self.states = states
+        self.on_change = on_change
+        self.positions: Dict[str, PositionState] = {}
+        self.gross = 0.0
+        self.net = 0.0
+        self.version = 0
+        self.fills = 0
+        self.drift = 0
+        self._notional: Dict[str, float] = {}
+        # symbol -> ledger version of its last fill
+        self._touched: Dict[str, int] = {}
+        # order id -> (filled qty, avg fill price) already applied
+        self._seen: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+        self.max_orders = max_orders
+
+    def on_tick(self, symbol: str, recv_ts: float = 0.0) -> None:
+        pos = self.positions.get(symbol)
+        if pos is not None:
+            self._mark(symbol, pos)
+
+    def _mark(self, symbol: str, pos: Optional[PositionState]) -> None:
+        new = 0.0
+        if pos is not None:
+            st = self.states.get(symbol) if self.states is not None else None
+            new = pos.qty * (st.mid if st and st.mid > 0 else pos.avg_price)
+        old = self._notional.pop(symbol, 0.0)
+        if pos is not None:
+            self._notional[symbol] = new
+        self.gross += abs(new) - abs(old)
+        self.net += new - old
+
+    def on_trade_update(self, update: dict) -> Tuple[float, float]:
+        # applies the newly filled quantity of a fill/partial_fill; returns (qty, price)
+        event = update.get("event")
+        order = update.get("order") or {}
+        order_id = str(order.get("id") or "")
+        if event not in ("fill", "partial_fill") or not order_id:
+            if event in FINAL_EVENTS:
+                self._seen.pop(order_id, None)
+            return 0.0, 0.0
+        filled = float(order.get("filled_qty") or 0.0)
+        avg = float(order.get("filled_avg_price") or 0.0)
+        prev_qty, prev_avg = self._seen.get(order_id, (0.0, 0.0))
+        qty = filled - prev_qty
+        self._seen[order_id] = (max(filled, prev_qty), avg if filled >= prev_qty else prev_avg)
+        self._seen.move_to_end(order_id)
+        if len(self._seen) > self.max_orders:
+            self._seen.popitem(last=False)
+        if qty <= 1e-9:
+            return 0.0, 0.0
+        price = (filled * avg - prev_qty * prev_avg) / qty if prev_qty > 0 else avg
+        position_qty = update.get("position_qty")
+        self.apply_fill(order.get("symbol", ""), order.get("side", ""), qty, price, float(position_qty) if position_qty is not None else None)
+        return qty, price
+
+    def apply_fill(self, symbol: str, side: str, qty: float, price: float, position_qty: Optional[float] = None) -> None:
+        pos = self.positions.get(symbol)
+        old_qty = pos.qty if pos else 0.0
+        avg = pos.avg_price if pos else 0.0
+        new_qty = old_qty + (qty if side == "buy" else -qty)
+        if position_qty is not None:
+            # the broker's position after this execution beats our running sum
+            new_qty = position_qty
+        if old_qty == 0.0 or old_qty * new_qty < 0:
+            avg = price
+        elif abs(new_qty) > abs(old_qty):
+            avg = (avg * abs(old_qty) + price * (abs(new_qty) - abs(old_qty))) / abs(new_qty)
+        self.version += 1
+        self.fills += 1
+        self._touched[symbol] = self.version
+        self._set(symbol, new_qty, avg)
+
+    def _set(self, symbol: str, qty: float, avg_price: float) -> None:
+        if self.on_change:
+            self.on_change(symbol, qty if abs(qty) >= 1e-9 else 0.0)
+        if abs(qty) < 1e-9:
+            self.positions.pop(symbol, None)
+            self._mark(symbol, None)
+            return
+        pos = self.positions.get(symbol)
+        if pos is None:
+            pos = self.positions[symbol] = PositionState(symbol=symbol, qty=qty, avg_price=avg_price)
+        else:
+            pos.qty = qty
+            pos.avg_price = avg_price
+        self._mark(symbol, pos)
+
+    def reset(self, positions: Dict[str, PositionState]) -> None:
+        if self.on_change:
+            for sym in self.positions:
+                if sym not in positions:
+                    self.on_change(sym, 0.0)
+        self.positions.clear()
+        self._notional.clear()
+        self.gross = 0.0
+        self.net = 0.0
+        for sym, pos in positions.items():
+            self._set(sym, pos.qty, pos.avg_price)
+
+    def reconcile(self, broker_positions: Dict[str, PositionState], since: int) -> Dict[str, Tuple[float, float]]:
+        # Takes the broker's positions as truth, except for symbols filled after
+        # `since` (the version when the REST snapshot was requested), which the
+        # snapshot may predate. Returns symbol -> (ledger qty, broker qty) drift.
+        drift: Dict[str, Tuple[float, float]] = {}
+        for sym in set(self.positions) | set(broker_positions):
+            if self._touched.get(sym, 0) > since:
+                continue
+            mine = self.positions.get(sym)
+            theirs = broker_positions.get(sym)
+            mine_qty = mine.qty if mine else 0.0
+            theirs_qty = theirs.qty if theirs else 0.0
+            if abs(mine_qty - theirs_qty) > 1e-6:
+                drift[sym] = (mine_qty, theirs_qty)
+            if theirs is None:
+                self._set(sym, 0.0, 0.0)
+            else:
+                self._set(sym, theirs.qty, theirs.avg_price)
+        self.drift += len(drift)
+        # re-add from scratch so rounding in the running totals does not accumulate
+        self.gross = sum(abs(n) for n in self._notional.values())
+        self.net = sum(self._notional.values())
+        return drift
+
+    def stats(self) -> dict:
+        return {"positions": len(self.positions), "gross": round(self.gross, 2), "net": round(self.net, 2), "fills": self.fills, "drift": self.drift}
@@ -1,6 +1,8 @@
 from __future__ import annotations
 import argparse
 import asyncio
+import csv
+import datetime as dt
 import os
 import signal
 import sys
@@ -9,14 +11,23 @@ from typing import Dict, List
 
 from alpaca.trading.enums import OrderSide, TimeInForce
 
-from .config import load_config, parse_args
+from .config import AppConfig, load_config, parse_args
 from .data_stream import MarketDataStream
+from .dispatcher import StrategyDispatcher
+from .recorder import TickRecorder
 from .trade_stream import TradeStream
-from .broker import Broker
+from .broker import create_broker
 from .execution import ExecutionEngine, OrderIntent
+from .latency import LatencyTracer
+from .ledger import PositionLedger
+from .netting import IntentNetter
+from .slicing import FLATTEN_STRATEGY, ExitSlicer
 from .risk import RiskManager, PositionState
+from .pretrade import PreTradeRisk
+from .pnl import PnLEngine
 from .metrics import Metrics
 from .utils.alerts import DiscordAlerter
+from .strategies.base import Strategy
 from .strategies.pairs_stat_arb import PairsStatArb
 from .strategies.avellaneda_stoikov_mm import AvellanedaStoikovMM
 from .strategies.lead_lag_arb import LeadLagArb
@@ -27,34 +38,113 @@ from .utils.scheduler import AsyncScheduler
 from .utils.time import now_eastern, is_regular_hours, seconds_to_close
 
 
+def build_strategies(cfg: AppConfig) -> List[Strategy]:
+    strategies: List[Strategy] = []
+    if cfg.strategies.pairs:
+        strategies.append(PairsStatArb(cfg.pairs))
+    if cfg.strategies.mm:
+        strategies.append(AvellanedaStoikovMM(cfg.symbols))
+    if cfg.strategies.leadlag:
+        strategies.append(LeadLagArb(cfg.leader_symbol, cfg.lead_lag_symbols))
+    if cfg.strategies.etf:
+        strategies.append(ETFBasketArb(cfg.etf_pairs, cfg.etf_baskets))
+    if cfg.strategies.news:
+        strategies.append(NewsEventDriven(cfg.symbols))
+    if cfg.strategies.ml:
+        strategies.append(MLOrderflow(cfg.symbols))
+    if cfg.event_driven:
+        # dispatch runs a strategy on every coalesced update; its own windows
+        # still take one sample per tick interval, as on the timer
+        for strat in strategies:
+            strat.sample_sec = cfg.tick_interval_sec
+    return strategies
+
+
+def position_states(pos_list) -> Dict[str, PositionState]:
+    return {p.symbol: PositionState(symbol=p.symbol, qty=float(p.qty), avg_price=float(p.avg_entry_price)) for p in pos_list}
+
+
+def build_broker(cfg: AppConfig):
+    return create_broker(cfg.broker_client, cfg.api_key_id, cfg.api_secret_key, max_per_min=cfg.risk.max_trades_per_min, base_url=cfg.paper_rest, concurrency=cfg.order_concurrency, timeout=cfg.broker_timeout_sec)
+
+
 async def run_trader(args: argparse.Namespace) -> None:
     cfg = load_config(args)
 
-    broker = Broker(cfg.api_key_id, cfg.api_secret_key, max_per_min=cfg.risk.max_trades_per_min)
-    trade_stream = TradeStream(cfg.api_key_id, cfg.api_secret_key)
-    execution = ExecutionEngine(broker, max_open_orders=cfg.risk.max_open_orders)
+    broker = build_broker(cfg)
+    trade_stream = TradeStream(cfg.api_key_id, cfg.api_secret_key, url=cfg.trade_stream_url)
+    latency = LatencyTracer() if cfg.latency_trace else None
+    execution = ExecutionEngine(broker, max_open_orders=cfg.risk.max_open_orders, latency=latency, replace_tolerance_bps=cfg.replace_tolerance_bps, replace_tolerance_ticks=cfg.replace_tolerance_ticks, max_concurrency=cfg.order_concurrency)
     risk = RiskManager(cfg.risk.max_gross_exposure_usd, cfg.risk.max_net_exposure_usd, cfg.risk.max_order_notional_usd, cfg.risk.max_position_notional_usd, cfg.risk.daily_loss_limit_usd)
     metrics = Metrics(cfg.log_dir)
     alerter = DiscordAlerter(cfg.discord_webhook_url)
     news_stream = None
 
-    positions: Dict[str, PositionState] = {}
+    ledger = PositionLedger()
+    positions: Dict[str, PositionState] = ledger.positions
+    if cfg.risk.batch_pretrade:
+        risk.pretrade = PreTradeRisk(cfg.risk.max_gross_exposure_usd, cfg.risk.max_net_exposure_usd, cfg.risk.max_order_notional_usd, cfg.risk.max_position_notional_usd, orders=execution.orders)
+        ledger.on_change = risk.pretrade.on_position
+        execution.orders.listener = risk.pretrade.on_order
+
+    def on_loss_limit(report: dict) -> None:
+        # tripped from a quote or fill callback; flatten now rather than on the next tick
+        risk.kill_switch = True
+        metrics.log_event("kill_switch", report)
+        asyncio.get_running_loop().create_task(kill_flatten())
+
+    async def kill_flatten() -> None:
+        try:
+            async with trade_lock:
+                await alerter.send("Kill switch", "daily loss limit reached, flattening positions", color=0xFF5C5C)
+                await flatten_all()
+        except Exception as e:
+            metrics.log_event("kill_switch_error", {"error": str(e)})
+
+    pnl = PnLEngine(ledger, cfg.risk.daily_loss_limit_usd, on_breach=on_loss_limit) if cfg.risk.streaming_pnl else None
+    if pnl:
+        metrics.unrealized = pnl.unrealized
 
     last_pos_ts = 0.0
     last_acct_ts = 0.0
 
     async def refresh_positions(force: bool = False) -> None:
-        nonlocal positions
+        # the ledger follows fills; broker positions are only pulled to check it for drift
         nonlocal last_pos_ts
         now = time.time()
-        if not force and now - last_pos_ts < 10:
+        if not force and now - last_pos_ts < cfg.position_reconcile_sec:
             return
+        since = ledger.version
         try:
-            pos_list = await broker.list_positions()
-            positions = {p.symbol: PositionState(symbol=p.symbol, qty=float(p.qty), avg_price=float(p.avg_entry_price)) for p in pos_list}
-            last_pos_ts = now
+            broker_positions = position_states(await broker.list_positions())
         except Exception as e:
             metrics.log_event("positions_error", {"error": str(e)})
+            return
+        last_pos_ts = now
+        equity = pnl.equity if pnl else None
+        drift = ledger.reconcile(broker_positions, since)
+        if drift:
+            metrics.log_event("position_drift", {sym: {"ledger": mine, "broker": theirs} for sym, (mine, theirs) in drift.items()})
+            if equity is not None:
+                # a corrected position is not PnL; keep the streaming estimate where it was
+                pnl.on_equity(equity)
+
+    async def reconcile_startup() -> None:
+        # orders and positions left by an earlier run, fetched in one concurrent round trip
+        nonlocal last_pos_ts
+        mode = cfg.session.reconcile_orders
+        if mode == "off":
+            await refresh_positions(force=True)
+            return
+        try:
+            open_orders, pos_list = await asyncio.gather(broker.list_orders(), broker.list_positions())
+            ledger.reset(position_states(pos_list))
+            last_pos_ts = time.time()
+            summary = await execution.reconcile(open_orders, [s.name for s in strategies], adopt=mode == "adopt")
+            metrics.log_event("reconcile", {"open_orders": len(open_orders), "positions": len(positions), **summary})
+        except Exception as e:
+            metrics.log_event("reconcile_error", {"error": str(e)})
+            await alerter.send("Reconcile error", str(e)[:180], color=0xFF5C5C)
 
     async def refresh_account() -> None:
         nonlocal last_acct_ts
@@ -63,16 +153,33 @@ async def run_trader(args: argparse.Namespace) -> None:
             return
         try:
             acct = await broker.get_account()
-            risk.update_account(float(acct.equity))
+            if pnl:
+                # the streaming estimate trips the kill switch; REST equity only re-anchors it
+                day = now_eastern().date()
+                if pnl.tripped and pnl.day is not None and day != pnl.day:
+                    # the daily loss limit re-arms on the next trading day
+                    risk.kill_switch = False
+                pnl.on_equity(float(acct.equity), day)
+            else:
+                risk.update_account(float(acct.equity))
             last_acct_ts = now
         except Exception as e:
             metrics.log_event("account_error", {"error": str(e)})
 
+    def record_cross(intent: OrderIntent, qty: float, price: float) -> None:
+        metrics.record_fill(intent.strategy, intent.symbol, qty, price, intent.side.value, mid=price)
+        if pnl:
+            pnl.on_fill(intent.strategy, intent.symbol, intent.side.value, qty, price, internal=True)
+
+    netter = IntentNetter(on_cross=record_cross, orders=execution.orders) if cfg.net_intents else None
+
     disabled_strats = set()
     reject_counts: Dict[str, int] = {}
-    filled_tracker: Dict[str, float] = {}
 
     async def handle_trade_update(update: dict) -> None:
+        if latency:
+            latency.on_trade_update(update)
+        delta_qty, price = ledger.on_trade_update(update)
         order = update.get("order", {})
         event = update.get("event")
         client_id = order.get("client_order_id", "")
@@ -85,18 +192,12 @@ async def run_trader(args: argparse.Namespace) -> None:
         if event in {"fill", "partial_fill"}:
             symbol = order.get("symbol")
             side = order.get("side")
-            order_id = order.get("id")
-            filled_qty = float(order.get("filled_qty", 0))
-            last_qty = filled_tracker.get(order_id, 0.0)
-            delta_qty = max(0.0, filled_qty - last_qty)
-            filled_tracker[order_id] = filled_qty
-            if delta_qty <= 0:
-                delta_qty = 0.0
-            price = float(order.get("filled_avg_price") or order.get("filled_avg_price", 0) or 0)
             st = data_stream.states.get(symbol)
             mid = st.mid if st else None
             if delta_qty > 0:
                 metrics.record_fill(strategy, symbol, delta_qty, price, side, mid=mid)
+                if pnl:
+                    pnl.on_fill(strategy, symbol, side, delta_qty, price)
                 await alerter.send(
                     "Trade execution",
                     f"{symbol} {side} {delta_qty:.4g} @ {price:.4f}",
@@ -110,21 +211,8 @@ async def run_trader(args: argparse.Namespace) -> None:
 
     trade_stream.add_handler(handle_trade_update)
 
-    strategies = []
-    if cfg.strategies.pairs:
-        strategies.append(PairsStatArb(cfg.pairs))
-    if cfg.strategies.mm:
-        strategies.append(AvellanedaStoikovMM(cfg.symbols))
-    if cfg.strategies.leadlag:
-        strategies.append(LeadLagArb(cfg.leader_symbol, cfg.lead_lag_symbols))
-    if cfg.strategies.etf:
-        strategies.append(ETFBasketArb(cfg.etf_pairs, cfg.etf_baskets))
-    news_strategy = None
-    if cfg.strategies.news:
-        news_strategy = NewsEventDriven(cfg.symbols)
-        strategies.append(news_strategy)
-    if cfg.strategies.ml:
-        strategies.append(MLOrderflow(cfg.symbols))
+    strategies = build_strategies(cfg)
+    news_strategy = next((s for s in strategies if isinstance(s, NewsEventDriven)), None)
 
     stream_symbols = list(dict.fromkeys(cfg.symbols + [s for strat in strategies for s in strat.symbols]))
     channel_count = 1 + (1 if cfg.subscribe_trades else 0) + (1 if cfg.subscribe_bars else 0)
@@ -135,6 +223,10 @@ async def run_trader(args: argparse.Namespace) -> None:
         metrics.log_event("symbol_cap", {"count": len(stream_symbols), "channels": channel_count})
         await alerter.send("symbol_cap", f"stream symbols capped at {len(stream_symbols)} for {channel_count} channels; reduce .env lists if needed")
 
+    recorder = TickRecorder(cfg.record_dir, stream_symbols) if cfg.record_ticks else None
+    if recorder:
+        recorder.start()
+
     data_stream = MarketDataStream(
         cfg.api_key_id,
         cfg.api_secret_key,
@@ -142,12 +234,48 @@ async def run_trader(args: argparse.Namespace) -> None:
         feed=cfg.feed,
         subscribe_bars=cfg.subscribe_bars,
         subscribe_trades=cfg.subscribe_trades,
+        columnar_state=cfg.columnar_state,
+        queue_size=cfg.ingest_queue_size,
+        fast_decode=cfg.fast_decode,
+        recorder=recorder,
+        url=cfg.data_stream_url,
+        bar_timeframes=cfg.bar_timeframes,
+        latency=latency,
+        history_symbols={s for strat in strategies for s in strat.symbols},
+        untraded_history=cfg.untraded_history,
     )
+    ledger.states = data_stream.states
+    data_stream.add_listener(ledger.on_tick)
+    if risk.pretrade:
+        risk.pretrade.states = data_stream.states
+        data_stream.add_listener(risk.pretrade.on_tick)
+    if pnl:
+        # after the ledger's listener, so the estimate sees the re-marked positions
+        pnl.states = data_stream.states
+        data_stream.add_listener(pnl.on_tick)
+    if cfg.exit_algo == "twap":
+        execution.slicer = ExitSlicer(
+            data_stream.states,
+            horizon_sec=cfg.exit_horizon_sec,
+            interval_sec=cfg.exit_slice_sec,
+            min_notional=cfg.exit_slice_min_notional,
+            on_done=lambda report: metrics.log_event("exit_algo", report),
+        )
 
     last_regular = False
     last_account_snapshot = None
+    trading_enabled = False
+    trade_lock = asyncio.Lock()
+    dispatcher = StrategyDispatcher(cfg.dispatch_min_interval_ms / 1000.0) if cfg.event_driven else None
+    last_stats_log = time.time()
+    last_cpu = time.process_time()
+    last_received = 0
+    if dispatcher:
+        for strat in strategies:
+            dispatcher.subscribe(strat)
+        data_stream.add_listener(dispatcher.mark_dirty)
 
-    async def tick() -> None:
+    async def housekeeping() -> bool:
         nonlocal last_regular
         if cfg.session.trade_only_regular_hours:
             ts = now_eastern()
@@ -155,35 +283,96 @@ async def run_trader(args: argparse.Namespace) -> None:
                 if last_regular:
                     await send_account_summary("Market closed")
                 last_regular = False
-                return
+                return False
             if not last_regular:
                 await send_account_summary("Market open")
                 last_regular = True
+            if execution.slicer:
+                # sliced exits must be done a minute before the close
+                execution.slicer.cutoff = time.time() + seconds_to_close(ts) - 60
             if seconds_to_close(ts) < cfg.session.flatten_before_close_minutes * 60:
-                await flatten_all()
-                return
+                async with trade_lock:
+                    await flatten_all()
+                return False
         await refresh_account()
         await refresh_positions()
-        gross = 0.0
-        net = 0.0
-        for sym, pos in positions.items():
-            st = data_stream.states.get(sym)
-            price = st.mid if st and st.mid > 0 else pos.avg_price
-            notional = pos.qty * price
-            gross += abs(notional)
-            net += notional
-        metrics.log_event("exposure", {"gross": gross, "net": net})
+        metrics.log_event("exposure", {"gross": ledger.gross, "net": ledger.net})
+        return True
+
+    async def run_strategies(active: list, since: float | None = None, cancel_stale: bool = True) -> None:
         intents: List[OrderIntent] = []
-        for strat in strategies:
+        for strat in active:
             if strat.name in disabled_strats:
                 continue
             intents.extend(strat.on_tick(data_stream, positions))
-        intents = risk.check(intents, positions, data_stream)
+            if latency:
+                latency.decided(strat.name)
+        intents = risk.check(intents, positions, data_stream, exposure=(ledger.gross, ledger.net), cancel_stale=cancel_stale)
+        if netter:
+            intents = netter.net(intents, data_stream, prune=cancel_stale)
+        if latency:
+            latency.risk_checked(i.symbol for i in intents)
+        if dispatcher and since is not None:
+            dispatcher.record_decision(since)
         if risk.kill_switch:
             await alerter.send("Kill switch", "daily loss limit reached, flattening positions", color=0xFF5C5C)
             await flatten_all()
             return
-        await execution.sync(intents)
+        try:
+            await execution.sync(intents, cancel_stale=cancel_stale, strategies=[strat.name for strat in active])
+        finally:
+            if latency:
+                latency.end_cycle()
+
+    def log_stats(force: bool = False) -> None:
+        nonlocal last_stats_log, last_cpu, last_received
+        now = time.time()
+        if not force and now - last_stats_log < 60:
+            return
+        elapsed = max(now - last_stats_log, 1e-6)
+        last_stats_log = now
+        ingest = data_stream.ingest_stats()
+        cpu = time.process_time()
+        ingest["msgs_per_sec"] = round((ingest["received"] - last_received) / elapsed, 1)
+        ingest["cpu_pct"] = round((cpu - last_cpu) / elapsed * 100, 1)
+        last_cpu, last_received = cpu, ingest["received"]
+        ingest["trade_stream_reconnects"] = trade_stream.reconnects
+        metrics.log_event("ingest", ingest)
+        if dispatcher:
+            metrics.log_event("dispatch_latency", dispatcher.snapshot())
+        metrics.log_event("broker", broker.stats())
+        orders = execution.orders.stats()
+        if execution.slicer:
+            orders["exits"] = execution.slicer.stats()
+        metrics.log_event("orders", orders)
+        metrics.log_event("positions", ledger.stats())
+        if netter:
+            metrics.log_event("netting", netter.stats())
+        if risk.pretrade:
+            metrics.log_event("pretrade", risk.pretrade.stats())
+        if pnl:
+            metrics.log_event("pnl", pnl.stats())
+        if latency and latency.hists:
+            metrics.log_event("order_latency", {"by_strategy": latency.snapshot(by_symbol=False), "by_symbol": latency.snapshot(), "pending": latency.pending()})
+
+    async def tick() -> None:
+        nonlocal trading_enabled
+        if recorder:
+            recorder.flush()
+        log_stats()
+        trading_enabled = await housekeeping()
+        if not trading_enabled:
+            return
+        if not dispatcher:
+            async with trade_lock:
+                await run_strategies(strategies)
+            return
+        # event-driven: strategies run from the dispatcher, the timer only sweeps
+        # the orders a strategy that ran during the interval stopped requesting
+        async with trade_lock:
+            if netter:
+                netter.sweep()
+            await execution.sweep_stale()
 
     async def tick_safe() -> None:
         try:
@@ -192,8 +381,18 @@ async def run_trader(args: argparse.Namespace) -> None:
             metrics.log_event("tick_error", {"error": str(e)})
             await alerter.send("Tick error", str(e)[:180], color=0xFF5C5C)
 
-    async def flatten_all() -> None:
-        await refresh_positions(force=True)
+    async def dispatch(active: list, since: float) -> None:
+        if not trading_enabled:
+            return
+        try:
+            async with trade_lock:
+                await run_strategies(active, since=since, cancel_stale=False)
+        except Exception as e:
+            metrics.log_event("dispatch_error", {"error": str(e)})
+            await alerter.send("Dispatch error", str(e)[:180], color=0xFF5C5C)
+
+    async def flatten_all(slice_exits: bool = True) -> None:
+        await refresh_positions()
         intents: List[OrderIntent] = []
         for sym, pos in positions.items():
             if pos.qty == 0:
@@ -201,8 +400,8 @@ async def run_trader(args: argparse.Namespace) -> None:
             st = data_stream.states.get(sym)
             price = st.mid if st and st.mid > 0 else pos.avg_price
             side = OrderSide.SELL if pos.qty > 0 else OrderSide.BUY
-            intents.append(OrderIntent(symbol=sym, side=side, qty=abs(pos.qty), limit_price=price, tif=TimeInForce.DAY, strategy="flatten", intent_id=f"{sym}-flat", order_type="market"))
-        await execution.sync(intents)
+            intents.append(OrderIntent(symbol=sym, side=side, qty=abs(pos.qty), limit_price=price, tif=TimeInForce.DAY, strategy=FLATTEN_STRATEGY, intent_id=f"{sym}-flat", order_type="market"))
+        await execution.sync(intents, slice_exits=slice_exits)
 
     async def send_account_summary(title: str) -> None:
         nonlocal last_account_snapshot
@@ -233,6 +432,7 @@ async def run_trader(args: argparse.Namespace) -> None:
 
     await data_stream.start()
     await trade_stream.start()
+    await reconcile_startup()
     await alerter.send("Startup", "Trader started", color=0x5865F2)
     await send_account_summary("Startup")
     if news_strategy:
@@ -246,6 +446,8 @@ async def run_trader(args: argparse.Namespace) -> None:
                 headline = n.headline if hasattr(n, "headline") else ""
                 if symbol and headline:
                     news_strategy.on_news(symbol, headline)
+                    if dispatcher:
+                        dispatcher.mark_dirty(symbol)
 
             news_stream.subscribe_news(_on_news, *cfg.symbols)
             asyncio.create_task(asyncio.to_thread(news_stream.run))
@@ -264,15 +466,25 @@ async def run_trader(args: argparse.Namespace) -> None:
         loop.add_signal_handler(sig, _stop)
 
     tick_task = asyncio.create_task(scheduler.start(tick_safe))
+    dispatch_task = asyncio.create_task(dispatcher.run(dispatch)) if dispatcher else None
     await stop_event.wait()
     scheduler.stop()
     await tick_task
+    if dispatcher:
+        dispatcher.stop()
+        await dispatch_task
+    log_stats(force=True)
     if cfg.session.cancel_all_on_shutdown:
         await broker.cancel_all()
-    await flatten_all()
+    # no time left to work exits in slices on the way out
+    await refresh_positions(force=True)
+    await flatten_all(slice_exits=False)
     await alerter.send("shutdown", "trader stopped")
     await trade_stream.stop()
     await data_stream.stop()
+    await broker.close()
+    if recorder:
+        await asyncio.to_thread(recorder.close)
     if news_stream:
         await news_stream.stop_ws()
     metrics.write_summary()
@@ -280,17 +492,18 @@ async def run_trader(args: argparse.Namespace) -> None:
 
 async def status_cmd(args: argparse.Namespace) -> None:
     cfg = load_config(args)
-    broker = Broker(cfg.api_key_id, cfg.api_secret_key, max_per_min=cfg.risk.max_trades_per_min)
+    broker = build_broker(cfg)
     acct = await broker.get_account()
     positions = await broker.list_positions()
     print(f"equity={acct.equity} cash={acct.cash} buying_power={acct.buying_power}")
     for p in positions:
         print(f"{p.symbol} qty={p.qty} avg={p.avg_entry_price} unrealized_pl={p.unrealized_pl}")
+    await broker.close()
 
 
 async def flatten_cmd(args: argparse.Namespace) -> None:
     cfg = load_config(args)
-    broker = Broker(cfg.api_key_id, cfg.api_secret_key, max_per_min=cfg.risk.max_trades_per_min)
+    broker = build_broker(cfg)
     positions = await broker.list_positions()
     for p in positions:
         qty = abs(float(p.qty))
@@ -298,13 +511,44 @@ async def flatten_cmd(args: argparse.Namespace) -> None:
             continue
         side = OrderSide.SELL if float(p.qty) > 0 else OrderSide.BUY
         await broker.submit_market(p.symbol, qty, side, TimeInForce.DAY, f"flatten-{p.symbol}-{int(time.time())}")
+    await broker.close()
+
+
+async def replay_cmd(args: argparse.Namespace) -> None:
+    from .replay import ReplayEngine
+
+    cfg = load_config(args)
+    day_dir = os.path.join(args.dir or cfg.record_dir, args.date)
+    if not os.path.isdir(day_dir):
+        print(f"no recording at {day_dir}")
+        return
+    risk = RiskManager(cfg.risk.max_gross_exposure_usd, cfg.risk.max_net_exposure_usd, cfg.risk.max_order_notional_usd, cfg.risk.max_position_notional_usd, cfg.risk.daily_loss_limit_usd)
+    metrics = Metrics(args.log_dir or os.path.join(cfg.log_dir, "replay", args.date))
+    engine = ReplayEngine(
+        lambda: build_strategies(cfg),
+        risk,
+        metrics,
+        day_dir,
+        tick_interval_sec=cfg.tick_interval_sec,
+        speed=args.speed,
+        max_open_orders=cfg.risk.max_open_orders,
+        columnar_state=cfg.columnar_state,
+        replace_tolerance_bps=cfg.replace_tolerance_bps,
+        replace_tolerance_ticks=cfg.replace_tolerance_ticks,
+        net_intents=cfg.net_intents,
+        untraded_history=cfg.untraded_history,
+    )
+    summary = await engine.run()
+    metrics.log_event("replay", summary)
+    metrics.write_summary()
+    for key, value in summary.items():
+        print(f"{key}={value}")
 
 
 async def backtest_pairs_cmd(args: argparse.Namespace) -> None:
     from alpaca.data.historical import StockHistoricalDataClient
-    from alpaca.data.requests import StockBarsRequest
-    from alpaca.data.timeframe import TimeFrame
-    import datetime as dt
+    from .bar_cache import BarCache
+    from .pairs_backtest import align, format_table, sweep
 
     cfg = load_config(args)
     pairs = [p.strip() for p in (args.pairs or ",".join(cfg.pairs)).split(",") if p.strip()]
@@ -312,16 +556,45 @@ async def backtest_pairs_cmd(args: argparse.Namespace) -> None:
         print("no pairs")
         return
     client = StockHistoricalDataClient(cfg.api_key_id, cfg.api_secret_key)
-    end = now_eastern()
+    cache = BarCache(cfg.bar_cache_dir, client)
+    end = now_eastern().date()
     start = end - dt.timedelta(days=args.days)
+    symbols = list(dict.fromkeys(s for pair in pairs for s in pair.split("/")))
+    fetched = await cache.fill(symbols, start, end)
+    print(f"bar cache: {fetched} chunk(s) fetched, {cache.requests} request(s)")
+    if args.refresh:
+        return
+    t0 = time.perf_counter()
+    series = {}
     for pair in pairs:
         s1, s2 = pair.split("/")
-        req = StockBarsRequest(symbol_or_symbols=[s1, s2], timeframe=TimeFrame.Minute, start=start, end=end)
-        barset = client.get_stock_bars(req)
-        data = barset.data
-        s1_bars = data.get(s1, [])[-3:]
-        s2_bars = data.get(s2, [])[-3:]
-        print(pair, {"s1": s1_bars, "s2": s2_bars})
+        series[pair] = align(cache.load(s1, start, end), cache.load(s2, start, end))
+        print(pair, {"bars": len(series[pair][0])})
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    def grid(raw: str, cast):
+        return [cast(v) for v in raw.split(",") if v.strip()]
+
+    t0 = time.perf_counter()
+    rows = await asyncio.to_thread(
+        sweep,
+        series,
+        grid(args.window, int),
+        grid(args.entry_z, float),
+        grid(args.exit_z, float),
+        grid(args.max_hold, int),
+        grid(args.notional, float),
+        args.cost_bps,
+        args.workers or None,
+    )
+    sweep_sec = time.perf_counter() - t0
+    print(format_table(rows, args.top))
+    print(f"{len(rows)} runs over {len(series)} pair(s) in {sweep_sec:.1f}s (bars loaded in {load_ms:.0f}ms)")
+    if args.out and rows:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
 
 
 def main() -> None:
@@ -332,6 +605,8 @@ def main() -> None:
         asyncio.run(status_cmd(args))
     elif args.cmd == "flatten":
         asyncio.run(flatten_cmd(args))
+    elif args.cmd == "replay":
+        asyncio.run(replay_cmd(args))
     elif args.cmd == "backtest_pairs":
         asyncio.run(backtest_pairs_cmd(args))
 
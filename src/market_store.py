@@ -0,0 +1,142 @@
+from __future__ import annotations
+from typing import Collection, Dict, List, Optional
+
+import numpy as np
+
+from .utils import clock
+from .utils.rolling import RingMatrix, RingRow
+from .utils.bar_builder import DEFAULT_TIMEFRAMES, BarBuilder
+from .utils.trade_flow import DEFAULT_WINDOWS, TradeFlow
+
+
+class ColumnarMarketState:
+    # Struct-of-arrays market state: one contiguous column per field indexed by
+    # symbol id, rolling history as one ring per symbol in a ring matrix.
+    # history_symbols (default: all) keep window samples of history; the rest
+    # are streamed but traded by no strategy and keep only short_window.
+    def __init__(self, symbols: List[str], window: int = 600, history_dtype=np.float32, flow_windows=DEFAULT_WINDOWS, bar_timeframes=DEFAULT_TIMEFRAMES, history_symbols: Optional[Collection[str]] = None, short_window: int = 30):
+        self.symbols = list(dict.fromkeys(symbols))
+        self.ids: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        full = set(self.symbols if history_symbols is None else history_symbols)
+        lens = [window if s in full else min(short_window, window) for s in self.symbols]
+        self.bid = np.zeros(n, dtype=np.float64)
+        self.ask = np.zeros(n, dtype=np.float64)
+        self.bid_size = np.zeros(n, dtype=np.float64)
+        self.ask_size = np.zeros(n, dtype=np.float64)
+        self.mid = np.zeros(n, dtype=np.float64)
+        self.last_trade = np.zeros(n, dtype=np.float64)
+        self.last_trade_size = np.zeros(n, dtype=np.float64)
+        self.last_update_ts = np.zeros(n, dtype=np.float64)
+        self.last_trade_ts = np.zeros(n, dtype=np.float64)
+        self.last_bar_close = np.zeros(n, dtype=np.float64)
+        self.mid_hist = RingMatrix(n, lens, dtype=history_dtype)
+        self.ret_hist = RingMatrix(n, lens, dtype=history_dtype)
+        self.spread_hist = RingMatrix(n, lens, dtype=history_dtype)
+        # trade flow and local bars are time-windowed per symbol, so they stay one
+        # object per row; flows are created on a row's first trade or read
+        self.flow_windows = flow_windows
+        self.flows: List[Optional[TradeFlow]] = [None] * n
+        self.bars = [BarBuilder(bar_timeframes, history=length) if length < window else BarBuilder(bar_timeframes) for length in lens]
+
+    def update_quote(self, i: int, bid: float, ask: float, bid_size: float, ask_size: float, ts: float) -> None:
+        self.bid[i] = bid
+        self.ask[i] = ask
+        self.bid_size[i] = bid_size
+        self.ask_size[i] = ask_size
+        self.last_update_ts[i] = ts
+        if bid > 0 and ask > 0:
+            mid = (bid + ask) / 2.0
+            prev = float(self.mid[i])
+            if prev > 0:
+                self.ret_hist.add(i, (mid - prev) / prev)
+            self.mid[i] = mid
+            self.mid_hist.add(i, mid)
+            self.spread_hist.add(i, ask - bid)
+            self.bars[i].on_quote(mid, ts)
+
+    def update_trade(self, i: int, price: float, size: float, ts: float) -> None:
+        self.last_trade[i] = price
+        self.last_trade_size[i] = size
+        self.last_trade_ts[i] = ts
+        self.flow(i).add(price, size, ts, float(self.bid[i]), float(self.ask[i]))
+        self.bars[i].on_trade(price, size, ts)
+
+    def flow(self, i: int) -> TradeFlow:
+        flow = self.flows[i]
+        if flow is None:
+            flow = self.flows[i] = TradeFlow(self.flow_windows)
+        return flow
+
+    def update_bar(self, i: int, close: float, ts: float) -> None:
+        self.last_bar_close[i] = close
+        self.last_update_ts[i] = ts
+
+    def views(self) -> Dict[str, "SymbolView"]:
+        return {s: SymbolView(self, i) for s, i in self.ids.items()}
+
+    def spreads(self) -> np.ndarray:
+        return self.ask - self.bid
+
+    def stale_mask(self, max_age_sec: float, now: float | None = None) -> np.ndarray:
+        now = clock.now() if now is None else now
+        return now - self.last_update_ts > max_age_sec
+
+    def nbytes(self) -> int:
+        cols = (self.bid, self.ask, self.bid_size, self.ask_size, self.mid, self.last_trade, self.last_trade_size, self.last_update_ts, self.last_trade_ts, self.last_bar_close)
+        total = sum(c.nbytes for c in cols)
+        return total + self.mid_hist.nbytes + self.ret_hist.nbytes + self.spread_hist.nbytes
+
+
+def _column(name: str) -> property:
+    def getter(self: "SymbolView") -> float:
+        return float(getattr(self._store, name)[self._i])
+
+    def setter(self: "SymbolView", value: float) -> None:
+        getattr(self._store, name)[self._i] = value
+
+    return property(getter, setter)
+
+
+class SymbolView:
+    # SymbolState-compatible facade over one row of a ColumnarMarketState.
+    __slots__ = ("_store", "_i", "symbol", "mid_window", "ret_window", "spread_window", "bars")
+
+    bid = _column("bid")
+    ask = _column("ask")
+    bid_size = _column("bid_size")
+    ask_size = _column("ask_size")
+    mid = _column("mid")
+    last_trade = _column("last_trade")
+    last_trade_size = _column("last_trade_size")
+    last_update_ts = _column("last_update_ts")
+    last_trade_ts = _column("last_trade_ts")
+    last_bar_close = _column("last_bar_close")
+
+    def __init__(self, store: ColumnarMarketState, i: int):
+        self._store = store
+        self._i = i
+        self.symbol = store.symbols[i]
+        self.mid_window = RingRow(store.mid_hist, i)
+        self.ret_window = RingRow(store.ret_hist, i)
+        self.spread_window = RingRow(store.spread_hist, i)
+        self.bars = store.bars[i]
+
+    @property
+    def flow(self) -> TradeFlow:
+        return self._store.flow(self._i)
+
+    def update_quote(self, bid: float, ask: float, bid_size: float, ask_size: float, ts: float) -> None:
+        self._store.update_quote(self._i, bid, ask, bid_size, ask_size, ts)
+
+    def update_trade(self, price: float, size: float, ts: float) -> None:
+        self._store.update_trade(self._i, price, size, ts)
+
+    def update_bar(self, close: float, ts: float) -> None:
+        self._store.update_bar(self._i, close, ts)
+
+    def quote_stale(self, max_age_sec: float) -> bool:
+        return clock.now() - float(self._store.last_update_ts[self._i]) > max_age_sec
+
+    def mid_returns_std(self) -> float:
+        return self.ret_window.std()
@@ -29,6 +29,8 @@ class Metrics:
         self.stats: Dict[str, StratStats] = {}
         self.positions: Dict[str, Dict[str, float]] = {}
         self.avg_cost: Dict[str, Dict[str, float]] = {}
+        # strategy -> open PnL marked to the mid, kept by the caller (e.g. PnLEngine)
+        self.unrealized: Dict[str, float] = {}
 
     def log_event(self, event: str, payload: dict) -> None:
         record = {"ts": time.time(), "event": event, **payload}
@@ -70,8 +72,13 @@ class Metrics:
         stats.max_drawdown = min(stats.max_drawdown, stats.pnl - stats.peak_pnl)
 
     def write_summary(self) -> None:
-        fields = ["strategy", "trades", "fills", "wins", "losses", "win_rate", "pnl", "turnover", "max_drawdown", "avg_slippage"]
+        fields = ["strategy", "trades", "fills", "wins", "losses", "win_rate", "pnl", "turnover", "max_drawdown", "avg_slippage", "unrealized_pnl"]
         write_header = not os.path.exists(self.csv_path)
+        if not write_header:
+            with open(self.csv_path, newline="", encoding="utf-8") as f:
+                header = next(csv.reader(f), None)
+            if header != fields:
+                self._migrate_summary(fields)
         with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
             w = csv.DictWriter(f, fieldnames=fields)
             if write_header:
@@ -88,4 +95,16 @@ class Metrics:
                     "turnover": round(stats.turnover, 2),
                     "max_drawdown": round(stats.max_drawdown, 2),
                     "avg_slippage": round((stats.slippage / stats.fills) if stats.fills else 0.0, 6),
+                    "unrealized_pnl": round(self.unrealized.get(name, 0.0), 2),
                 })
+
+    def _migrate_summary(self, fields: list) -> None:
+        # rewrites an older file under the current header; columns it lacks stay empty
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        tmp = self.csv_path + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=fields, restval="", extrasaction="ignore")
+            w.writeheader()
+            w.writerows(rows)
+        os.replace(tmp, self.csv_path)
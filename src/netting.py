@@ -0,0 +1,110 @@
+from __future__ import annotations
+from dataclasses import replace
+from typing import Callable, Container, Dict, List, Optional, Tuple
+
+from alpaca.trading.enums import OrderSide
+
+from .data_stream import MarketDataStream
+from .execution import OrderIntent, intent_client_id
+
+
+def _at_mid(intent: OrderIntent, mid: float) -> bool:
+    # willing to trade at the mid: a market order, or a limit at or through it
+    if intent.order_type == "market":
+        return True
+    if intent.limit_price is None:
+        return False
+    if intent.side == OrderSide.BUY:
+        return float(intent.limit_price) >= mid
+    return float(intent.limit_price) <= mid
+
+
+class IntentNetter:
+    # Sits between RiskManager.check and ExecutionEngine.sync. Opposite intents
+    # from different strategies on one symbol that would both trade at the mid
+    # are crossed internally at the mid; each strategy is credited its side of
+    # the cross and only the residual quantity goes to the broker. Strategies
+    # re-send standing intents every tick, so crossed quantity is remembered
+    # per intent until the strategy stops asking for it. An intent that already
+    # has an order at the broker (any key in `orders`) is not crossed: that
+    # order can fill on its own and the quantity would be counted twice.
+    def __init__(self, on_cross: Optional[Callable[[OrderIntent, float, float], None]] = None, orders: Optional[Container[str]] = None):
+        self.on_cross = on_cross
+        self.orders = orders if orders is not None else ()
+        self._crossed: Dict[str, float] = {}
+        self._deferred: set = set()
+        self.crosses = 0
+        self.crossed_qty = 0.0
+        self.crossed_notional = 0.0
+        self.netted_intents = 0
+
+    def net(self, intents: List[OrderIntent], data: MarketDataStream, prune: bool = True) -> List[OrderIntent]:
+        keys = [intent_client_id(i) for i in intents]
+        remaining: List[float] = []
+        seen = set()
+        by_symbol: Dict[str, Tuple[List[int], List[int]]] = {}
+        orders = self.orders
+        for idx, (intent, key) in enumerate(zip(intents, keys)):
+            left = 0.0 if key in seen else float(intent.qty) - self._crossed.get(key, 0.0)
+            seen.add(key)
+            remaining.append(left)
+            if left > 0 and key not in orders:
+                by_symbol.setdefault(intent.symbol, ([], []))[0 if intent.side == OrderSide.BUY else 1].append(idx)
+        for symbol, (buys, sells) in by_symbol.items():
+            if not buys or not sells:
+                continue
+            st = data.states.get(symbol)
+            mid = st.mid if st else 0.0
+            if mid <= 0:
+                continue
+            sells = [s for s in sells if _at_mid(intents[s], mid)]
+            for b in buys:
+                if not sells or not _at_mid(intents[b], mid):
+                    continue
+                for s in sells:
+                    if remaining[b] <= 0:
+                        break
+                    if remaining[s] <= 0 or intents[s].strategy == intents[b].strategy:
+                        continue
+                    qty = min(remaining[b], remaining[s])
+                    remaining[b] -= qty
+                    remaining[s] -= qty
+                    self.crosses += 1
+                    self.crossed_qty += qty
+                    self.crossed_notional += qty * mid
+                    for idx in (b, s):
+                        self._crossed[keys[idx]] = self._crossed.get(keys[idx], 0.0) + qty
+                        if self.on_cross:
+                            self.on_cross(intents[idx], qty, mid)
+        if prune:
+            self._prune(seen)
+        else:
+            self._deferred |= seen
+        out: List[OrderIntent] = []
+        for intent, left in zip(intents, remaining):
+            if left <= 1e-9:
+                continue
+            if left < float(intent.qty):
+                self.netted_intents += 1
+                intent = replace(intent, qty=left)
+            out.append(intent)
+        return out
+
+    def sweep(self) -> None:
+        # forgets crosses for intents no net(prune=False) call has seen since the last sweep
+        self._prune(set())
+
+    def _prune(self, present: set) -> None:
+        keep = present | self._deferred
+        self._deferred = set()
+        if self._crossed:
+            self._crossed = {k: v for k, v in self._crossed.items() if k in keep}
+
+    def stats(self) -> dict:
+        return {
+            "crosses": self.crosses,
+            "crossed_qty": round(self.crossed_qty, 4),
+            "crossed_notional": round(self.crossed_notional, 2),
+            "netted_intents": self.netted_intents,
+            "standing": len(self._crossed),
+        }
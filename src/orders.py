@@ -0,0 +1,185 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .utils import clock
+
+PENDING_NEW = "pending_new"
+LIVE = "live"
+PENDING_REPLACE = "pending_replace"
+PENDING_CANCEL = "pending_cancel"
+PARTIALLY_FILLED = "partially_filled"
+DONE = "done"
+
+IN_FLIGHT = frozenset({PENDING_NEW, PENDING_REPLACE, PENDING_CANCEL})
+WORKING = frozenset({LIVE, PARTIALLY_FILLED})
+ACK_EVENTS = frozenset({"new", "accepted", "pending_new"})
+FINAL_EVENTS = frozenset({"fill", "canceled", "expired", "rejected", "done_for_day"})
+
+
+@dataclass
+class ManagedOrder:
+    key: str
+    client_order_id: str
+    symbol: str
+    side: str
+    qty: float
+    limit_price: Optional[float]
+    strategy: str
+    state: str = PENDING_NEW
+    order_id: Optional[str] = None
+    filled_qty: float = 0.0
+    # client id of the order a replace in flight will create
+    pending_client_order_id: Optional[str] = None
+    ts: float = 0.0
+    # unfilled quantity last reported to the tracker's listener, and the part of
+    # it reported as having a request in flight
+    working: float = 0.0
+    flying: float = 0.0
+
+
+class OrderTracker:
+    # One working order per intent key, moved through
+    # pending_new -> live -> (pending_replace | pending_cancel | partially_filled) -> done
+    # by REST results and trade_updates. Orders are indexed by every client
+    # order id they answer to, by symbol, by strategy and by whether a request
+    # is in flight for them. `listener` is told of every change in an order's
+    # unfilled quantity as (order, delta, in_flight_delta), the latter counting
+    # only while a request is in flight for the order.
+    def __init__(self, listener: Optional[Callable[[ManagedOrder, float, float], None]] = None):
+        self.listener = listener
+        self.orders: Dict[str, ManagedOrder] = {}
+        self._by_client_id: Dict[str, ManagedOrder] = {}
+        self._by_symbol: Dict[str, Dict[str, ManagedOrder]] = {}
+        self._by_strategy: Dict[str, Dict[str, ManagedOrder]] = {}
+        self._in_flight: Dict[str, ManagedOrder] = {}
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.orders
+
+    def __iter__(self) -> Iterator[ManagedOrder]:
+        return iter(list(self.orders.values()))
+
+    def get(self, key: str) -> Optional[ManagedOrder]:
+        return self.orders.get(key)
+
+    def for_symbol(self, symbol: str) -> List[ManagedOrder]:
+        return list(self._by_symbol.get(symbol, {}).values())
+
+    def for_strategy(self, strategy: str) -> List[ManagedOrder]:
+        return list(self._by_strategy.get(strategy, {}).values())
+
+    def in_flight(self) -> List[ManagedOrder]:
+        return list(self._in_flight.values())
+
+    def add(self, order: ManagedOrder) -> None:
+        order.ts = clock.now()
+        self.orders[order.key] = order
+        self._by_client_id[order.client_order_id] = order
+        self._by_symbol.setdefault(order.symbol, {})[order.key] = order
+        self._by_strategy.setdefault(order.strategy, {})[order.key] = order
+        if order.state in IN_FLIGHT:
+            self._in_flight[order.key] = order
+        self._report(order)
+
+    def set_state(self, order: ManagedOrder, state: str) -> None:
+        if order.state == DONE:
+            return
+        order.state = state
+        order.ts = clock.now()
+        if state in IN_FLIGHT:
+            if self.orders.get(order.key) is order:
+                self._in_flight[order.key] = order
+        elif self._in_flight.get(order.key) is order:
+            del self._in_flight[order.key]
+        if state == DONE:
+            self._retire(order)
+        else:
+            self._report(order)
+
+    def _retire(self, order: ManagedOrder) -> None:
+        if self.orders.get(order.key) is order:
+            del self.orders[order.key]
+            self._report(order)
+        for client_id in (order.client_order_id, order.pending_client_order_id):
+            if client_id and self._by_client_id.get(client_id) is order:
+                del self._by_client_id[client_id]
+        for index, name in ((self._by_symbol, order.symbol), (self._by_strategy, order.strategy)):
+            bucket = index.get(name)
+            if bucket is not None and bucket.get(order.key) is order:
+                del bucket[order.key]
+                if not bucket:
+                    del index[name]
+
+    def begin_replace(self, order: ManagedOrder, client_order_id: str) -> None:
+        order.pending_client_order_id = client_order_id
+        self._by_client_id[client_order_id] = order
+        self.set_state(order, PENDING_REPLACE)
+
+    def finish_replace(self, order: ManagedOrder, order_id: str, qty: float, limit_price: float) -> None:
+        if order.state == DONE:
+            return
+        if order.pending_client_order_id:
+            self._promote(order, order_id)
+        order.qty = qty
+        order.limit_price = limit_price
+        self._report(order)
+        self.set_state(order, PARTIALLY_FILLED if order.filled_qty > 0 else LIVE)
+
+    def abort_replace(self, order: ManagedOrder) -> None:
+        client_id, order.pending_client_order_id = order.pending_client_order_id, None
+        if client_id and self._by_client_id.get(client_id) is order:
+            del self._by_client_id[client_id]
+        if order.state == PENDING_REPLACE:
+            self.set_state(order, PARTIALLY_FILLED if order.filled_qty > 0 else LIVE)
+
+    def _promote(self, order: ManagedOrder, order_id: Optional[str]) -> None:
+        # the replacement order is now the working one; the replaced order's id is dropped
+        old = order.client_order_id
+        if self._by_client_id.get(old) is order:
+            del self._by_client_id[old]
+        order.client_order_id = order.pending_client_order_id
+        order.pending_client_order_id = None
+        order.order_id = order_id
+        order.filled_qty = 0.0
+        self._report(order)
+
+    def apply(self, event: str, payload: dict) -> Optional[ManagedOrder]:
+        client_id = payload.get("client_order_id")
+        order = self._by_client_id.get(client_id) if client_id else None
+        if order is None or order.state == DONE:
+            return None
+        if client_id == order.pending_client_order_id:
+            self._promote(order, str(payload.get("id") or "") or None)
+        elif client_id != order.client_order_id:
+            return None
+        if payload.get("id") and not order.order_id:
+            order.order_id = str(payload["id"])
+        if event in FINAL_EVENTS:
+            self.set_state(order, DONE)
+        elif event == "partial_fill":
+            order.filled_qty = float(payload.get("filled_qty") or 0.0)
+            self._report(order)
+            if order.state in (PENDING_NEW, LIVE):
+                self.set_state(order, PARTIALLY_FILLED)
+        elif event in ACK_EVENTS and order.state == PENDING_NEW:
+            self.set_state(order, LIVE)
+        return order
+
+    def _report(self, order: ManagedOrder) -> None:
+        working = max(order.qty - order.filled_qty, 0.0) if order.state != DONE and self.orders.get(order.key) is order else 0.0
+        flying = working if order.state in IN_FLIGHT else 0.0
+        if working != order.working or flying != order.flying:
+            delta, order.working = working - order.working, working
+            in_flight, order.flying = flying - order.flying, flying
+            if self.listener:
+                self.listener(order, delta, in_flight)
+
+    def stats(self) -> dict:
+        counts: Dict[str, int] = {}
+        for order in self.orders.values():
+            counts[order.state] = counts.get(order.state, 0) + 1
+        return {"orders": len(self.orders), **counts}
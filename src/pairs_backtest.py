@@ -0,0 +1,189 @@
+from __future__ import annotations
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# PairsStatArb warm-up: beta stays 1.0 until the regression has this many
+# samples, and no z-score is acted on until the spread window has this many.
+MIN_BETA_SAMPLES = 50
+MIN_SPREAD_SAMPLES = 30
+# Shifts UTC timestamps so every US session (04:00-20:00 ET) falls in one day bucket.
+_DAY_OFFSET_SEC = 5 * 3600
+
+Series = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+@dataclass(frozen=True)
+class PairParams:
+    window: int = 600
+    entry_z: float = 2.0
+    exit_z: float = 0.5
+    max_hold_sec: int = 300
+    notional: float = 1000.0
+
+
+def align(b1: Dict[str, np.ndarray], b2: Dict[str, np.ndarray]) -> Series:
+    ts, i1, i2 = np.intersect1d(b1["ts"], b2["ts"], assume_unique=True, return_indices=True)
+    return ts, np.asarray(b1["close"], dtype=np.float64)[i1], np.asarray(b2["close"], dtype=np.float64)[i2]
+
+
+def _trailing_sum(x: np.ndarray, window: int) -> np.ndarray:
+    c = np.concatenate(([0.0], np.cumsum(x)))
+    lo = np.maximum(np.arange(1, len(x) + 1) - window, 0)
+    return c[1:] - c[lo]
+
+
+def signals(p1: np.ndarray, p2: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Same numbers PairsStatArb produces tick by tick: beta from a trailing OLS of
+    # p1 on p2, spread recorded with the beta of its own bar, z against the
+    # trailing mean/sample std of those spreads.
+    n = len(p1)
+    counts = np.minimum(np.arange(1, n + 1), window).astype(np.float64)
+    # centre on the first bar so the sums of squares keep their precision
+    x = p2 - p2[0]
+    y = p1 - p1[0]
+    sx = _trailing_sum(x, window)
+    sy = _trailing_sum(y, window)
+    sxx = _trailing_sum(x * x, window) - sx * sx / counts
+    sxy = _trailing_sum(x * y, window) - sx * sy / counts
+    beta = np.ones(n)
+    ok = (counts >= MIN_BETA_SAMPLES) & (sxx > 0.0)
+    beta[ok] = sxy[ok] / sxx[ok]
+    spread = p1 - beta * p2
+    s = spread - spread[0]
+    ss = _trailing_sum(s, window)
+    mean = ss / counts
+    var = np.zeros(n)
+    many = counts >= 2
+    var[many] = np.maximum(_trailing_sum(s * s, window)[many] - ss[many] * mean[many], 0.0) / (counts[many] - 1)
+    std = np.sqrt(var)
+    z = np.zeros(n)
+    nz = std > 0.0
+    z[nz] = (s[nz] - mean[nz]) / std[nz]
+    valid = counts >= MIN_SPREAD_SAMPLES
+    return beta, z, valid
+
+
+def trades(ts: np.ndarray, z: np.ndarray, valid: np.ndarray, entry_z: float, exit_z: float, max_hold_sec: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Walks trade to trade (not bar to bar) with searchsorted over the candidate
+    # entry/exit bars. Returns entry index, exit index and direction (+1 long spread).
+    n = len(ts)
+    entries = np.flatnonzero(valid & (np.abs(z) > entry_z))
+    exits = np.flatnonzero(valid & (np.abs(z) < exit_z))
+    out_in: List[int] = []
+    out_out: List[int] = []
+    k = 0
+    while k < len(entries):
+        i = int(entries[k])
+        e = np.searchsorted(exits, i, side="right")
+        j = int(exits[e]) if e < len(exits) else n
+        j = min(j, int(np.searchsorted(ts, ts[i] + max_hold_sec, side="right")))
+        if j >= n:
+            # still open at the end of the data: marked out at the last bar
+            j = n - 1
+            if j == i:
+                break
+        out_in.append(i)
+        out_out.append(j)
+        k = int(np.searchsorted(entries, j, side="right"))
+    idx_in = np.asarray(out_in, dtype=np.int64)
+    idx_out = np.asarray(out_out, dtype=np.int64)
+    return idx_in, idx_out, np.where(z[idx_in] < 0, 1.0, -1.0)
+
+
+def simulate(ts: np.ndarray, p1: np.ndarray, p2: np.ndarray, beta: np.ndarray, z: np.ndarray, valid: np.ndarray,
+             entry_z: float, exit_z: float, max_hold_sec: float, notional: float, cost_bps: float = 0.0) -> dict:
+    n = len(ts)
+    idx_in, idx_out, direction = trades(ts, z, valid, entry_z, exit_z, max_hold_sec)
+    q1 = np.maximum(1.0, np.floor(notional / p1[idx_in])) * direction
+    q2 = -np.maximum(1.0, np.floor(notional * np.abs(beta[idx_in]) / p2[idx_in])) * direction
+    d1 = np.zeros(n)
+    d2 = np.zeros(n)
+    np.add.at(d1, idx_in, q1)
+    np.add.at(d1, idx_out, -q1)
+    np.add.at(d2, idx_in, q2)
+    np.add.at(d2, idx_out, -q2)
+    pos1 = np.cumsum(d1)
+    pos2 = np.cumsum(d2)
+    traded = np.abs(d1) * p1 + np.abs(d2) * p2
+    pnl = np.zeros(n)
+    pnl[1:] = pos1[:-1] * np.diff(p1) + pos2[:-1] * np.diff(p2)
+    pnl -= traded * cost_bps * 1e-4
+    equity = np.cumsum(pnl)
+    drawdown = float(np.max(np.maximum.accumulate(np.maximum(equity, 0.0)) - equity)) if n else 0.0
+    day = np.floor((ts - _DAY_OFFSET_SEC) / 86400.0)
+    starts = np.flatnonzero(np.diff(day, prepend=np.nan) != 0) if n else np.zeros(0, dtype=np.int64)
+    daily = np.add.reduceat(pnl, starts) if n else np.zeros(0)
+    sharpe = 0.0
+    if len(daily) >= 2:
+        sd = float(daily.std(ddof=1))
+        if sd > 0.0:
+            sharpe = float(daily.mean()) / sd * math.sqrt(252)
+    total = float(equity[-1]) if n else 0.0
+    wins = 0
+    if len(idx_in):
+        leg = q1 * (p1[idx_out] - p1[idx_in]) + q2 * (p2[idx_out] - p2[idx_in])
+        wins = int((leg > 0).sum())
+    return {
+        "pnl": round(total, 2),
+        "sharpe": round(sharpe, 3),
+        "max_drawdown": round(drawdown, 2),
+        "trades": int(len(idx_in)),
+        "win_rate": round(wins / len(idx_in), 3) if len(idx_in) else 0.0,
+        "turnover": round(float(traded.sum()), 2),
+        "days": int(len(daily)),
+    }
+
+
+_SERIES: Dict[str, Series] = {}
+
+
+def _init_worker(series: Dict[str, Series]) -> None:
+    global _SERIES
+    _SERIES = series
+
+
+def _run_window(pair: str, window: int, grid: List[Tuple[float, float, int, float]], cost_bps: float) -> List[dict]:
+    # One task per (pair, window): the rolling beta/z are shared by every
+    # entry/exit/hold/notional combination.
+    ts, p1, p2 = _SERIES[pair]
+    beta, z, valid = signals(p1, p2, window)
+    rows = []
+    for entry_z, exit_z, max_hold_sec, notional in grid:
+        params = PairParams(window, entry_z, exit_z, max_hold_sec, notional)
+        stats = simulate(ts, p1, p2, beta, z, valid, entry_z, exit_z, max_hold_sec, notional, cost_bps)
+        rows.append({"pair": pair, **asdict(params), **stats})
+    return rows
+
+
+def sweep(series: Dict[str, Series], windows: Sequence[int], entry_zs: Sequence[float], exit_zs: Sequence[float],
+          max_holds: Sequence[int], notionals: Sequence[float], cost_bps: float = 0.0, workers: Optional[int] = None) -> List[dict]:
+    grid = [g for g in itertools.product(entry_zs, exit_zs, max_holds, notionals) if g[1] < g[0]]
+    tasks = [(pair, w) for pair in series for w in windows if len(series[pair][0]) > MIN_SPREAD_SAMPLES]
+    workers = workers or os.cpu_count() or 1
+    rows: List[dict] = []
+    if workers <= 1 or len(tasks) <= 1:
+        _init_worker(series)
+        for pair, w in tasks:
+            rows.extend(_run_window(pair, w, grid, cost_bps))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker, initargs=(series,)) as pool:
+            futures = [pool.submit(_run_window, pair, w, grid, cost_bps) for pair, w in tasks]
+            for fut in futures:
+                rows.extend(fut.result())
+    rows.sort(key=lambda r: (r["sharpe"], r["pnl"]), reverse=True)
+    return rows
+
+
+def format_table(rows: List[dict], top: int = 20) -> str:
+    cols = ["pair", "window", "entry_z", "exit_z", "max_hold_sec", "notional", "sharpe", "pnl", "max_drawdown", "turnover", "trades", "win_rate"]
+    body = [[str(r[c]) for c in cols] for r in rows[:top]]
+    widths = [max(len(c), *(len(b[i]) for b in body)) if body else len(c) for i, c in enumerate(cols)]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(cols, widths))]
+    lines.extend("  ".join(v.rjust(w) for v, w in zip(b, widths)) for b in body)
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+import datetime as dt
+from typing import Callable, Dict, List, Mapping, Optional
+
+from .ledger import PositionLedger
+
+
+class PnLEngine:
+    # Intraday PnL kept current from quotes and fills instead of the polled
+    # account equity. Equity is estimated as the last REST equity (the anchor)
+    # plus the change since then in the ledger's marked position value and in
+    # cash from fills, so it moves on every quote the ledger re-marks. The loss
+    # limit is checked on every quote and fill and on_breach fires once when it
+    # is crossed. REST equity only re-anchors the estimate. Per strategy, fills
+    # are booked at average cost for realized PnL, and open quantity is marked
+    # to the mid for unrealized PnL. The first equity of each trading day is
+    # that day's start; realized PnL and the loss limit reset with it.
+    def __init__(self, ledger: PositionLedger, daily_loss_limit: float, states: Optional[Mapping] = None, on_breach: Optional[Callable[[dict], None]] = None):
+        self.ledger = ledger
+        self.daily_loss_limit = daily_loss_limit
+        self.states = states
+        self.on_breach = on_breach
+        self.start_equity: Optional[float] = None
+        self.day: Optional[dt.date] = None
+        # equity minus (marked positions + cash) at the last anchor
+        self._offset: Optional[float] = None
+        self.cash = 0.0
+        self.tripped = False
+        self.anchors = 0
+        self.realized: Dict[str, float] = {}
+        self.unrealized: Dict[str, float] = {}
+        # symbol -> strategy -> [qty, avg cost, mark]
+        self._books: Dict[str, Dict[str, List[float]]] = {}
+
+    @property
+    def equity(self) -> Optional[float]:
+        if self._offset is None:
+            return None
+        return self._offset + self.ledger.net + self.cash
+
+    @property
+    def intraday(self) -> float:
+        equity = self.equity
+        if equity is None or self.start_equity is None:
+            return 0.0
+        return equity - self.start_equity
+
+    def on_equity(self, equity: float, day: Optional[dt.date] = None) -> None:
+        # day: the trading day the equity was read on; None re-anchors within the current one
+        if day is not None and day != self.day:
+            if self.day is not None:
+                self.start_equity = None
+                self.tripped = False
+                for strategy in self.realized:
+                    self.realized[strategy] = 0.0
+            self.day = day
+        if self.start_equity is None:
+            self.start_equity = equity
+        self._offset = equity - (self.ledger.net + self.cash)
+        self.anchors += 1
+        self._check()
+
+    def on_tick(self, symbol: str, recv_ts: float = 0.0) -> None:
+        # runs after the ledger's listener has re-marked the symbol
+        book = self._books.get(symbol)
+        if book:
+            st = self.states.get(symbol) if self.states is not None else None
+            if st is not None and st.mid > 0:
+                mid = st.mid
+                for strategy, entry in book.items():
+                    self.unrealized[strategy] += entry[0] * (mid - entry[2])
+                    entry[2] = mid
+        self._check()
+
+    def on_fill(self, strategy: str, symbol: str, side: str, qty: float, price: float, internal: bool = False) -> None:
+        # internal: one leg of a cross between strategies, which moves no cash or
+        # account position and is booked per strategy only
+        signed = qty if side == "buy" else -qty
+        if not internal:
+            self.cash -= signed * price
+        book = self._books.setdefault(symbol, {})
+        entry = book.get(strategy)
+        if entry is None:
+            entry = book[strategy] = [0.0, price, price]
+            self.unrealized.setdefault(strategy, 0.0)
+            self.realized.setdefault(strategy, 0.0)
+        pos, avg, mark = entry
+        new = pos + signed
+        if pos != 0.0 and pos * signed < 0:
+            closed = min(abs(signed), abs(pos))
+            self.realized[strategy] += closed * (price - avg) * (1.0 if pos > 0 else -1.0)
+        if pos == 0.0 or pos * new < 0:
+            avg = price
+        elif abs(new) > abs(pos):
+            avg = (avg * abs(pos) + price * abs(signed)) / abs(new)
+        st = self.states.get(symbol) if self.states is not None else None
+        mid = st.mid if st is not None and st.mid > 0 else price
+        self.unrealized[strategy] += new * (mid - avg) - pos * (mark - entry[1])
+        if abs(new) < 1e-9:
+            del book[strategy]
+            if not book:
+                del self._books[symbol]
+        else:
+            entry[0], entry[1], entry[2] = new, avg, mid
+        if not internal:
+            self._check()
+
+    def _check(self) -> None:
+        if self.tripped or self._offset is None:
+            return
+        loss = -self.intraday
+        if loss >= self.daily_loss_limit:
+            self.tripped = True
+            if self.on_breach:
+                self.on_breach(self.stats())
+
+    def stats(self) -> dict:
+        equity = self.equity
+        return {
+            "equity": round(equity, 2) if equity is not None else None,
+            "start_equity": self.start_equity,
+            "day": self.day.isoformat() if self.day else None,
+            "intraday": round(self.intraday, 2),
+            "realized": {k: round(v, 2) for k, v in self.realized.items()},
+            "unrealized": {k: round(v, 2) for k, v in self.unrealized.items()},
+            "anchors": self.anchors,
+            "tripped": self.tripped,
+        }
@@ -0,0 +1,245 @@
+from __future__ import annotations
+from itertools import compress
+from operator import attrgetter, not_
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+from alpaca.trading.enums import OrderSide
+
+from .execution import OrderIntent
+from .orders import ManagedOrder, OrderTracker
+
+REASONS = ("ok", "no_price", "order_notional", "position_notional", "gross_exposure", "net_exposure")
+OK, NO_PRICE, ORDER_NOTIONAL, POSITION_NOTIONAL, GROSS_EXPOSURE, NET_EXPOSURE = range(len(REASONS))
+
+_symbol_side = attrgetter("symbol", "side")
+_qty = attrgetter("qty")
+_intent_id = attrgetter("intent_id")
+_strategy = attrgetter("strategy")
+
+
+def _resends(intent: OrderIntent, order: ManagedOrder) -> bool:
+    # same key as intent_client_id without formatting it
+    return intent.strategy == order.strategy and intent.symbol == order.symbol and intent.side == order.side
+
+
+class PreTradeRisk:
+    # Batch pre-trade limits on worst-case exposure: positions plus working
+    # orders plus the intents accepted earlier in the same batch, per symbol
+    # and portfolio-wide. Each symbol has a buy slot and a sell slot; marks,
+    # position bounds and working quantity (all of it, and the part with a
+    # request in flight) live in per-slot arrays updated from the quote
+    # stream, the ledger and the order tracker as they change, so a batch
+    # costs one lookup pass over the intents and a handful of numpy passes.
+    # A working order drops out only if this batch's sync replaces or cancels
+    # it: with cancel_stale every settled order is re-priced or canceled,
+    # otherwise only orders whose intent is re-sent. Intents are judged
+    # against everything earlier in the batch that passed the per-order
+    # checks, which is conservative when a later limit rejects one of them.
+    # Intents that reduce a side's exposure always pass.
+    def __init__(self, max_gross: float, max_net: float, max_order_notional: float, max_pos_notional: float, states: Optional[Mapping] = None, orders: Optional[OrderTracker] = None, capacity: int = 256):
+        self.max_gross = max_gross
+        self.max_net = max_net
+        self.max_order_notional = max_order_notional
+        self.max_pos_notional = max_pos_notional
+        self.states = states
+        self.orders = orders
+        self.index: Dict[str, int] = {}
+        # (symbol, side) -> slot: buys at the symbol's column, sells at capacity + column.
+        # OrderSide is a str enum, so orders' "buy"/"sell" find the same keys
+        self.slots: Dict[Tuple[str, OrderSide], int] = {}
+        self.capacity = capacity
+        # the symbol's mark in both of its slots
+        self.price = np.zeros(2 * capacity)
+        # the long bound on the buy slot, the short bound (as a positive quantity) on the sell slot
+        self.pos = np.zeros(2 * capacity)
+        # unfilled quantity of working orders, and the part of it with a request in flight
+        self.work = np.zeros(2 * capacity)
+        self.flying = np.zeros(2 * capacity)
+        self.rejects = np.zeros(len(REASONS), dtype=np.int64)
+        self.fast = 0
+        self._arange = np.arange(capacity)
+
+    def _sym(self, symbol: str) -> int:
+        idx = self.index.get(symbol)
+        if idx is None:
+            idx = self.index[symbol] = len(self.index)
+            if idx >= self.capacity:
+                self._grow()
+            self.slots[symbol, OrderSide.BUY] = idx
+            self.slots[symbol, OrderSide.SELL] = self.capacity + idx
+            st = self.states.get(symbol) if self.states is not None else None
+            if st is not None:
+                self.price[idx] = self.price[self.capacity + idx] = st.mid
+        return idx
+
+    def _grow(self) -> None:
+        old = self.capacity
+        self.capacity = 2 * old
+        for name in ("price", "pos", "work", "flying"):
+            rows = getattr(self, name).reshape(2, old)
+            setattr(self, name, np.concatenate([rows, np.zeros((2, old))], axis=1).ravel())
+        for symbol, idx in self.index.items():
+            self.slots[symbol, OrderSide.SELL] = self.capacity + idx
+
+    def on_tick(self, symbol: str, recv_ts: float = 0.0) -> None:
+        idx = self.index.get(symbol)
+        if idx is not None:
+            st = self.states.get(symbol)
+            if st is not None:
+                mid = st.mid
+                if mid > 0:
+                    self.price[idx] = self.price[self.capacity + idx] = mid
+
+    def on_position(self, symbol: str, qty: float) -> None:
+        idx = self._sym(symbol)
+        self.pos[idx] = qty
+        self.pos[self.capacity + idx] = -qty
+
+    def on_order(self, order: ManagedOrder, qty: float, in_flight: float = 0.0) -> None:
+        # OrderTracker listener: changes in the order's unfilled and in-flight quantity
+        slot = self.slots.get((order.symbol, order.side))
+        if slot is None:
+            self._sym(order.symbol)
+            slot = self.slots[order.symbol, order.side]
+        self.work[slot] += qty
+        if in_flight:
+            self.flying[slot] += in_flight
+
+    def _resent(self, intents: List[OrderIntent], base: np.ndarray) -> None:
+        # takes the working orders the batch re-sends out of base; only the
+        # batch's own strategies can re-send one
+        if self.orders is None:
+            return
+        by_id = dict(zip(map(_intent_id, intents), intents))
+        for name in set(map(_strategy, intents)):
+            for o in self.orders.for_strategy(name):
+                if not o.working:
+                    continue
+                # order keys are strategy:intent_id:symbol:side
+                intent_id = o.key[len(o.strategy) + 1:len(o.key) - len(o.symbol) - len(o.side) - 2]
+                intent = by_id.get(intent_id)
+                if intent is None:
+                    continue
+                if not _resends(intent, o) and not any(_resends(i, o) for i in intents if i.intent_id == intent_id):
+                    continue
+                base[self.slots[o.symbol, o.side]] -= o.working
+
+    def _breaches(self, value: np.ndarray, slot: np.ndarray) -> Tuple[bool, bool, bool]:
+        # the limits the batch's end state breaks: net, gross, per-symbol
+        cap = self.capacity
+        long, short = value[:cap], value[cap:]
+        check_net = long.sum() > self.max_net or short.sum() > self.max_net
+        check_gross = np.maximum(long, short).sum() > self.max_gross
+        check_pos = value.max() > self.max_pos_notional and (value.take(slot) > self.max_pos_notional).any()
+        return bool(check_net), bool(check_gross), bool(check_pos)
+
+    def evaluate(self, intents: List[OrderIntent], cancel_stale: bool = True) -> np.ndarray:
+        # reason code per intent, OK (0) when accepted
+        n = len(intents)
+        if n == 0:
+            return np.zeros(0, dtype=np.int8)
+        try:
+            slot = np.fromiter(map(self.slots.__getitem__, map(_symbol_side, intents)), dtype=np.intp, count=n)
+        except KeyError:
+            for symbol in {intent.symbol for intent in intents}:
+                self._sym(symbol)
+            slot = np.fromiter(map(self.slots.__getitem__, map(_symbol_side, intents)), dtype=np.intp, count=n)
+        qty = np.fromiter(map(_qty, intents), dtype=float, count=n)
+        px = self.price
+        price = px.take(slot)
+        notional = qty * price
+        no_price = too_big = None
+        if price.min() <= 0 or notional.max() > self.max_order_notional:
+            no_price = price <= 0
+            too_big = notional > self.max_order_notional
+            skip = no_price | too_big
+            qty = np.where(skip, 0.0, qty)
+            notional = np.where(skip, 0.0, notional)
+        # every bound only grows through a batch, so if the state after all of
+        # it is inside the limits, so was the state before each intent
+        batch = np.bincount(slot, notional, minlength=len(px))
+        base = self.pos + (self.flying if cancel_stale else self.work)
+        breaches = self._breaches(batch + base * px, slot)
+        if any(breaches) and not cancel_stale:
+            # counting every working order is conservative; the orders this
+            # batch re-sends are only worked out when that breaks a limit
+            self._resent(intents, base)
+            breaches = self._breaches(batch + base * px, slot)
+        if any(breaches):
+            reason = self._sequential(slot, qty, notional, price, base, *breaches)
+        else:
+            self.fast += 1
+            reason = np.zeros(n, dtype=np.int8)
+            if no_price is None:
+                return reason
+        if no_price is not None:
+            reason[too_big] = ORDER_NOTIONAL
+            reason[no_price] = NO_PRICE
+        if reason.any():
+            self.rejects += np.bincount(reason, minlength=len(REASONS))
+        return reason
+
+    def _sequential(self, slot: np.ndarray, qty: np.ndarray, notional: np.ndarray, price: np.ndarray, base: np.ndarray, check_net: bool, check_gross: bool, check_pos: bool) -> np.ndarray:
+        # the limits the end state breaks, walked intent by intent
+        n = len(slot)
+        cap = self.capacity
+        if n > len(self._arange):
+            self._arange = np.arange(2 * n)
+        cols = self._arange[:n]
+        reason = np.zeros(n, dtype=np.int8)
+        sell = slot >= cap
+        if check_net:
+            exposure = base * self.price
+            short = (notional * sell).cumsum()
+            net = np.where(sell, short + exposure[cap:].sum(), notional.cumsum() - short + exposure[:cap].sum())
+            reason[net > self.max_net] = NET_EXPOSURE
+        if not (check_gross or check_pos):
+            return reason
+
+        # each side's bound per symbol after the batch up to and including each
+        # intent, worked out in symbol order
+        sym = slot % cap
+        order = sym.argsort(kind="stable")
+        sym_sorted = sym[order]
+        sell_sorted = sell[order]
+        first = np.empty(n, dtype=bool)
+        first[0] = True
+        np.not_equal(sym_sorted[1:], sym_sorted[:-1], out=first[1:])
+        group = np.maximum.accumulate(first * cols)
+        side_qty = np.empty((2, n))
+        np.multiply(qty[order], sell_sorted, out=side_qty[1])
+        np.subtract(qty[order], side_qty[1], out=side_qty[0])
+        run = side_qty.cumsum(axis=1)
+        base = base.reshape(2, cap)
+        bound = base.take(sym_sorted, axis=1) + run - (run - side_qty).take(group, axis=1)
+        price_sorted = price[order]
+        if check_gross:
+            # a symbol's worst case is its larger side; each intent moves it by delta
+            worst_base = np.maximum(base[0], base[1]) * self.price[:cap]
+            worst = np.maximum(bound[0], bound[1]) * price_sorted
+            prev = np.empty(n)
+            prev[1:] = worst[:-1]
+            prev[first] = worst_base[sym_sorted[first]]
+            delta = np.empty(n)
+            delta[order] = worst - prev
+            reason[(delta > 0) & (delta.cumsum() > self.max_gross - worst_base.sum())] = GROSS_EXPOSURE
+        if check_pos:
+            # a buy only risks the long side, a sell only the short side
+            over = np.where(sell_sorted, bound[1], bound[0]) * price_sorted > self.max_pos_notional
+            reason[order[over]] = POSITION_NOTIONAL
+        return reason
+
+    def check(self, intents: List[OrderIntent], cancel_stale: bool = True) -> Tuple[List[OrderIntent], List[Tuple[OrderIntent, str]]]:
+        reason = self.evaluate(intents, cancel_stale)
+        if not reason.any():
+            return list(intents), []
+        codes = reason.tolist()
+        accepted = list(compress(intents, map(not_, codes)))
+        rejected = [(intents[k], REASONS[codes[k]]) for k in np.flatnonzero(reason).tolist()]
+        return accepted, rejected
+
+    def stats(self) -> dict:
+        out = {name: int(self.rejects[i]) for i, name in enumerate(REASONS) if self.rejects[i]}
+        out["fast_path"] = self.fast
+        return out
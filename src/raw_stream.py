@@ -0,0 +1,46 @@
+from __future__ import annotations
+from typing import Callable, Dict, Optional
+
+from alpaca.data.live import StockDataStream
+
+QuoteSink = Callable[[str, float, float, float, float, float], None]
+TradeSink = Callable[[str, float, float, float], None]
+BarSink = Callable[[str, float, float, float, float, float, float], None]
+
+
+def _epoch(t) -> float:
+    # msgpack Timestamp ext from the raw frame; datetime if something upstream cast it
+    if hasattr(t, "to_unix"):
+        return t.to_unix()
+    return t.timestamp()
+
+
+class RawStockDataStream(StockDataStream):
+    # Decodes market-data messages straight from the unpacked msgpack dicts into
+    # plain tuples of floats, skipping alpaca-py's Quote/Trade/Bar models, the
+    # datetime conversion and the per-message handler coroutine.
+    def __init__(self, api_key: str, api_secret: str, **kwargs):
+        kwargs["raw_data"] = True
+        super().__init__(api_key, api_secret, **kwargs)
+        self.on_quote: Optional[QuoteSink] = None
+        self.on_trade: Optional[TradeSink] = None
+        self.on_bar: Optional[BarSink] = None
+
+    async def _dispatch(self, msg: Dict) -> None:
+        kind = msg.get("T")
+        try:
+            if kind == "q":
+                if self.on_quote:
+                    self.on_quote(msg["S"], msg["bp"], msg["ap"], float(msg["bs"]), float(msg["as"]), _epoch(msg["t"]))
+                return
+            if kind == "t":
+                if self.on_trade:
+                    self.on_trade(msg["S"], msg["p"], float(msg["s"]), _epoch(msg["t"]))
+                return
+            if kind == "b":
+                if self.on_bar:
+                    self.on_bar(msg["S"], msg["o"], msg["h"], msg["l"], msg["c"], float(msg["v"]), _epoch(msg["t"]))
+                return
+        except KeyError:
+            return
+        await super()._dispatch(msg)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+import os
+import queue
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .utils.time import now_eastern
+
+MAGIC = b"ALPHTICK"
+VERSION = 1
+SYMBOL_WIDTH = 16
+# magic, version, header_len, record_size, n_symbols, feed name
+_HEADER = struct.Struct("<8sIIII16s")
+
+QUOTE_DTYPE = np.dtype([("sym", "<u4"), ("ts", "<f8"), ("recv_ts", "<f8"), ("bid", "<f8"), ("ask", "<f8"), ("bid_size", "<f8"), ("ask_size", "<f8")])
+TRADE_DTYPE = np.dtype([("sym", "<u4"), ("ts", "<f8"), ("recv_ts", "<f8"), ("price", "<f8"), ("size", "<f8")])
+BAR_DTYPE = np.dtype([("sym", "<u4"), ("ts", "<f8"), ("recv_ts", "<f8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("volume", "<f8")])
+FEED_DTYPES: Dict[str, np.dtype] = {"quotes": QUOTE_DTYPE, "trades": TRADE_DTYPE, "bars": BAR_DTYPE}
+
+
+def encode_header(feed: str, symbols: List[str]) -> bytes:
+    body = b"".join(s.encode("ascii")[:SYMBOL_WIDTH].ljust(SYMBOL_WIDTH, b"\0") for s in symbols)
+    header_len = _HEADER.size + len(body)
+    header_len += -header_len % 64
+    head = _HEADER.pack(MAGIC, VERSION, header_len, FEED_DTYPES[feed].itemsize, len(symbols), feed.encode("ascii"))
+    return (head + body).ljust(header_len, b"\0")
+
+
+def read_header(path: str) -> Tuple[str, List[str], int]:
+    with open(path, "rb") as f:
+        magic, version, header_len, record_size, n_symbols, feed = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a tick file")
+        body = f.read(n_symbols * SYMBOL_WIDTH)
+    feed_name = feed.rstrip(b"\0").decode("ascii")
+    if FEED_DTYPES[feed_name].itemsize != record_size:
+        raise ValueError(f"{path}: record size mismatch")
+    symbols = [body[i:i + SYMBOL_WIDTH].rstrip(b"\0").decode("ascii") for i in range(0, len(body), SYMBOL_WIDTH)]
+    return feed_name, symbols, header_len
+
+
+def open_ticks(path: str) -> Tuple[str, List[str], np.ndarray]:
+    # Returns (feed, symbols, records) with records memory-mapped read-only.
+    feed, symbols, header_len = read_header(path)
+    dtype = FEED_DTYPES[feed]
+    count = (os.path.getsize(path) - header_len) // dtype.itemsize
+    if count <= 0:
+        return feed, symbols, np.zeros(0, dtype=dtype)
+    return feed, symbols, np.memmap(path, dtype=dtype, mode="r", offset=header_len, shape=(count,))
+
+
+class TickRecorder:
+    # Hot path is a tuple append; full or flushed batches are converted to
+    # fixed-size records and appended to <root>/<YYYYMMDD>/<feed>.bin by a
+    # background writer thread.
+    def __init__(self, root: str, symbols: List[str], batch_size: int = 4096):
+        self.root = root
+        self.symbols = list(dict.fromkeys(symbols))
+        self.ids: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self.batch_size = batch_size
+        self.recorded: Dict[str, int] = {feed: 0 for feed in FEED_DTYPES}
+        self.write_errors = 0
+        self._buffers: Dict[str, list] = {feed: [] for feed in FEED_DTYPES}
+        self._queue: "queue.Queue[Optional[Tuple[str, list]]]" = queue.Queue()
+        self._files: Dict[str, Tuple[str, object]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._writer, name="tick-recorder", daemon=True)
+        self._thread.start()
+
+    def quote(self, symbol: str, bid: float, ask: float, bid_size: float, ask_size: float, ts: float, recv_ts: float) -> None:
+        sid = self.ids.get(symbol)
+        if sid is None:
+            return
+        buf = self._buffers["quotes"]
+        buf.append((sid, ts, recv_ts, bid, ask, bid_size, ask_size))
+        if len(buf) >= self.batch_size:
+            self._hand_off("quotes")
+
+    def trade(self, symbol: str, price: float, size: float, ts: float, recv_ts: float) -> None:
+        sid = self.ids.get(symbol)
+        if sid is None:
+            return
+        buf = self._buffers["trades"]
+        buf.append((sid, ts, recv_ts, price, size))
+        if len(buf) >= self.batch_size:
+            self._hand_off("trades")
+
+    def bar(self, symbol: str, open_: float, high: float, low: float, close: float, volume: float, ts: float, recv_ts: float) -> None:
+        sid = self.ids.get(symbol)
+        if sid is None:
+            return
+        buf = self._buffers["bars"]
+        buf.append((sid, ts, recv_ts, open_, high, low, close, volume))
+        if len(buf) >= self.batch_size:
+            self._hand_off("bars")
+
+    def _hand_off(self, feed: str) -> None:
+        batch = self._buffers[feed]
+        self._buffers[feed] = []
+        self.recorded[feed] += len(batch)
+        self._queue.put((feed, batch))
+
+    def flush(self) -> None:
+        for feed, buf in self._buffers.items():
+            if buf:
+                self._hand_off(feed)
+
+    def close(self) -> None:
+        self.flush()
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        else:
+            self._drain_now()
+        for _, f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _drain_now(self) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                self._write(*item)
+
+    def _writer(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._write(*item)
+
+    def _write(self, feed: str, batch: list) -> None:
+        try:
+            f = self._file_for(feed)
+            f.write(np.array(batch, dtype=FEED_DTYPES[feed]).tobytes())
+            f.flush()
+        except Exception:
+            self.write_errors += 1
+
+    def _file_for(self, feed: str):
+        day = now_eastern().strftime("%Y%m%d")
+        current = self._files.get(feed)
+        if current and current[0] == day:
+            return current[1]
+        if current:
+            current[1].close()
+        day_dir = os.path.join(self.root, day)
+        os.makedirs(day_dir, exist_ok=True)
+        header = encode_header(feed, self.symbols)
+        n = 0
+        while True:
+            name = f"{feed}.bin" if n == 0 else f"{feed}.{n}.bin"
+            path = os.path.join(day_dir, name)
+            if not os.path.exists(path):
+                f = open(path, "wb")
+                f.write(header)
+                break
+            # append to today's file only if it was written with the same symbol dictionary
+            _, symbols, header_len = read_header(path)
+            if symbols == self.symbols:
+                # drop a torn trailing record from a crashed run so appends stay aligned
+                size = os.path.getsize(path)
+                torn = (size - header_len) % FEED_DTYPES[feed].itemsize
+                if torn:
+                    os.truncate(path, size - torn)
+                f = open(path, "ab")
+                break
+            n += 1
+        self._files[feed] = (day, f)
+        return f
+
+    def stats(self) -> dict:
+        return {**{f"{k}_recorded": v for k, v in self.recorded.items()}, "pending_batches": self._queue.qsize(), "write_errors": self.write_errors}
+
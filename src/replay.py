@@ -0,0 +1,367 @@
+from __future__ import annotations
+import asyncio
+import glob
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+
+import numpy as np
+from alpaca.trading.enums import OrderSide, TimeInForce
+
+from .data_stream import SymbolState
+from .execution import ExecutionEngine, OrderIntent
+from .market_store import ColumnarMarketState
+from .metrics import Metrics
+from .netting import IntentNetter
+from .recorder import open_ticks
+from .risk import PositionState, RiskManager
+from .strategies.base import Strategy
+from .utils import clock
+from .utils.rate_limit import Priority
+
+FEEDS = ("quotes", "trades", "bars")
+
+
+@dataclass
+class SimOrder:
+    id: str
+    client_order_id: str
+    symbol: str
+    side: str
+    qty: float
+    limit_price: Optional[float]
+    filled_qty: float = 0.0
+    filled_avg_price: float = 0.0
+    status: str = "new"
+
+
+@dataclass
+class SimPosition:
+    symbol: str
+    qty: float = 0.0
+    avg_entry_price: float = 0.0
+
+
+@dataclass
+class SimAccount:
+    equity: float
+    cash: float
+    buying_power: float
+    daytrade_count: int = 0
+
+
+class SimBroker:
+    # Broker stand-in for replay: market orders fill at the touch, limit orders
+    # fill at the touch once marketable, and every state change is queued as a
+    # trade_updates-shaped dict for the replay loop to deliver.
+    def __init__(self, states: Dict[str, SymbolState], starting_cash: float = 100000.0):
+        self.states = states
+        self.cash = starting_cash
+        self.positions: Dict[str, SimPosition] = {}
+        self.orders: Dict[str, SimOrder] = {}
+        self.resting: Dict[str, Dict[str, SimOrder]] = {}
+        self.updates: List[dict] = []
+        self.submitted = 0
+        self.filled = 0
+        self.replaced = 0
+        # REST calls the live Broker would have made
+        self.requests = 0
+        self._ids = itertools.count(1)
+
+    async def submit_limit(self, symbol: str, qty: float, side: OrderSide, limit_price: float, tif: TimeInForce, client_order_id: str, priority: Priority = Priority.NEW) -> SimOrder:
+        self.requests += 1
+        return self._submit(symbol, qty, side, float(limit_price), client_order_id)
+
+    async def submit_market(self, symbol: str, qty: float, side: OrderSide, tif: TimeInForce, client_order_id: str, priority: Priority = Priority.NEW) -> SimOrder:
+        self.requests += 1
+        return self._submit(symbol, qty, side, None, client_order_id)
+
+    async def cancel(self, order_id: str) -> None:
+        self.requests += 1
+        order = self.orders.get(order_id)
+        if not order or order.status not in {"new", "partially_filled"}:
+            return
+        self._close(order, "canceled")
+
+    async def replace(self, order_id: str, limit_price: Optional[float] = None, qty: Optional[float] = None, client_order_id: Optional[str] = None) -> SimOrder:
+        self.requests += 1
+        old = self.orders[order_id]
+        if old.status not in {"new", "partially_filled"}:
+            raise ValueError(f"order {order_id} is already {old.status}")
+        self._close(old, "replaced")
+        self.replaced += 1
+        return self._submit(old.symbol, qty if qty is not None else old.qty, OrderSide(old.side), limit_price if limit_price is not None else old.limit_price, client_order_id or old.client_order_id)
+
+    async def cancel_all(self) -> None:
+        self.requests += 1
+        for order in [o for book in self.resting.values() for o in book.values()]:
+            self._close(order, "canceled")
+
+    async def list_positions(self) -> List[SimPosition]:
+        return [p for p in self.positions.values() if p.qty != 0]
+
+    async def get_account(self) -> SimAccount:
+        equity = self.equity()
+        return SimAccount(equity=equity, cash=self.cash, buying_power=max(0.0, equity * 2))
+
+    async def list_orders(self, status: str = "open") -> List[SimOrder]:
+        return [o for book in self.resting.values() for o in book.values()]
+
+    def equity(self) -> float:
+        total = self.cash
+        for sym, pos in self.positions.items():
+            st = self.states.get(sym)
+            total += pos.qty * (st.mid if st and st.mid > 0 else pos.avg_entry_price)
+        return total
+
+    def position_states(self) -> Dict[str, PositionState]:
+        return {s: PositionState(symbol=s, qty=p.qty, avg_price=p.avg_entry_price) for s, p in self.positions.items() if p.qty != 0}
+
+    def on_quote(self, symbol: str) -> None:
+        book = self.resting.get(symbol)
+        if not book:
+            return
+        for order in list(book.values()):
+            self._try_fill(order)
+
+    def _new_id(self) -> str:
+        return f"sim-{next(self._ids)}"
+
+    def _submit(self, symbol: str, qty: float, side: OrderSide, limit_price: Optional[float], client_order_id: str) -> SimOrder:
+        order = SimOrder(id=self._new_id(), client_order_id=client_order_id, symbol=symbol, side=side.value, qty=float(qty), limit_price=limit_price)
+        self.orders[order.id] = order
+        self.submitted += 1
+        self.updates.append(self._update("new", order))
+        if not self._try_fill(order):
+            if limit_price is None:
+                self._close(order, "rejected")
+            else:
+                self.resting.setdefault(symbol, {})[order.id] = order
+        return order
+
+    def _try_fill(self, order: SimOrder) -> bool:
+        st = self.states.get(order.symbol)
+        if not st or st.bid <= 0 or st.ask <= 0:
+            return False
+        if order.side == "buy":
+            price = st.ask
+            if order.limit_price is not None and order.limit_price < price:
+                return False
+        else:
+            price = st.bid
+            if order.limit_price is not None and order.limit_price > price:
+                return False
+        signed = order.qty if order.side == "buy" else -order.qty
+        pos = self.positions.setdefault(order.symbol, SimPosition(order.symbol))
+        new_qty = pos.qty + signed
+        if pos.qty == 0 or (pos.qty > 0) == (signed > 0):
+            pos.avg_entry_price = (pos.avg_entry_price * abs(pos.qty) + price * abs(signed)) / abs(new_qty)
+        elif new_qty != 0 and (new_qty > 0) != (pos.qty > 0):
+            pos.avg_entry_price = price
+        pos.qty = new_qty
+        self.cash -= signed * price
+        order.filled_qty = order.qty
+        order.filled_avg_price = price
+        self.filled += 1
+        self._close(order, "fill")
+        return True
+
+    def _close(self, order: SimOrder, event: str) -> None:
+        order.status = "filled" if event == "fill" else event
+        self.resting.get(order.symbol, {}).pop(order.id, None)
+        self.updates.append(self._update(event, order))
+
+    def _update(self, event: str, order: SimOrder) -> dict:
+        return {
+            "event": event,
+            "timestamp": clock.now(),
+            "order": {
+                "id": order.id,
+                "client_order_id": order.client_order_id,
+                "symbol": order.symbol,
+                "side": order.side,
+                "qty": order.qty,
+                "limit_price": order.limit_price,
+                "filled_qty": order.filled_qty,
+                "filled_avg_price": order.filled_avg_price,
+                "status": order.status,
+            },
+        }
+
+
+class ReplayMarketData:
+    def __init__(self, symbols: List[str], columnar_state: bool = False, history_symbols: Optional[Collection[str]] = None, untraded_history: int = 30):
+        self.symbols = symbols
+        self.store: Optional[ColumnarMarketState] = None
+        if columnar_state:
+            self.store = ColumnarMarketState(symbols, history_symbols=history_symbols, short_window=untraded_history)
+            self.states: Dict[str, SymbolState] = self.store.views()
+        else:
+            self.states = {s: SymbolState(symbol=s) for s in symbols}
+
+
+def load_day(day_dir: str) -> Tuple[List[str], List[tuple]]:
+    # Returns (symbols, feeds) where each feed is (feed name, symbol name per
+    # row, memmapped records); segment files (<feed>.N.bin) are included.
+    symbols: List[str] = []
+    feeds: List[tuple] = []
+    for feed in FEEDS:
+        for path in sorted(glob.glob(os.path.join(day_dir, f"{feed}*.bin"))):
+            _, syms, recs = open_ticks(path)
+            if not len(recs):
+                continue
+            names = np.array(syms, dtype=object)[recs["sym"]]
+            symbols.extend(syms)
+            feeds.append((feed, names, recs))
+    return list(dict.fromkeys(symbols)), feeds
+
+
+class ReplayEngine:
+    # Streams recorded ticks through SymbolState under a SimClock and runs the
+    # strategy -> risk -> execution tick on simulated time. speed=0 replays as
+    # fast as possible, speed=1 at the original cadence. Strategies are built by
+    # the factory once the simulated clock points at the first recorded tick.
+    def __init__(self, strategy_factory: Callable[[], List[Strategy]], risk: RiskManager, metrics: Metrics, day_dir: str, tick_interval_sec: float = 1.0, speed: float = 0.0, max_open_orders: int = 50, columnar_state: bool = False, starting_cash: float = 100000.0, replace_tolerance_bps: float = 0.0, replace_tolerance_ticks: float = 0.0, net_intents: bool = False, untraded_history: int = 30):
+        self.risk = risk
+        self.metrics = metrics
+        self.day_dir = day_dir
+        self.tick_interval_sec = tick_interval_sec
+        self.speed = speed
+        symbols, self._feeds = load_day(day_dir)
+        self.events = 0
+        self.ticks = 0
+        self._kinds, self._rows, self._recv = self._merged()
+        self.clock = clock.SimClock(self._recv[0] if self._recv else 0.0)
+        clock.set_source(self.clock.now)
+        self.strategies = strategy_factory()
+        history_symbols = {s for strat in self.strategies for s in strat.symbols}
+        self.data = ReplayMarketData(symbols, columnar_state=columnar_state, history_symbols=history_symbols, untraded_history=untraded_history)
+        self.broker = SimBroker(self.data.states, starting_cash=starting_cash)
+        self.execution = ExecutionEngine(self.broker, max_open_orders=max_open_orders, replace_tolerance_bps=replace_tolerance_bps, replace_tolerance_ticks=replace_tolerance_ticks, max_concurrency=1)
+        self.netter = IntentNetter(on_cross=self._record_cross, orders=self.execution.orders) if net_intents else None
+
+    def _merged(self):
+        kinds = []
+        rows = []
+        recv = []
+        for i, (_, _, recs) in enumerate(self._feeds):
+            kinds.append(np.full(len(recs), i, dtype=np.int32))
+            rows.append(np.arange(len(recs), dtype=np.int64))
+            recv.append(np.asarray(recs["recv_ts"]))
+        if not recv:
+            return [], [], []
+        recv_all = np.concatenate(recv)
+        order = np.argsort(recv_all, kind="stable")
+        return np.concatenate(kinds)[order].tolist(), np.concatenate(rows)[order].tolist(), recv_all[order].tolist()
+
+    def _columns(self) -> List[tuple]:
+        cols = []
+        for feed, names, recs in self._feeds:
+            if feed == "quotes":
+                cols.append((feed, names.tolist(), recs["ts"].tolist(), recs["bid"].tolist(), recs["ask"].tolist(), recs["bid_size"].tolist(), recs["ask_size"].tolist()))
+            elif feed == "trades":
+                cols.append((feed, names.tolist(), recs["ts"].tolist(), recs["price"].tolist(), recs["size"].tolist()))
+            else:
+                cols.append((feed, names.tolist(), recs["ts"].tolist(), recs["close"].tolist()))
+        return cols
+
+    async def run(self) -> dict:
+        kinds, rows, recv = self._kinds, self._rows, self._recv
+        cols = self._columns()
+        states = self.data.states
+        wall_start = time.perf_counter()
+        if not recv:
+            clock.reset()
+            return self.summary(0.0, 0.0)
+        first_ts = recv[0]
+        try:
+            next_tick = first_ts + self.tick_interval_sec
+            for kind, row, ts in zip(kinds, rows, recv):
+                if ts >= next_tick:
+                    if ts - next_tick > 60 * self.tick_interval_sec:
+                        next_tick = ts
+                    while next_tick <= ts:
+                        self.clock.advance_to(next_tick)
+                        await self._tick()
+                        next_tick += self.tick_interval_sec
+                    if self.speed > 0:
+                        ahead = (ts - first_ts) / self.speed - (time.perf_counter() - wall_start)
+                        if ahead > 0:
+                            await asyncio.sleep(ahead)
+                self.clock.advance_to(ts)
+                col = cols[kind]
+                feed = col[0]
+                sym = col[1][row]
+                st = states.get(sym)
+                if st is None:
+                    continue
+                if feed == "quotes":
+                    st.update_quote(col[3][row], col[4][row], col[5][row], col[6][row], col[2][row])
+                    self.broker.on_quote(sym)
+                elif feed == "trades":
+                    st.update_trade(col[3][row], col[4][row], col[2][row])
+                else:
+                    st.update_bar(col[3][row], col[2][row])
+                self.events += 1
+                if self.broker.updates:
+                    await self._deliver()
+        finally:
+            clock.reset()
+        return self.summary(time.perf_counter() - wall_start, recv[-1] - first_ts)
+
+    async def _tick(self) -> None:
+        self.ticks += 1
+        self.risk.update_account(self.broker.equity())
+        positions = self.broker.position_states()
+        if self.risk.kill_switch:
+            await self._flatten(positions)
+            return
+        intents: List[OrderIntent] = []
+        for strat in self.strategies:
+            intents.extend(strat.on_tick(self.data, positions))
+        intents = self.risk.check(intents, positions, self.data)
+        if self.netter:
+            intents = self.netter.net(intents, self.data)
+        await self.execution.sync(intents)
+        await self._deliver()
+
+    async def _flatten(self, positions: Dict[str, PositionState]) -> None:
+        intents = []
+        for sym, pos in positions.items():
+            side = OrderSide.SELL if pos.qty > 0 else OrderSide.BUY
+            intents.append(OrderIntent(symbol=sym, side=side, qty=abs(pos.qty), limit_price=None, tif=TimeInForce.DAY, strategy="flatten", intent_id=f"{sym}-flat", order_type="market"))
+        await self.execution.sync(intents)
+        await self._deliver()
+
+    def _record_cross(self, intent: OrderIntent, qty: float, price: float) -> None:
+        self.metrics.record_fill(intent.strategy, intent.symbol, qty, price, intent.side.value, mid=price)
+
+    async def _deliver(self) -> None:
+        updates, self.broker.updates = self.broker.updates, []
+        for update in updates:
+            order = update["order"]
+            if update["event"] == "fill":
+                client_id = order["client_order_id"]
+                strategy = client_id.split(":")[0] if ":" in client_id else "unknown"
+                st = self.data.states.get(order["symbol"])
+                self.metrics.record_fill(strategy, order["symbol"], order["filled_qty"], order["filled_avg_price"], order["side"], mid=st.mid if st else None)
+            await self.execution.on_trade_update(update)
+
+    def summary(self, wall_sec: float, sim_sec: float) -> dict:
+        return {
+            "day_dir": self.day_dir,
+            "events": self.events,
+            "ticks": self.ticks,
+            "orders": self.broker.submitted,
+            "fills": self.broker.filled,
+            "replaced": self.broker.replaced,
+            "requests": self.broker.requests,
+            "crosses": self.netter.crosses if self.netter else 0,
+            "equity": round(self.broker.equity(), 2),
+            "sim_sec": round(sim_sec, 1),
+            "wall_sec": round(wall_sec, 3),
+            "events_per_sec": round(self.events / wall_sec) if wall_sec > 0 else 0,
+            "pnl": {name: round(s.pnl, 2) for name, s in self.metrics.stats.items()},
+        }
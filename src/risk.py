@@ -1,12 +1,13 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import time
 
 from alpaca.trading.enums import OrderSide
 
 from .execution import OrderIntent
 from .data_stream import MarketDataStream
+from .pretrade import PreTradeRisk
 
 
 @dataclass
@@ -26,6 +27,9 @@ class RiskManager:
         self.start_equity: float | None = None
         self.kill_switch = False
         self.last_account_check = 0.0
+        # batch worst-case checks including working orders; per-intent checks below otherwise
+        self.pretrade: Optional[PreTradeRisk] = None
+        self.rejected: List[Tuple[OrderIntent, str]] = []
 
     def update_account(self, equity: float) -> None:
         if self.start_equity is None:
@@ -33,16 +37,24 @@ class RiskManager:
         if self.start_equity - equity >= self.daily_loss_limit:
             self.kill_switch = True
 
-    def check(self, intents: List[OrderIntent], positions: Dict[str, PositionState], data: MarketDataStream) -> List[OrderIntent]:
+    def check(self, intents: List[OrderIntent], positions: Dict[str, PositionState], data: MarketDataStream, exposure: Optional[Tuple[float, float]] = None, cancel_stale: bool = True) -> List[OrderIntent]:
+        # exposure: (gross, net) kept by the caller, e.g. PositionLedger; summed here otherwise.
+        # cancel_stale: whether the sync these intents go to cancels the orders it is not sent
         if self.kill_switch:
             return []
-        gross = 0.0
-        net = 0.0
-        for sym, pos in positions.items():
-            price = data.states.get(sym).mid if sym in data.states else pos.avg_price
-            notional = pos.qty * price
-            gross += abs(notional)
-            net += notional
+        if self.pretrade is not None:
+            accepted, self.rejected = self.pretrade.check(intents, cancel_stale)
+            return accepted
+        if exposure is not None:
+            gross, net = exposure
+        else:
+            gross = 0.0
+            net = 0.0
+            for sym, pos in positions.items():
+                price = data.states.get(sym).mid if sym in data.states else pos.avg_price
+                notional = pos.qty * price
+                gross += abs(notional)
+                net += notional
         if gross > self.max_gross or abs(net) > self.max_net:
             return []
         filtered: List[OrderIntent] = []
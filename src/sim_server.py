@@ -0,0 +1,527 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import datetime as dt
+import json
+import random
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlsplit
+
+import msgpack
+import numpy as np
+import websockets
+from alpaca.trading.enums import OrderSide
+
+from .data_stream import SymbolState
+from .replay import SimBroker, SimOrder
+
+_REASONS = {200: "OK", 204: "No Content", 207: "Multi-Status", 403: "Forbidden", 404: "Not Found", 422: "Unprocessable Entity"}
+
+
+def _iso(ts: float) -> str:
+    return dt.datetime.fromtimestamp(ts, dt.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _num(x: Optional[float]) -> Optional[str]:
+    return None if x is None else repr(float(x))
+
+
+class StandInBroker(SimBroker):
+    # SimBroker with knobs for load tests: marketable limit orders fill with
+    # probability fill_prob on each quote, and reject_rate of submissions are
+    # acknowledged and then rejected over trade_updates.
+    def __init__(self, states: Dict[str, SymbolState], fill_prob: float = 1.0, reject_rate: float = 0.0, seed: int = 7, starting_cash: float = 100000.0):
+        super().__init__(states, starting_cash=starting_cash)
+        self.fill_prob = fill_prob
+        self.reject_rate = reject_rate
+        self.rejected = 0
+        self.rng = random.Random(seed)
+
+    def _new_id(self) -> str:
+        return str(uuid.uuid4())
+
+    def _submit(self, symbol: str, qty: float, side: OrderSide, limit_price: Optional[float], client_order_id: str) -> SimOrder:
+        if self.reject_rate > 0 and self.rng.random() < self.reject_rate:
+            order = SimOrder(id=self._new_id(), client_order_id=client_order_id, symbol=symbol, side=side.value, qty=float(qty), limit_price=limit_price)
+            self.orders[order.id] = order
+            self.submitted += 1
+            self.rejected += 1
+            self.updates.append(self._update("new", order))
+            self._close(order, "rejected")
+            return order
+        return super()._submit(symbol, qty, side, limit_price, client_order_id)
+
+    def _try_fill(self, order: SimOrder) -> bool:
+        if order.limit_price is not None and self.fill_prob < 1.0 and self.rng.random() >= self.fill_prob:
+            return False
+        return super()._try_fill(order)
+
+
+class StandInServer:
+    # Local stand-in for Alpaca paper: REST orders/account/positions on
+    # http_port, and the msgpack market-data stream plus the JSON trade_updates
+    # stream (path /stream) on ws_port. Quotes and trades are generated for
+    # whatever symbols clients subscribe to, at a fixed rate per symbol.
+    def __init__(self, host: str = "127.0.0.1", http_port: int = 8900, ws_port: int = 8901, quote_rate: float = 5.0, trade_rate: float = 1.0,
+                 ack_ms: float = 5.0, ack_jitter_ms: float = 2.0, fill_prob: float = 1.0, reject_rate: float = 0.0, error_rate: float = 0.0,
+                 step_sec: float = 0.01, seed: int = 7):
+        self.host = host
+        self.http_port = http_port
+        self.ws_port = ws_port
+        self.quote_rate = quote_rate
+        self.trade_rate = trade_rate
+        self.ack_ms = ack_ms
+        self.ack_jitter_ms = ack_jitter_ms
+        self.error_rate = error_rate
+        self.step_sec = step_sec
+        self.states: Dict[str, SymbolState] = {}
+        self.broker = StandInBroker(self.states, fill_prob=fill_prob, reject_rate=reject_rate, seed=seed)
+        self.universe: List[str] = []
+        self._mid = np.zeros(0)
+        self._rng = np.random.default_rng(seed)
+        self._asset_ids: Dict[str, str] = {}
+        self._order_meta: Dict[str, tuple] = {}
+        self._data_clients: Dict[object, Dict[str, Set[str]]] = {}
+        self._trade_clients: Set[object] = set()
+        self._trade_seq = 0
+        self.counters = {"quotes": 0, "trades": 0, "frames": 0, "http": 0, "errors": 0, "updates": 0, "lagged_steps": 0}
+        self._servers: list = []
+        self._feed_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._servers.append(await asyncio.start_server(self._http, self.host, self.http_port))
+        self._servers.append(await websockets.serve(self._ws, self.host, self.ws_port, max_size=None, ping_interval=None))
+        self._feed_task = asyncio.create_task(self._feed())
+
+    async def stop(self) -> None:
+        if self._feed_task:
+            self._feed_task.cancel()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    def _add_symbols(self, symbols: List[str]) -> None:
+        new = [s for s in dict.fromkeys(symbols) if s != "*" and s not in self.states]
+        if not new:
+            return
+        for sym in new:
+            self.states[sym] = SymbolState(symbol=sym)
+            self._asset_ids[sym] = str(uuid.uuid5(uuid.NAMESPACE_DNS, sym))
+        self.universe.extend(new)
+        self._mid = np.concatenate([self._mid, self._rng.uniform(20.0, 500.0, len(new))])
+
+    # market data
+
+    async def _feed(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_step = loop.time()
+        carry_q = carry_t = 0.0
+        while True:
+            next_step += self.step_sec
+            delay = next_step - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -1.0:
+                # too far behind to catch up; skip rather than burst
+                next_step = loop.time()
+                self.counters["lagged_steps"] += 1
+            n = len(self.universe)
+            if not n:
+                continue
+            carry_q += self.quote_rate * n * self.step_sec
+            carry_t += self.trade_rate * n * self.step_sec
+            nq, nt = int(carry_q), int(carry_t)
+            carry_q -= nq
+            carry_t -= nt
+            quotes = self._quotes(nq)
+            trades = self._trades(nt)
+            await self._send_market(quotes, trades)
+            if self.broker.updates:
+                await self._publish_updates()
+
+    def _quotes(self, k: int) -> tuple:
+        if not k:
+            return [], []
+        idx = self._rng.integers(0, len(self.universe), k)
+        np.multiply.at(self._mid, idx, np.exp(self._rng.normal(0.0, 2e-4, k)))
+        mids = self._mid[idx]
+        half = np.maximum(0.005, np.round(mids * 5e-5, 2))
+        bids = np.round(mids - half, 2).tolist()
+        asks = np.round(mids + half, 2).tolist()
+        bsz = self._rng.integers(1, 20, k).tolist()
+        asz = self._rng.integers(1, 20, k).tolist()
+        now = time.time()
+        stamp = msgpack.Timestamp.from_unix(now)
+        msgs = []
+        syms = []
+        states = self.states
+        resting = self.broker.resting
+        for i, bid, ask, bs, as_ in zip(idx.tolist(), bids, asks, bsz, asz):
+            sym = self.universe[i]
+            states[sym].update_quote(bid, ask, bs, as_, now)
+            if resting.get(sym):
+                self.broker.on_quote(sym)
+            msgs.append({"T": "q", "S": sym, "bx": "V", "bp": bid, "bs": bs, "ax": "V", "ap": ask, "as": as_, "c": ["R"], "z": "C", "t": stamp})
+            syms.append(sym)
+        self.counters["quotes"] += k
+        return msgs, syms
+
+    def _trades(self, k: int) -> tuple:
+        if not k:
+            return [], []
+        idx = self._rng.integers(0, len(self.universe), k).tolist()
+        sizes = self._rng.integers(1, 500, k).tolist()
+        buys = (self._rng.random(k) > 0.5).tolist()
+        now = time.time()
+        stamp = msgpack.Timestamp.from_unix(now)
+        msgs = []
+        syms = []
+        for i, size, buy in zip(idx, sizes, buys):
+            sym = self.universe[i]
+            st = self.states[sym]
+            if st.bid <= 0:
+                continue
+            price = st.ask if buy else st.bid
+            st.update_trade(price, size, now)
+            self._trade_seq += 1
+            msgs.append({"T": "t", "S": sym, "i": self._trade_seq, "x": "V", "p": price, "s": size, "c": ["@"], "z": "C", "t": stamp})
+            syms.append(sym)
+        self.counters["trades"] += len(msgs)
+        return msgs, syms
+
+    async def _send_market(self, quotes: tuple, trades: tuple) -> None:
+        if not quotes[0] and not trades[0]:
+            return
+        for ws, subs in list(self._data_clients.items()):
+            out = self._select(quotes, subs["quotes"]) + self._select(trades, subs["trades"])
+            if not out:
+                continue
+            try:
+                await ws.send(msgpack.packb(out))
+                self.counters["frames"] += 1
+            except websockets.ConnectionClosed:
+                self._data_clients.pop(ws, None)
+
+    @staticmethod
+    def _select(batch: tuple, wanted: Set[str]) -> list:
+        msgs, syms = batch
+        if "*" in wanted:
+            return msgs
+        return [m for m, s in zip(msgs, syms) if s in wanted]
+
+    async def _ws(self, ws) -> None:
+        if ws.path.rstrip("/").endswith("/stream"):
+            await self._trade_ws(ws)
+        else:
+            await self._data_ws(ws)
+
+    async def _data_ws(self, ws) -> None:
+        await ws.send(msgpack.packb([{"T": "success", "msg": "connected"}]))
+        try:
+            async for raw in ws:
+                msg = msgpack.unpackb(raw)
+                action = msg.get("action")
+                if action == "auth":
+                    self._data_clients[ws] = {"quotes": set(), "trades": set(), "bars": set()}
+                    await ws.send(msgpack.packb([{"T": "success", "msg": "authenticated"}]))
+                elif ws not in self._data_clients:
+                    await ws.send(msgpack.packb([{"T": "error", "code": 401, "msg": "not authenticated"}]))
+                elif action in {"subscribe", "unsubscribe"}:
+                    subs = self._data_clients[ws]
+                    for channel in ("quotes", "trades", "bars"):
+                        symbols = list(msg.get(channel) or [])
+                        if action == "subscribe":
+                            subs[channel].update(symbols)
+                            self._add_symbols(symbols)
+                        else:
+                            subs[channel].difference_update(symbols)
+                    await ws.send(msgpack.packb([{"T": "subscription", **{c: sorted(v) for c, v in subs.items()}}]))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._data_clients.pop(ws, None)
+
+    # trade updates
+
+    async def _trade_ws(self, ws) -> None:
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                action = msg.get("action")
+                if action in {"authenticate", "auth"}:
+                    await ws.send(json.dumps({"stream": "authorization", "data": {"status": "authorized", "action": "authenticate"}}))
+                elif action == "listen":
+                    streams = (msg.get("data") or {}).get("streams") or []
+                    if "trade_updates" in streams:
+                        self._trade_clients.add(ws)
+                    await ws.send(json.dumps({"stream": "listening", "data": {"streams": streams}}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._trade_clients.discard(ws)
+
+    async def _publish_updates(self) -> None:
+        updates, self.broker.updates = self.broker.updates, []
+        if not self._trade_clients:
+            return
+        frames = [json.dumps({"stream": "trade_updates", "data": self._update_json(u)}) for u in updates]
+        self.counters["updates"] += len(frames)
+        for ws in list(self._trade_clients):
+            try:
+                for frame in frames:
+                    await ws.send(frame)
+            except websockets.ConnectionClosed:
+                self._trade_clients.discard(ws)
+
+    def _update_json(self, update: dict) -> dict:
+        snap = update["order"]
+        data = {"event": update["event"], "timestamp": _iso(update["timestamp"]), "order": self._order_json(snap)}
+        if update["event"] == "fill":
+            data["price"] = _num(snap["filled_avg_price"])
+            data["qty"] = _num(snap["filled_qty"])
+            pos = self.broker.positions.get(snap["symbol"])
+            data["position_qty"] = _num(pos.qty if pos else 0.0)
+        return data
+
+    def _order_json(self, o: dict) -> dict:
+        created, tif = self._order_meta.get(o["id"], (time.time(), "day"))
+        kind = "market" if o["limit_price"] is None else "limit"
+        filled = o["status"] == "filled"
+        return {
+            "id": o["id"],
+            "client_order_id": o["client_order_id"],
+            "created_at": _iso(created),
+            "updated_at": _iso(time.time()),
+            "submitted_at": _iso(created),
+            "filled_at": _iso(time.time()) if filled else None,
+            "asset_id": self._asset_ids.get(o["symbol"]) or str(uuid.uuid5(uuid.NAMESPACE_DNS, o["symbol"])),
+            "symbol": o["symbol"],
+            "asset_class": "us_equity",
+            "qty": _num(o["qty"]),
+            "filled_qty": _num(o["filled_qty"]),
+            "filled_avg_price": _num(o["filled_avg_price"]) if o["filled_qty"] else None,
+            "order_class": "simple",
+            "order_type": kind,
+            "type": kind,
+            "side": o["side"],
+            "time_in_force": tif,
+            "limit_price": _num(o["limit_price"]),
+            "status": o["status"],
+            "extended_hours": False,
+        }
+
+    # REST
+
+    async def _http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = h.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                self.counters["http"] += 1
+                status, payload = await self._route(method.upper(), target, body)
+                data = b"" if payload is None else json.dumps(payload).encode()
+                head = f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n"
+                writer.write(head.encode("latin-1") + data)
+                await writer.drain()
+                if self.broker.updates:
+                    await self._publish_updates()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _ack_delay(self) -> None:
+        delay = self.ack_ms + (random.uniform(0.0, self.ack_jitter_ms) if self.ack_jitter_ms > 0 else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+    async def _route(self, method: str, target: str, body: bytes) -> tuple:
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        if parts[:1] == ["v2"]:
+            parts = parts[1:]
+        broker = self.broker
+        if parts == ["account"]:
+            equity = broker.equity()
+            return 200, self._account_json(equity)
+        if parts == ["positions"] and method == "GET":
+            return 200, [self._position_json(p) for p in await broker.list_positions()]
+        if parts[:1] != ["orders"]:
+            return 404, {"code": 40410000, "message": "endpoint not found"}
+        if method == "GET" and len(parts) == 1:
+            status = (parse_qs(url.query).get("status") or ["open"])[0]
+            orders = await broker.list_orders() if status == "open" else list(broker.orders.values())
+            return 200, [self._order_json(vars(o)) for o in orders]
+        await self._ack_delay()
+        if method == "POST" and len(parts) == 1:
+            if self.error_rate > 0 and broker.rng.random() < self.error_rate:
+                self.counters["errors"] += 1
+                return 403, {"code": 40310000, "message": "insufficient buying power"}
+            req = json.loads(body or b"{}")
+            limit = req.get("limit_price")
+            if req.get("type") == "limit" and limit is None:
+                return 422, {"code": 42210000, "message": "limit_price is required"}
+            side = OrderSide(req["side"])
+            client_id = req.get("client_order_id") or str(uuid.uuid4())
+            if req.get("type") == "limit":
+                order = await broker.submit_limit(req["symbol"], float(req["qty"]), side, float(limit), req.get("time_in_force"), client_id)
+            else:
+                order = await broker.submit_market(req["symbol"], float(req["qty"]), side, req.get("time_in_force"), client_id)
+            self._order_meta[order.id] = (time.time(), req.get("time_in_force") or "day")
+            return 200, self._ack_json(order)
+        if method == "DELETE" and len(parts) == 1:
+            open_ids = [o.id for o in await broker.list_orders()]
+            await broker.cancel_all()
+            return 207, [{"id": oid, "status": 200} for oid in open_ids]
+        if len(parts) == 2 and parts[1] in broker.orders:
+            if method == "DELETE":
+                order = broker.orders[parts[1]]
+                if order.status not in {"new", "partially_filled"}:
+                    return 422, {"code": 42210000, "message": f"order is already in \"{order.status}\" state"}
+                await broker.cancel(parts[1])
+                return 204, None
+            if method == "PATCH":
+                req = json.loads(body or b"{}")
+                old = broker.orders[parts[1]]
+                if old.status not in {"new", "partially_filled"}:
+                    return 422, {"code": 42210000, "message": f"order is already in \"{old.status}\" state"}
+                limit = req.get("limit_price")
+                qty = req.get("qty")
+                order = await broker.replace(parts[1], limit_price=float(limit) if limit is not None else None, qty=float(qty) if qty is not None else None, client_order_id=req.get("client_order_id"))
+                self._order_meta[order.id] = (time.time(), self._order_meta.get(parts[1], (0.0, "day"))[1])
+                return 200, self._ack_json(order)
+            if method == "GET":
+                return 200, self._order_json(vars(broker.orders[parts[1]]))
+        return 404, {"code": 40410000, "message": "order not found"}
+
+    def _ack_json(self, order: SimOrder) -> dict:
+        # the REST reply shows the order as accepted; fills and rejects follow on trade_updates
+        return self._order_json({**vars(order), "status": "new", "filled_qty": 0.0})
+
+    def _account_json(self, equity: float) -> dict:
+        cash = self.broker.cash
+        return {
+            "id": "00000000-0000-4000-8000-000000000001",
+            "account_number": "PASTANDIN",
+            "status": "ACTIVE",
+            "currency": "USD",
+            "cash": _num(cash),
+            "equity": _num(equity),
+            "last_equity": _num(equity),
+            "portfolio_value": _num(equity),
+            "buying_power": _num(max(0.0, equity * 2)),
+            "regt_buying_power": _num(max(0.0, equity * 2)),
+            "daytrading_buying_power": _num(max(0.0, equity * 4)),
+            "non_marginable_buying_power": _num(max(0.0, cash)),
+            "multiplier": "2",
+            "daytrade_count": 0,
+            "pattern_day_trader": False,
+            "trading_blocked": False,
+            "transfers_blocked": False,
+            "account_blocked": False,
+            "shorting_enabled": True,
+        }
+
+    def _position_json(self, pos) -> dict:
+        st = self.states.get(pos.symbol)
+        price = st.mid if st and st.mid > 0 else pos.avg_entry_price
+        return {
+            "asset_id": self._asset_ids.get(pos.symbol) or str(uuid.uuid5(uuid.NAMESPACE_DNS, pos.symbol)),
+            "symbol": pos.symbol,
+            "exchange": "NASDAQ",
+            "asset_class": "us_equity",
+            "avg_entry_price": _num(pos.avg_entry_price),
+            "qty": _num(pos.qty),
+            "qty_available": _num(pos.qty),
+            "side": "long" if pos.qty > 0 else "short",
+            "cost_basis": _num(pos.qty * pos.avg_entry_price),
+            "market_value": _num(pos.qty * price),
+            "current_price": _num(price),
+            "unrealized_pl": _num(pos.qty * (price - pos.avg_entry_price)),
+        }
+
+    def stats(self, elapsed: float) -> dict:
+        c = self.counters
+        return {
+            "symbols": len(self.universe),
+            "data_clients": len(self._data_clients),
+            "trade_clients": len(self._trade_clients),
+            "quotes_per_sec": round(c["quotes"] / elapsed) if elapsed > 0 else 0,
+            "trades_per_sec": round(c["trades"] / elapsed) if elapsed > 0 else 0,
+            "frames": c["frames"],
+            "http_requests": c["http"],
+            "http_errors": c["errors"],
+            "orders": self.broker.submitted,
+            "fills": self.broker.filled,
+            "rejects": self.broker.rejected,
+            "trade_updates": c["updates"],
+            "lagged_steps": c["lagged_steps"],
+        }
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = StandInServer(
+        host=args.host,
+        http_port=args.http_port,
+        ws_port=args.ws_port,
+        quote_rate=args.quote_rate,
+        trade_rate=args.trade_rate,
+        ack_ms=args.ack_ms,
+        ack_jitter_ms=args.ack_jitter_ms,
+        fill_prob=args.fill_prob,
+        reject_rate=args.reject_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    await server.start()
+    print(f"REST http://{args.host}:{args.http_port}  data ws://{args.host}:{args.ws_port}/v2/iex  trade_updates ws://{args.host}:{args.ws_port}/stream", flush=True)
+    try:
+        while True:
+            wall, cpu = time.perf_counter(), time.process_time()
+            quotes, trades = server.counters["quotes"], server.counters["trades"]
+            await asyncio.sleep(args.stats_sec)
+            elapsed = time.perf_counter() - wall
+            stats = server.stats(elapsed)
+            stats["quotes_per_sec"] = round((server.counters["quotes"] - quotes) / elapsed)
+            stats["trades_per_sec"] = round((server.counters["trades"] - trades) / elapsed)
+            stats["cpu_pct"] = round((time.process_time() - cpu) / elapsed * 100, 1)
+            print(json.dumps(stats), flush=True)
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Local Alpaca paper stand-in for load tests")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--http-port", type=int, default=8900)
+    p.add_argument("--ws-port", type=int, default=8901)
+    p.add_argument("--quote-rate", type=float, default=5.0, help="quotes/sec per subscribed symbol")
+    p.add_argument("--trade-rate", type=float, default=1.0, help="trades/sec per subscribed symbol")
+    p.add_argument("--ack-ms", type=float, default=5.0, help="REST order ack latency")
+    p.add_argument("--ack-jitter-ms", type=float, default=2.0)
+    p.add_argument("--fill-prob", type=float, default=1.0, help="chance a marketable limit order fills on each quote")
+    p.add_argument("--reject-rate", type=float, default=0.0, help="share of orders rejected via trade_updates")
+    p.add_argument("--error-rate", type=float, default=0.0, help="share of order submits answered with HTTP 403")
+    p.add_argument("--stats-sec", type=float, default=10.0)
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
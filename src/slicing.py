@@ -0,0 +1,170 @@
+from __future__ import annotations
+import math
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from alpaca.trading.enums import OrderSide
+
+from .execution import OrderIntent
+from .utils import clock
+
+# strategy name flatten_all sends under; its exits take over any exit in progress
+FLATTEN_STRATEGY = "flatten"
+
+
+@dataclass
+class ParentOrder:
+    key: str
+    symbol: str
+    side: str
+    strategy: str
+    qty: float
+    start: float
+    deadline: float
+    arrival_mid: float
+    # latest market intent for the exit, re-used once the strategy stops sending it
+    intent: Optional[OrderIntent] = None
+    next_at: float = 0.0
+    last_at: float = 0.0
+    children: int = 0
+    child_mid: float = 0.0
+    # child client order id -> (filled qty, avg fill price, mid when it was sent)
+    fills: Dict[str, Tuple[float, float, float]] = field(default_factory=dict)
+
+    @property
+    def filled(self) -> float:
+        return sum(qty for qty, _, _ in self.fills.values())
+
+
+class ExitSlicer:
+    # Works market exits as a parent order sent in market child orders, one at
+    # a time: each child is at least the TWAP share of what is left until the
+    # deadline and at most what the touch shows (iceberg style), so a large
+    # exit does not sweep the book but always finishes by the deadline. The
+    # deadline is horizon_sec after the first child, capped at `cutoff`.
+    # Parents under min_notional go out in one child. A parent outlives its
+    # intent (strategies send an exit once) and is worked until it is filled
+    # or its deadline passes; only an opposite intent from the same strategy
+    # or a flatten of the symbol cancels it. A filled parent keeps its intent
+    # id blocked for hold_sec so a re-sent exit computed from stale positions
+    # does not start a second one.
+    def __init__(self, states: Mapping, horizon_sec: float = 60.0, interval_sec: float = 2.0, min_notional: float = 2000.0, touch_frac: float = 1.0, hold_sec: float = 15.0, on_done: Optional[Callable[[dict], None]] = None):
+        self.states = states
+        self.horizon_sec = horizon_sec
+        self.interval_sec = max(0.0, interval_sec)
+        self.min_notional = min_notional
+        self.touch_frac = touch_frac
+        self.hold_sec = hold_sec
+        self.on_done = on_done
+        self.cutoff = math.inf
+        self.parents: Dict[str, ParentOrder] = {}
+        self._held: Dict[str, float] = {}
+        self.completed = 0
+
+    def child(self, key: str, intent: OrderIntent) -> Optional[OrderIntent]:
+        # next child for a market intent with no child working, or None if not due
+        now = clock.now()
+        parent = self.parents.get(key)
+        if parent is None:
+            if self._held.get(key, 0.0) > now:
+                return None
+            self._held.pop(key, None)
+            st = self.states.get(intent.symbol)
+            mid = st.mid if st and st.mid > 0 else float(intent.limit_price or 0.0)
+            deadline = min(now + self.horizon_sec, self.cutoff)
+            parent = ParentOrder(key, intent.symbol, intent.side.value, intent.strategy, float(intent.qty), now, deadline, mid)
+            self.parents[key] = parent
+        parent.intent = intent
+        # the re-sent intent reflects the latest positions, which may already be smaller
+        remaining = min(parent.qty - parent.filled, float(intent.qty))
+        if remaining <= 1e-9:
+            self._finish(parent, "filled")
+            return None
+        if now < parent.next_at:
+            return None
+        qty = self._child_qty(parent, remaining, now)
+        st = self.states.get(intent.symbol)
+        parent.child_mid = st.mid if st and st.mid > 0 else parent.arrival_mid
+        parent.children += 1
+        parent.last_at = now
+        parent.next_at = now + self.interval_sec
+        return replace(intent, qty=qty)
+
+    def _child_qty(self, parent: ParentOrder, remaining: float, now: float) -> float:
+        if now >= parent.deadline or remaining * parent.arrival_mid < self.min_notional:
+            return remaining
+        slices = max(1, math.ceil((parent.deadline - now) / self.interval_sec)) if self.interval_sec > 0 else 1
+        qty = math.ceil(remaining / slices)
+        st = self.states.get(parent.symbol)
+        if st is not None and self.touch_frac > 0:
+            shown = st.bid_size if parent.side == OrderSide.SELL.value else st.ask_size
+            qty = max(qty, math.floor(shown * self.touch_frac))
+        return min(remaining, float(max(qty, 1)))
+
+    def on_fill(self, key: str, client_order_id: str, payload: dict) -> None:
+        parent = self.parents.get(key)
+        if parent is None:
+            return
+        qty = float(payload.get("filled_qty") or 0.0)
+        price = float(payload.get("filled_avg_price") or 0.0)
+        mid = parent.fills[client_order_id][2] if client_order_id in parent.fills else parent.child_mid
+        parent.fills[client_order_id] = (qty, price, mid)
+        if parent.filled >= parent.qty - 1e-9:
+            self._finish(parent, "filled")
+
+    def supersede(self, intents: Iterable[OrderIntent]) -> None:
+        by_symbol: Dict[str, List[ParentOrder]] = {}
+        for parent in self.parents.values():
+            by_symbol.setdefault(parent.symbol, []).append(parent)
+        for intent in intents:
+            for parent in by_symbol.get(intent.symbol, ()):
+                if parent.key not in self.parents:
+                    continue
+                if intent.strategy == parent.strategy and intent.side.value != parent.side:
+                    self._finish(parent, "canceled")
+                elif intent.strategy == FLATTEN_STRATEGY and parent.strategy != FLATTEN_STRATEGY:
+                    self._finish(parent, "overridden")
+
+    def expire(self, key: str) -> None:
+        parent = self.parents.get(key)
+        if parent is not None:
+            self._finish(parent, "expired")
+
+    def _finish(self, parent: ParentOrder, status: str) -> None:
+        if self.parents.pop(parent.key, None) is None:
+            return
+        now = clock.now()
+        if status == "filled":
+            self._held[parent.key] = now + self.hold_sec
+        self.completed += 1
+        if self.on_done:
+            self.on_done(self.report(parent, status, now))
+
+    def report(self, parent: ParentOrder, status: str, now: float) -> dict:
+        filled = parent.filled
+        notional = sum(qty * px for qty, px, _ in parent.fills.values())
+        mid_cost = sum(qty * (px - mid) for qty, px, mid in parent.fills.values() if mid > 0)
+        sign = 1.0 if parent.side == OrderSide.BUY.value else -1.0
+        avg = notional / filled if filled > 0 else 0.0
+        out = {
+            "key": parent.key,
+            "symbol": parent.symbol,
+            "side": parent.side,
+            "strategy": parent.strategy,
+            "status": status,
+            "qty": parent.qty,
+            "filled": filled,
+            "children": parent.children,
+            "duration_sec": round(now - parent.start, 3),
+            "late": now > parent.deadline,
+            "arrival_mid": parent.arrival_mid,
+            "avg_price": round(avg, 4),
+        }
+        if filled > 0 and parent.arrival_mid > 0:
+            # positive is cost: paid above the mid on buys, sold below it on sells
+            out["slippage_bps"] = round(sign * (avg - parent.arrival_mid) / parent.arrival_mid * 1e4, 2)
+            out["slippage_vs_send_mid_bps"] = round(sign * mid_cost / (filled * parent.arrival_mid) * 1e4, 2)
+        return out
+
+    def stats(self) -> dict:
+        return {"working": len(self.parents), "completed": self.completed}
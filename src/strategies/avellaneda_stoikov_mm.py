@@ -1,5 +1,4 @@
 from __future__ import annotations
-import time
 from typing import Dict, List
 import math
 
@@ -9,6 +8,7 @@ from .base import Strategy
 from ..data_stream import MarketDataStream
 from ..execution import OrderIntent
 from ..risk import PositionState
+from ..utils import clock
 
 
 class AvellanedaStoikovMM(Strategy):
@@ -24,7 +24,7 @@ class AvellanedaStoikovMM(Strategy):
         self.last_refresh = 0.0
 
     def on_tick(self, data: MarketDataStream, positions: Dict[str, PositionState]) -> List[OrderIntent]:
-        now = time.time()
+        now = clock.now()
         if (now - self.last_refresh) * 1000 < self.refresh_ms:
             return []
         self.last_refresh = now
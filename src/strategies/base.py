@@ -10,9 +10,24 @@ from ..data_stream import MarketDataStream
 
 class Strategy:
     name = ""
+    # seconds per sample the strategy adds to its own rolling windows; 0 adds one
+    # on every on_tick, which on the timer loop is one per tick interval
+    sample_sec = 0.0
 
     def __init__(self, symbols: List[str]):
         self.symbols = symbols
+        # window key -> time-grid cell of its last sample
+        self._sampled: Dict[object, int] = {}
+
+    def _sample_due(self, key: object, now: float) -> bool:
+        # at most one sample per sample_sec cell, taken on the first on_tick in it
+        if self.sample_sec <= 0:
+            return True
+        cell = int(now // self.sample_sec)
+        if self._sampled.get(key) == cell:
+            return False
+        self._sampled[key] = cell
+        return True
 
     def on_tick(self, data: MarketDataStream, positions: Dict[str, PositionState]) -> List[OrderIntent]:
         return []
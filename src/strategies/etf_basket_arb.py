@@ -1,5 +1,4 @@
 from __future__ import annotations
-import time
 from typing import Dict, List, Tuple
 
 from alpaca.trading.enums import OrderSide, TimeInForce
@@ -8,6 +7,7 @@ from .base import Strategy
 from ..data_stream import MarketDataStream
 from ..execution import OrderIntent
 from ..risk import PositionState
+from ..utils import clock
 from ..utils.rolling import RollingWindow
 from ..utils.math import zscore
 
@@ -37,7 +37,7 @@ class ETFBasketArb(Strategy):
 
     def on_tick(self, data: MarketDataStream, positions: Dict[str, PositionState]) -> List[OrderIntent]:
         intents: List[OrderIntent] = []
-        now = time.time()
+        now = clock.now()
         for p in self.etf_pairs:
             e1, e2 = p
             st1 = data.states.get(e1)
@@ -46,7 +46,8 @@ class ETFBasketArb(Strategy):
                 continue
             spread = st1.mid - st2.mid
             w = self.spreads[p]
-            w.add(spread)
+            if self._sample_due(p, now):
+                w.add(spread)
             if len(w) < 30:
                 continue
             z = zscore(spread, w.mean(), w.std())
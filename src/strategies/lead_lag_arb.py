@@ -1,5 +1,4 @@
 from __future__ import annotations
-import time
 from typing import Dict, List
 
 from alpaca.trading.enums import OrderSide, TimeInForce
@@ -8,6 +7,7 @@ from .base import Strategy
 from ..data_stream import MarketDataStream
 from ..execution import OrderIntent
 from ..risk import PositionState
+from ..utils import clock
 
 
 class LeadLagArb(Strategy):
@@ -29,7 +29,7 @@ class LeadLagArb(Strategy):
         if not leader_state or len(leader_state.mid_window) < 5:
             return []
         leader_ret = self._recent_return(leader_state)
-        now = time.time()
+        now = clock.now()
         for sym in self.laggers:
             st = data.states.get(sym)
             if not st or len(st.mid_window) < 5:
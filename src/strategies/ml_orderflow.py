@@ -1,5 +1,4 @@
 from __future__ import annotations
-import time
 from typing import Dict, List, Tuple
 import numpy as np
 from sklearn.linear_model import SGDClassifier
@@ -10,6 +9,7 @@ from .base import Strategy
 from ..data_stream import MarketDataStream
 from ..execution import OrderIntent
 from ..risk import PositionState
+from ..utils import clock
 
 
 class MLOrderflow(Strategy):
@@ -27,11 +27,11 @@ class MLOrderflow(Strategy):
         self.active: Dict[str, dict] = {}
         self.trained: Dict[str, bool] = {s: False for s in symbols}
         self.last_trade_ts: Dict[str, float] = {s: 0.0 for s in symbols}
-        self.last_reset_ts: Dict[str, float] = {s: time.time() for s in symbols}
+        self.last_reset_ts: Dict[str, float] = {s: clock.now() for s in symbols}
 
     def on_tick(self, data: MarketDataStream, positions: Dict[str, PositionState]) -> List[OrderIntent]:
         intents: List[OrderIntent] = []
-        now = time.time()
+        now = clock.now()
         for sym in self.symbols:
             st = data.states.get(sym)
             if not st or st.mid <= 0 or st.bid <= 0 or st.ask <= 0:
@@ -42,7 +42,8 @@ class MLOrderflow(Strategy):
                 self.buffers[sym].clear()
                 self.last_reset_ts[sym] = now
             features = self._features(st)
-            self.buffers[sym].append((now, features, st.mid))
+            if self._sample_due(sym, now):
+                self.buffers[sym].append((now, features, st.mid))
             self._train(sym, now, st.mid)
 
             active = self.active.get(sym)
@@ -78,10 +79,11 @@ class MLOrderflow(Strategy):
             imbalance = (st.bid_size - st.ask_size) / (st.bid_size + st.ask_size)
         ret = st.ret_window.last() if len(st.ret_window) > 0 else 0.0
         vol = st.ret_window.std()
-        trade_imb = 0.0
-        if st.last_trade > 0 and st.mid > 0:
-            trade_imb = 1.0 if st.last_trade > st.mid else -1.0
-        return np.array([spread, imbalance, ret, trade_imb, vol], dtype=float)
+        flow = st.flow
+        trade_imb = flow.imbalance(10.0)
+        vwap = flow.vwap(60.0)
+        vwap_dev = st.mid / vwap - 1.0 if vwap > 0 else 0.0
+        return np.array([spread, imbalance, ret, trade_imb, vol, vwap_dev, flow.realized_vol(60.0)], dtype=float)
 
     def _train(self, sym: str, now: float, mid_now: float) -> None:
         buf = self.buffers[sym]
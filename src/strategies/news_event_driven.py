@@ -1,5 +1,4 @@
 from __future__ import annotations
-import time
 from typing import Dict, List
 
 from alpaca.trading.enums import OrderSide, TimeInForce
@@ -8,6 +7,7 @@ from .base import Strategy
 from ..data_stream import MarketDataStream
 from ..execution import OrderIntent
 from ..risk import PositionState
+from ..utils import clock
 
 
 class NewsEventDriven(Strategy):
@@ -24,11 +24,11 @@ class NewsEventDriven(Strategy):
     def on_news(self, symbol: str, headline: str) -> None:
         text = headline.lower()
         if any(k in text for k in self.keywords):
-            self.events.append({"symbol": symbol, "headline": headline, "ts": time.time()})
+            self.events.append({"symbol": symbol, "headline": headline, "ts": clock.now()})
 
     def on_tick(self, data: MarketDataStream, positions: Dict[str, PositionState]) -> List[OrderIntent]:
         intents: List[OrderIntent] = []
-        now = time.time()
+        now = clock.now()
         for sym, info in list(self.active.items()):
             if now - info["ts"] > self.max_hold_sec:
                 st = data.states.get(sym)
@@ -1,7 +1,5 @@
 from __future__ import annotations
-import time
 from typing import Dict, List, Tuple
-import numpy as np
 
 from alpaca.trading.enums import OrderSide, TimeInForce
 
@@ -9,8 +7,9 @@ from .base import Strategy
 from ..data_stream import MarketDataStream
 from ..execution import OrderIntent
 from ..risk import PositionState
-from ..utils.rolling import RollingWindow
-from ..utils.math import zscore, ols_beta
+from ..utils import clock
+from ..utils.rolling import RollingWindow, RollingOLS
+from ..utils.math import zscore
 
 
 class PairsStatArb(Strategy):
@@ -26,28 +25,30 @@ class PairsStatArb(Strategy):
         self.max_hold_sec = max_hold_sec
         self.notional = notional
         self.spreads: Dict[Tuple[str, str], RollingWindow] = {p: RollingWindow(window) for p in self.pairs}
+        self.regressions: Dict[Tuple[str, str], RollingOLS] = {p: RollingOLS(window) for p in self.pairs}
         self.beta: Dict[Tuple[str, str], float] = {p: 1.0 for p in self.pairs}
-        self.last_beta_ts = 0.0
+        self.min_beta_samples = 50
         self.active: Dict[Tuple[str, str], dict] = {}
 
     def on_tick(self, data: MarketDataStream, positions: Dict[str, PositionState]) -> List[OrderIntent]:
         intents: List[OrderIntent] = []
-        now = time.time()
+        now = clock.now()
         for p in self.pairs:
             s1, s2 = p
             st1 = data.states.get(s1)
             st2 = data.states.get(s2)
             if not st1 or not st2 or st1.mid <= 0 or st2.mid <= 0:
                 continue
-            if now - self.last_beta_ts > 60:
-                x = st2.mid_window.values()
-                y = st1.mid_window.values()
-                if len(x) >= 50 and len(y) >= 50:
-                    self.beta[p] = ols_beta(x, y)
-                self.last_beta_ts = now
+            sample = self._sample_due(p, now)
+            if sample:
+                reg = self.regressions[p]
+                reg.add(st2.mid, st1.mid)
+                if len(reg) >= self.min_beta_samples:
+                    self.beta[p] = reg.beta()
             spread = st1.mid - self.beta[p] * st2.mid
             w = self.spreads[p]
-            w.add(spread)
+            if sample:
+                w.add(spread)
             if len(w) < 30:
                 continue
             z = zscore(spread, w.mean(), w.std())
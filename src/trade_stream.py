@@ -1,17 +1,23 @@
 from __future__ import annotations
 import asyncio
+import time
 from typing import Awaitable, Callable, List, Optional
 
 from alpaca.trading.stream import TradingStream
 
+STABLE_CONNECTION_SEC = 30.0
+
 
 class TradeStream:
-    def __init__(self, api_key: str, api_secret: str):
+    def __init__(self, api_key: str, api_secret: str, url: Optional[str] = None):
         self.api_key = api_key
         self.api_secret = api_secret
-        self._stream = TradingStream(api_key, api_secret, paper=True)
+        self._stream = TradingStream(api_key, api_secret, paper=True, url_override=url or None)
         self._task: Optional[asyncio.Task] = None
         self._running = False
+        self._stopped = asyncio.Event()
+        self.reconnects = 0
+        self.last_error = ""
         self._handlers: List[Callable[[dict], Awaitable[None]]] = []
 
     def add_handler(self, handler: Callable[[dict], Awaitable[None]]) -> None:
@@ -24,20 +30,44 @@ class TradeStream:
 
     async def stop(self) -> None:
         self._running = False
+        self._stopped.set()
         if self._stream:
             await self._stream.stop_ws()
         if self._task:
             await self._task
 
     async def _run_loop(self) -> None:
+        # alpaca-py's _run_forever retries a failed connect, auth or dropped socket
+        # itself with no delay, so its connect/consume steps are driven from here
+        # instead (private API; pyproject pins the version). Every attempt after
+        # the first waits out the backoff, which resets once a connection has
+        # stayed up for STABLE_CONNECTION_SEC.
+        stream = self._stream
         backoff = 1.0
         while self._running:
+            connected = None
             try:
-                await asyncio.to_thread(self._stream.run)
+                # connects, authenticates and listens to trade_updates
+                await stream._start_ws()
+                connected = time.monotonic()
+                await stream._consume()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                try:
+                    await stream.close()
+                except Exception:
+                    pass
+            if not self._running:
+                break
+            self.reconnects += 1
+            if connected is not None and time.monotonic() - connected >= STABLE_CONNECTION_SEC:
                 backoff = 1.0
-            except Exception:
-                await asyncio.sleep(backoff)
-                backoff = min(backoff * 2, 60.0)
+            try:
+                await asyncio.wait_for(self._stopped.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, 60.0)
 
     async def _on_update(self, data) -> None:
         payload = data.dict() if hasattr(data, "dict") else data
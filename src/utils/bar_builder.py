@@ -0,0 +1,146 @@
+from __future__ import annotations
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from . import clock
+
+DEFAULT_TIMEFRAMES: Tuple[int, ...] = (1, 60, 300)
+
+
+@dataclass
+class LocalBar:
+    start: float
+    timeframe: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float = 0.0
+    trades: int = 0
+    vwap: float = 0.0
+    from_trades: bool = True
+
+
+BarListener = Callable[[LocalBar], None]
+
+
+class _Building:
+    # Open bar for one timeframe: trade OHLCV plus a mid-quote OHLC used only
+    # when the interval had no trades.
+    __slots__ = ("start", "end", "o", "h", "l", "c", "v", "pv", "n", "mo", "mh", "ml", "mc")
+
+    def __init__(self, start: float, end: float):
+        self.start = start
+        self.end = end
+        self.o = self.h = self.l = self.c = 0.0
+        self.v = self.pv = 0.0
+        self.n = 0
+        self.mo = self.mh = self.ml = self.mc = 0.0
+
+
+class BarBuilder:
+    # Builds clock-aligned OHLCV bars for several timeframes (seconds) from one
+    # symbol's trades and quotes. A bar is emitted once an event or roll() moves
+    # past its end; late events are folded into the open bar. roll() runs on the
+    # wall clock, so an event for an interval it already closed is dropped and
+    # counted in late rather than emitting that interval a second time.
+    def __init__(self, timeframes: Sequence[int] = DEFAULT_TIMEFRAMES, history: int = 300, listener: Optional[BarListener] = None):
+        self.timeframes = tuple(sorted(int(tf) for tf in timeframes))
+        self.max_history = history
+        # per-timeframe history, created with the first closed bar
+        self.history: Dict[int, Deque[LocalBar]] = {}
+        self.listener = listener
+        self._open: List[Optional[_Building]] = [None] * len(self.timeframes)
+        # end of the last closed bar per timeframe
+        self._closed_end: List[float] = [-math.inf] * len(self.timeframes)
+        self.late = 0
+        # earliest end among the open bars; events before it skip the boundary checks
+        self._next_end = -math.inf
+
+    def on_trade(self, price: float, size: float, ts: float) -> None:
+        if price <= 0:
+            return
+        for b in self._current(ts):
+            if b.n == 0:
+                b.o = b.h = b.l = price
+            elif price > b.h:
+                b.h = price
+            elif price < b.l:
+                b.l = price
+            b.c = price
+            b.v += size
+            b.pv += price * size
+            b.n += 1
+
+    def on_quote(self, mid: float, ts: float) -> None:
+        if mid <= 0:
+            return
+        for b in self._current(ts):
+            if b.mo == 0.0:
+                b.mo = b.mh = b.ml = mid
+            elif mid > b.mh:
+                b.mh = mid
+            elif mid < b.ml:
+                b.ml = mid
+            b.mc = mid
+
+    def _current(self, ts: float) -> List[_Building]:
+        if ts < self._next_end:
+            return self._open
+        live = []
+        for k, tf in enumerate(self.timeframes):
+            b = self._open[k]
+            if b is not None and ts >= b.end:
+                self._close(k, tf, b)
+                b = self._open[k] = None
+            if b is None:
+                if ts < self._closed_end[k]:
+                    continue
+                start = float(math.floor(ts / tf) * tf)
+                b = self._open[k] = _Building(start, start + tf)
+            live.append(b)
+        if len(live) < len(self._open):
+            self.late += 1
+            self._next_end = -math.inf
+        else:
+            self._next_end = min((b.end for b in live), default=math.inf)
+        return live
+
+    def roll(self, now: Optional[float] = None) -> None:
+        # close bars whose interval has ended even if no event arrived since
+        now = clock.now() if now is None else now
+        for k, tf in enumerate(self.timeframes):
+            b = self._open[k]
+            if b is not None and now >= b.end:
+                self._close(k, tf, b)
+                self._open[k] = None
+                self._next_end = -math.inf
+
+    def _close(self, k: int, tf: int, b: _Building) -> None:
+        self._closed_end[k] = b.end
+        if b.n:
+            bar = LocalBar(b.start, tf, b.o, b.h, b.l, b.c, b.v, b.n, b.pv / b.v if b.v > 0 else b.c, True)
+        elif b.mo > 0:
+            bar = LocalBar(b.start, tf, b.mo, b.mh, b.ml, b.mc, 0.0, 0, b.mc, False)
+        else:
+            return
+        self.bars(tf).append(bar)
+        if self.listener:
+            self.listener(bar)
+
+    def bars(self, timeframe: int) -> Deque[LocalBar]:
+        hist = self.history.get(timeframe)
+        if hist is None:
+            if timeframe not in self.timeframes:
+                raise KeyError(timeframe)
+            hist = self.history[timeframe] = deque(maxlen=self.max_history)
+        return hist
+
+    def last(self, timeframe: int) -> Optional[LocalBar]:
+        hist = self.bars(timeframe)
+        return hist[-1] if hist else None
+
+    def closes(self, timeframe: int) -> List[float]:
+        return [b.close for b in self.bars(timeframe)]
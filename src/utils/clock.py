@@ -0,0 +1,31 @@
+from __future__ import annotations
+import time
+from typing import Callable
+
+# Wall-clock source for strategy/state code; replay swaps in a simulated clock.
+_source: Callable[[], float] = time.time
+
+
+def now() -> float:
+    return _source()
+
+
+def set_source(source: Callable[[], float]) -> None:
+    global _source
+    _source = source
+
+
+def reset() -> None:
+    set_source(time.time)
+
+
+class SimClock:
+    def __init__(self, start: float = 0.0):
+        self.ts = start
+
+    def now(self) -> float:
+        return self.ts
+
+    def advance_to(self, ts: float) -> None:
+        if ts > self.ts:
+            self.ts = ts
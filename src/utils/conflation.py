@@ -0,0 +1,64 @@
+from __future__ import annotations
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+
+class ConflatingQueue:
+    # Bounded single-consumer queue. put() with a key replaces any pending item
+    # under that key in place (latest value wins); put_fifo() always appends.
+    # When full the oldest pending item is dropped.
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.received = 0
+        self.superseded = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._seq = itertools.count()
+        self._event: Optional[asyncio.Event] = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, key: Hashable, item: Any) -> None:
+        self.received += 1
+        if key in self._items:
+            self._items[key] = item
+            self.superseded += 1
+            return
+        self._append(key, item)
+
+    def put_fifo(self, item: Any) -> None:
+        self.received += 1
+        self._append(("fifo", next(self._seq)), item)
+
+    def _append(self, key: Hashable, item: Any) -> None:
+        if self.maxsize > 0 and len(self._items) >= self.maxsize:
+            self._items.popitem(last=False)
+            self.dropped += 1
+        self._items[key] = item
+        if len(self._items) > self.max_depth:
+            self.max_depth = len(self._items)
+        if self._event is not None:
+            self._event.set()
+
+    async def get_batch(self) -> List[Any]:
+        if self._event is None:
+            self._event = asyncio.Event()
+        while not self._items and not self._closed:
+            self._event.clear()
+            await self._event.wait()
+        batch = list(self._items.values())
+        self._items.clear()
+        return batch
+
+    def close(self) -> None:
+        self._closed = True
+        if self._event is not None:
+            self._event.set()
+
+    def stats(self) -> dict:
+        return {"received": self.received, "depth": len(self._items), "max_depth": self.max_depth, "superseded": self.superseded, "dropped": self.dropped}
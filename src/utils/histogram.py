@@ -0,0 +1,85 @@
+from __future__ import annotations
+from typing import Dict, List
+
+
+class LatencyHistogram:
+    # HDR-style log-linear histogram over integer microseconds: 2**bits linear
+    # sub-buckets per power of two, so relative error stays under 2**-bits.
+    def __init__(self, max_value_us: int = 60_000_000, sub_bucket_bits: int = 5):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.max_value_us = max_value_us
+        self.counts: List[int] = [0] * (self._index(max_value_us) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+
+    def _index(self, v: int) -> int:
+        if v < 2 * self.sub_buckets:
+            return v
+        shift = v.bit_length() - self.sub_bucket_bits - 1
+        return shift * self.sub_buckets + (v >> shift)
+
+    def _lower_bound(self, idx: int) -> int:
+        if idx < 2 * self.sub_buckets:
+            return idx
+        shift = idx // self.sub_buckets - 1
+        return (idx - shift * self.sub_buckets) << shift
+
+    def record(self, seconds: float) -> None:
+        self.record_us(int(seconds * 1_000_000))
+
+    def record_us(self, v: int) -> None:
+        if v < 0:
+            v = 0
+        elif v > self.max_value_us:
+            v = self.max_value_us
+        self.counts[self._index(v)] += 1
+        if not self.count or v < self.min_us:
+            self.min_us = v
+        if v > self.max_us:
+            self.max_us = v
+        self.count += 1
+        self.total_us += v
+
+    def percentile_us(self, pct: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, int(round(self.count * pct / 100.0)))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            if not c:
+                continue
+            seen += c
+            if seen >= target:
+                return min(self._lower_bound(idx + 1) - 1, self.max_us)
+        return self.max_us
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for idx, c in enumerate(other.counts):
+            if c:
+                self.counts[idx] += c
+        if other.count:
+            self.min_us = other.min_us if not self.count else min(self.min_us, other.min_us)
+            self.max_us = max(self.max_us, other.max_us)
+        self.count += other.count
+        self.total_us += other.total_us
+
+    def reset(self) -> None:
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_us / self.count / 1000.0, 3) if self.count else 0.0,
+            "min_ms": round(self.min_us / 1000.0, 3),
+            "p50_ms": round(self.percentile_us(50) / 1000.0, 3),
+            "p90_ms": round(self.percentile_us(90) / 1000.0, 3),
+            "p99_ms": round(self.percentile_us(99) / 1000.0, 3),
+            "max_ms": round(self.max_us / 1000.0, 3),
+        }
@@ -0,0 +1,197 @@
+from __future__ import annotations
+import asyncio
+import json
+import ssl
+import time
+import urllib.parse
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from .histogram import LatencyHistogram
+
+IDEMPOTENT = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class _Conn:
+    __slots__ = ("reader", "writer", "used", "requests")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.used = time.monotonic()
+        self.requests = 0
+
+
+class HttpPool:
+    # Minimal asyncio HTTP/1.1 client for one host: a bounded pool of
+    # keep-alive connections, a per-request timeout, and retries for
+    # idempotent methods (429/5xx and transport errors). Non-idempotent
+    # requests are only retried when a reused connection turns out to have
+    # been closed by the server before any response byte arrived.
+    def __init__(self, base_url: str, headers: Optional[Dict[str, str]] = None, max_connections: int = 8, timeout: float = 10.0, retries: int = 2, backoff: float = 0.05, idle_timeout: float = 30.0):
+        url = urllib.parse.urlsplit(base_url)
+        self.host = url.hostname or "localhost"
+        self.tls = url.scheme == "https"
+        self.port = url.port or (443 if self.tls else 80)
+        self.prefix = url.path.rstrip("/")
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        host = self.host if url.port is None else f"{self.host}:{self.port}"
+        lines = [f"Host: {host}"] + [f"{k}: {v}" for k, v in (headers or {}).items()]
+        self._header_blob = ("\r\n".join(lines) + "\r\n").encode("latin-1")
+        self._ssl = ssl.create_default_context() if self.tls else None
+        self._idle: Deque[_Conn] = deque()
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self.in_use = 0
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+        self.requests = 0
+        self.retried = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.waited = 0
+        self.latency = LatencyHistogram()
+
+    async def request(self, method: str, path: str, params: Optional[dict] = None, body: Optional[object] = None) -> Tuple[int, bytes]:
+        target = self.prefix + path
+        if params:
+            target += "?" + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        payload = json.dumps(body).encode() if body is not None else b""
+        idempotent = method in IDEMPOTENT
+        if self._slots.locked():
+            self.waited += 1
+        async with self._slots:
+            self.in_use += 1
+            try:
+                return await self._attempts(method, target, payload, idempotent)
+            finally:
+                self.in_use -= 1
+
+    async def _attempts(self, method: str, target: str, payload: bytes, idempotent: bool) -> Tuple[int, bytes]:
+        t0 = time.perf_counter()
+        attempt = 0
+        while True:
+            conn: Optional[_Conn] = None
+            reused = False
+            try:
+                conn, reused = await self._acquire()
+                status, data, keep = await asyncio.wait_for(self._roundtrip(conn, method, target, payload), self.timeout)
+            except asyncio.TimeoutError:
+                if conn is not None:
+                    self._discard(conn)
+                self.timeouts += 1
+                if idempotent and attempt < self.retries:
+                    attempt += 1
+                    self.retried += 1
+                    continue
+                self.errors += 1
+                raise
+            except (OSError, asyncio.IncompleteReadError) as e:
+                sent = conn is not None
+                if conn is not None:
+                    self._discard(conn)
+                # a refused connect or a stale keep-alive socket never reached the server
+                unsent = not sent or (reused and isinstance(e, (ConnectionError, asyncio.IncompleteReadError)))
+                if attempt < self.retries and (idempotent or unsent):
+                    attempt += 1
+                    self.retried += 1
+                    continue
+                self.errors += 1
+                raise
+            self.requests += 1
+            if keep:
+                conn.used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._discard(conn)
+            if status in RETRY_STATUS and idempotent and attempt < self.retries:
+                attempt += 1
+                self.retried += 1
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+                continue
+            self.latency.record(time.perf_counter() - t0)
+            return status, data
+
+    async def _acquire(self) -> Tuple[_Conn, bool]:
+        now = time.monotonic()
+        while self._idle:
+            conn = self._idle.pop()
+            if now - conn.used < self.idle_timeout and not conn.reader.at_eof():
+                self.reused += 1
+                return conn, True
+            self._discard(conn)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self._ssl, server_hostname=self.host if self.tls else None),
+            self.timeout,
+        )
+        self.opened += 1
+        return _Conn(reader, writer), False
+
+    def _discard(self, conn: _Conn) -> None:
+        self.closed += 1
+        conn.writer.close()
+
+    async def _roundtrip(self, conn: _Conn, method: str, target: str, payload: bytes) -> Tuple[int, bytes, bool]:
+        conn.requests += 1
+        head = f"{method} {target} HTTP/1.1\r\n".encode("latin-1") + self._header_blob
+        if payload:
+            head += b"Content-Type: application/json\r\n"
+        head += f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+        conn.writer.write(head + payload)
+        await conn.writer.drain()
+        reader = conn.reader
+        line = await reader.readline()
+        if not line:
+            raise ConnectionResetError("connection closed by server")
+        status = int(line.split(None, 2)[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n"):
+                break
+            if not line:
+                raise asyncio.IncompleteReadError(b"", None)
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        keep = headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return status, b"", keep
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            parts = []
+            while True:
+                size = int((await reader.readline()).split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                parts.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            return status, b"".join(parts), keep
+        if "content-length" in headers:
+            return status, await reader.readexactly(int(headers["content-length"])), keep
+        return status, await reader.read(), False
+
+    async def close(self) -> None:
+        while self._idle:
+            self._discard(self._idle.pop())
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.in_use + len(self._idle),
+            "in_use": self.in_use,
+            "idle": len(self._idle),
+            "opened": self.opened,
+            "reused": self.reused,
+            "closed": self.closed,
+            "requests": self.requests,
+            "retried": self.retried,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "waited": self.waited,
+            "latency": self.latency.snapshot(),
+        }
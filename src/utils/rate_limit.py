@@ -1,14 +1,37 @@
 from __future__ import annotations
-import time
 import asyncio
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Deque, List, Optional, Tuple
+
+from .histogram import LatencyHistogram
+
+
+class Priority(IntEnum):
+    URGENT = 0  # cancels and flattening market orders
+    REPLACE = 1
+    NEW = 2
+    POLL = 3  # account/positions/orders polling
 
 
 class TokenBucket:
-    def __init__(self, rate_per_sec: float, capacity: int):
+    # Token bucket with one FIFO queue per priority class. acquire() takes a
+    # token straight away when nobody is queued; otherwise it parks on a
+    # future and a single loop timer, set for the exact instant the next token
+    # refills, hands tokens out highest class first. A waiter parked longer
+    # than starve_sec goes ahead of the classes above it, so polling still
+    # gets through a saturated bucket.
+    def __init__(self, rate_per_sec: float, capacity: int, starve_sec: float = 2.0):
         self.rate_per_sec = rate_per_sec
         self.capacity = capacity
-        self.tokens = capacity
+        self.starve_sec = starve_sec
+        self.tokens = float(capacity)
         self.updated = time.monotonic()
+        self._queues: List[Deque[Tuple[asyncio.Future, float, int]]] = [deque() for _ in Priority]
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.granted = [0] * len(Priority)
+        self.wait = [LatencyHistogram() for _ in Priority]
 
     def _refill(self) -> None:
         now = time.monotonic()
@@ -18,10 +41,77 @@ class TokenBucket:
         self.tokens = min(self.capacity, self.tokens + delta * self.rate_per_sec)
         self.updated = now
 
-    async def acquire(self, tokens: int = 1) -> None:
+    async def acquire(self, tokens: int = 1, priority: Priority = Priority.NEW) -> None:
+        self._refill()
+        if self.tokens >= tokens and self._head() is None:
+            self.tokens -= tokens
+            self.granted[priority] += 1
+            self.wait[priority].record_us(0)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._queues[priority].append((fut, time.perf_counter(), tokens))
+        self._schedule()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # granted and cancelled in the same step: give the tokens back
+                self.tokens += tokens
+                self._schedule()
+            raise
+
+    def _head(self) -> Optional[Tuple[int, int]]:
+        # (class, tokens) of the next live waiter, dropping cancelled ones
+        head = None
+        starved = None
+        cutoff = time.perf_counter() - self.starve_sec
+        for cls, queue in enumerate(self._queues):
+            while queue and queue[0][0].done():
+                queue.popleft()
+            if not queue:
+                continue
+            if head is None:
+                head = (cls, queue[0][2])
+            elif queue[0][1] < cutoff and (starved is None or queue[0][1] < self._queues[starved][0][1]):
+                starved = cls
+        if starved is not None:
+            return starved, self._queues[starved][0][2]
+        return head
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            return
+        head = self._head()
+        if head is None:
+            return
+        self._refill()
+        delay = max(0.0, (head[1] - self.tokens) / self.rate_per_sec)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self) -> None:
+        self._timer = None
+        self._refill()
+        now = time.perf_counter()
         while True:
-            self._refill()
-            if self.tokens >= tokens:
-                self.tokens -= tokens
-                return
-            await asyncio.sleep(0.05)
+            head = self._head()
+            if head is None or self.tokens < head[1]:
+                break
+            cls, tokens = head
+            fut, t0, _ = self._queues[cls].popleft()
+            self.tokens -= tokens
+            self.granted[cls] += 1
+            self.wait[cls].record(now - t0)
+            fut.set_result(None)
+        self._schedule()
+
+    def depth(self) -> List[int]:
+        return [sum(1 for fut, _, _ in queue if not fut.done()) for queue in self._queues]
+
+    def stats(self) -> dict:
+        depth = self.depth()
+        return {
+            "tokens": round(self.tokens, 2),
+            "queued": {p.name.lower(): depth[p] for p in Priority},
+            "granted": {p.name.lower(): self.granted[p] for p in Priority},
+            "wait": {p.name.lower(): self.wait[p].snapshot() for p in Priority if self.granted[p]},
+        }
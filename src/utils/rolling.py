@@ -1,37 +1,79 @@
 from __future__ import annotations
-from collections import deque
-from typing import Deque, Iterable
+import math
 import numpy as np
 
 
 class RollingWindow:
+    # Ring buffer with every sample mirrored at i and i + maxlen so the window is
+    # always contiguous; mean/var use a sliding Welford update.
     def __init__(self, maxlen: int):
+        if maxlen <= 0:
+            raise ValueError("maxlen must be positive")
         self.maxlen = maxlen
-        self._data: Deque[float] = deque(maxlen=maxlen)
+        self._buf = np.zeros(2 * maxlen, dtype=np.float64)
+        self._head = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._evictions = 0
 
     def add(self, x: float) -> None:
-        self._data.append(x)
+        x = float(x)
+        n = self.maxlen
+        head = self._head
+        if self._count < n:
+            self._count += 1
+            delta = x - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (x - self._mean)
+        else:
+            old = float(self._buf[head])
+            old_mean = self._mean
+            self._mean = old_mean + (x - old) / n
+            self._m2 += (x - old) * (x - self._mean + old - old_mean)
+            if self._m2 < 0.0:
+                self._m2 = 0.0
+            self._evictions += 1
+        self._buf[head] = x
+        self._buf[head + n] = x
+        self._head = head + 1 if head + 1 < n else 0
+        if self._evictions >= n:
+            self._resync()
+
+    def _resync(self) -> None:
+        # Bound floating-point drift from the incremental updates; amortised O(1).
+        vals = self.values()
+        self._mean = float(vals.mean())
+        self._m2 = float(((vals - self._mean) ** 2).sum())
+        self._evictions = 0
 
     def values(self) -> np.ndarray:
-        if not self._data:
-            return np.array([], dtype=float)
-        return np.fromiter(self._data, dtype=float)
+        # read-only view, oldest first; contents change on the next add()
+        start = self._head if self._count == self.maxlen else 0
+        view = self._buf[start:start + self._count]
+        view.flags.writeable = False
+        return view
 
     def mean(self) -> float:
-        if not self._data:
+        if not self._count:
             return 0.0
-        return float(np.mean(self.values()))
+        return self._mean
 
-    def std(self) -> float:
-        if len(self._data) < 2:
+    def var(self) -> float:
+        if self._count < 2:
             return 0.0
-        return float(np.std(self.values(), ddof=1))
+        return self._m2 / (self._count - 1)
+
+    def std(self) -> float:
+        return math.sqrt(self.var())
 
     def last(self) -> float:
-        return self._data[-1] if self._data else 0.0
+        if not self._count:
+            return 0.0
+        return float(self._buf[self._head - 1 + self.maxlen])
 
     def __len__(self) -> int:
-        return len(self._data)
+        return self._count
 
 
 class RollingStats:
@@ -46,3 +88,202 @@ class RollingStats:
 
     def std(self) -> float:
         return self.window.std()
+
+
+class RollingOLS:
+    # Sliding-window regression of y on x; keeps means, var(x) and cov(x, y)
+    # as co-moments so beta() is O(1) per sample.
+    def __init__(self, maxlen: int):
+        if maxlen < 2:
+            raise ValueError("maxlen must be at least 2")
+        self.maxlen = maxlen
+        self._x = np.zeros(maxlen, dtype=np.float64)
+        self._y = np.zeros(maxlen, dtype=np.float64)
+        self._head = 0
+        self._count = 0
+        self._mx = 0.0
+        self._my = 0.0
+        self._sxx = 0.0
+        self._sxy = 0.0
+        self._evictions = 0
+
+    def add(self, x: float, y: float) -> None:
+        x = float(x)
+        y = float(y)
+        head = self._head
+        if self._count == self.maxlen:
+            self._remove(float(self._x[head]), float(self._y[head]))
+            self._evictions += 1
+        self._count += 1
+        dx = x - self._mx
+        self._mx += dx / self._count
+        self._my += (y - self._my) / self._count
+        self._sxx += dx * (x - self._mx)
+        self._sxy += dx * (y - self._my)
+        self._x[head] = x
+        self._y[head] = y
+        self._head = head + 1 if head + 1 < self.maxlen else 0
+        if self._evictions >= self.maxlen:
+            self._resync()
+
+    def _remove(self, x: float, y: float) -> None:
+        n = self._count
+        my_old = self._my
+        self._mx = (n * self._mx - x) / (n - 1)
+        self._my = (n * my_old - y) / (n - 1)
+        dx = x - self._mx
+        self._sxx = max(0.0, self._sxx - dx * (x - self._mx - dx / n))
+        self._sxy -= dx * (y - my_old)
+        self._count = n - 1
+
+    def _resync(self) -> None:
+        self._mx = float(self._x.mean())
+        self._my = float(self._y.mean())
+        dx = self._x - self._mx
+        self._sxx = float((dx * dx).sum())
+        self._sxy = float((dx * (self._y - self._my)).sum())
+        self._evictions = 0
+
+    def beta(self, default: float = 1.0) -> float:
+        if self._count < 2 or self._sxx <= 0.0:
+            return default
+        return self._sxy / self._sxx
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class RingMatrix:
+    # One rolling window per row, with per-row Welford mean/var so
+    # whole-universe stats are a single vector op. maxlen is one length for
+    # every row or a length per row; rows are packed end to end in one buffer.
+    def __init__(self, rows: int, maxlen, dtype=np.float32):
+        if np.isscalar(maxlen):
+            if maxlen <= 0:
+                raise ValueError("maxlen must be positive")
+            lens = np.full(rows, maxlen, dtype=np.int64)
+        else:
+            lens = np.asarray(maxlen, dtype=np.int64)
+            if len(lens) != rows or (rows and lens.min() <= 0):
+                raise ValueError("maxlen needs one positive length per row")
+        # the longest row
+        self.maxlen = int(maxlen) if np.isscalar(maxlen) else int(lens.max(initial=0))
+        self.data = np.zeros(int(lens.sum()), dtype=dtype)
+        # plain lists: read on every add, never written
+        self.lens = lens.tolist()
+        self.offsets = (np.cumsum(lens) - lens).tolist()
+        self.heads = np.zeros(rows, dtype=np.int32)
+        self.counts = np.zeros(rows, dtype=np.int32)
+        self._mean = np.zeros(rows, dtype=np.float64)
+        self._m2 = np.zeros(rows, dtype=np.float64)
+        self._evictions = np.zeros(rows, dtype=np.int32)
+        self._cast = np.dtype(dtype).type
+
+    @property
+    def rows(self) -> int:
+        return len(self.lens)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.data, self.heads, self.counts, self._mean, self._m2, self._evictions))
+
+    def add(self, row: int, x: float) -> None:
+        # round through the storage dtype so evictions subtract exactly what was added
+        x = float(self._cast(x))
+        n = self.lens[row]
+        off = self.offsets[row]
+        head = int(self.heads[row])
+        count = int(self.counts[row])
+        mean = float(self._mean[row])
+        m2 = float(self._m2[row])
+        if count < n:
+            count += 1
+            delta = x - mean
+            mean += delta / count
+            m2 += delta * (x - mean)
+            self.counts[row] = count
+        else:
+            old = float(self.data[off + head])
+            old_mean = mean
+            mean = old_mean + (x - old) / n
+            m2 = max(0.0, m2 + (x - old) * (x - mean + old - old_mean))
+            self._evictions[row] += 1
+        self.data[off + head] = x
+        self.heads[row] = head + 1 if head + 1 < n else 0
+        self._mean[row] = mean
+        self._m2[row] = m2
+        if self._evictions[row] >= n:
+            vals = self.data[off:off + n].astype(np.float64)
+            self._mean[row] = float(vals.mean())
+            self._m2[row] = float(((vals - self._mean[row]) ** 2).sum())
+            self._evictions[row] = 0
+
+    def values(self, row: int) -> np.ndarray:
+        count = int(self.counts[row])
+        off = self.offsets[row]
+        if count < self.lens[row]:
+            return self.data[off:off + count].astype(np.float64)
+        head = off + int(self.heads[row])
+        return np.concatenate((self.data[head:off + count], self.data[off:head])).astype(np.float64)
+
+    def last(self, row: int) -> float:
+        if not self.counts[row]:
+            return 0.0
+        head = int(self.heads[row])
+        return float(self.data[self.offsets[row] + (head if head else self.lens[row]) - 1])
+
+    def mean(self, row: int) -> float:
+        return float(self._mean[row]) if self.counts[row] else 0.0
+
+    def var(self, row: int) -> float:
+        count = int(self.counts[row])
+        if count < 2:
+            return 0.0
+        return float(self._m2[row]) / (count - 1)
+
+    def means(self) -> np.ndarray:
+        return np.where(self.counts > 0, self._mean, 0.0)
+
+    def variances(self) -> np.ndarray:
+        denom = np.maximum(self.counts - 1, 1)
+        return np.where(self.counts >= 2, self._m2 / denom, 0.0)
+
+    def stds(self) -> np.ndarray:
+        return np.sqrt(self.variances())
+
+    def row(self, row: int) -> "RingRow":
+        return RingRow(self, row)
+
+
+class RingRow:
+    # RollingWindow-compatible handle onto one row of a RingMatrix.
+    __slots__ = ("matrix", "index")
+
+    def __init__(self, matrix: RingMatrix, index: int):
+        self.matrix = matrix
+        self.index = index
+
+    @property
+    def maxlen(self) -> int:
+        return self.matrix.lens[self.index]
+
+    def add(self, x: float) -> None:
+        self.matrix.add(self.index, x)
+
+    def values(self) -> np.ndarray:
+        return self.matrix.values(self.index)
+
+    def mean(self) -> float:
+        return self.matrix.mean(self.index)
+
+    def var(self) -> float:
+        return self.matrix.var(self.index)
+
+    def std(self) -> float:
+        return math.sqrt(self.matrix.var(self.index))
+
+    def last(self) -> float:
+        return self.matrix.last(self.index)
+
+    def __len__(self) -> int:
+        return int(self.matrix.counts[self.index])
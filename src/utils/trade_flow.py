@@ -0,0 +1,126 @@
+from __future__ import annotations
+import math
+from typing import Dict, Sequence, Tuple
+
+from . import clock
+
+DEFAULT_WINDOWS: Tuple[float, ...] = (10.0, 60.0, 300.0)
+
+
+def classify(price: float, bid: float, ask: float, last_price: float, last_sign: int) -> int:
+    # Quote rule against the prevailing bid/ask; midpoint trades and trades
+    # without a quote fall back to the tick rule.
+    if bid > 0 and ask > 0:
+        if price >= ask:
+            return 1
+        if price <= bid:
+            return -1
+        mid = (bid + ask) / 2.0
+        if price > mid:
+            return 1
+        if price < mid:
+            return -1
+    if last_price > 0:
+        if price > last_price:
+            return 1
+        if price < last_price:
+            return -1
+    return last_sign
+
+
+class TradeFlow:
+    # Trade-flow aggregates over trailing time windows (seconds). All windows
+    # share one trade log kept as running prefix sums; each window is just an
+    # eviction cursor into it, so add() is amortised O(1) and every read is a
+    # difference of two prefix sums.
+    def __init__(self, windows: Sequence[float] = DEFAULT_WINDOWS):
+        if not windows:
+            raise ValueError("at least one window required")
+        self.windows = tuple(sorted(float(w) for w in windows))
+        self._slot: Dict[float, int] = {w: k for k, w in enumerate(self.windows)}
+        self._ts: list = []
+        # prefix sums of price*size, size, signed size, squared log return
+        self._pv = [0.0]
+        self._v = [0.0]
+        self._sv = [0.0]
+        self._r2 = [0.0]
+        self._start = [0] * len(self.windows)
+        self.last_price = 0.0
+        self.last_sign = 0
+        self.trades = 0
+
+    def add(self, price: float, size: float, ts: float, bid: float = 0.0, ask: float = 0.0) -> int:
+        if price <= 0:
+            return 0
+        last = self.last_price
+        sign = classify(price, bid, ask, last, self.last_sign)
+        self._ts.append(ts)
+        self._pv.append(self._pv[-1] + price * size)
+        self._v.append(self._v[-1] + size)
+        self._sv.append(self._sv[-1] + sign * size)
+        self._r2.append(self._r2[-1] + (math.log(price / last) ** 2 if last > 0 else 0.0))
+        self.last_price = price
+        self.last_sign = sign
+        self.trades += 1
+        self.expire(ts)
+        return sign
+
+    def expire(self, now: float) -> None:
+        ts = self._ts
+        n = len(ts)
+        start = self._start
+        for k, w in enumerate(self.windows):
+            i = start[k]
+            cutoff = now - w
+            while i < n and ts[i] <= cutoff:
+                i += 1
+            start[k] = i
+        drop = start[-1]
+        if drop >= 1024 and drop * 2 >= n:
+            self._compact(drop)
+
+    def _compact(self, drop: int) -> None:
+        # trim trades no window can see and rebase the prefix sums
+        del self._ts[:drop]
+        for name in ("_pv", "_v", "_sv", "_r2"):
+            c = getattr(self, name)
+            base = c[drop]
+            setattr(self, name, [x - base for x in c[drop:]])
+        self._start = [i - drop for i in self._start]
+
+    def _range(self, window: float | None, now: float | None) -> Tuple[int, int]:
+        k = len(self.windows) - 1 if window is None else self._slot[float(window)]
+        self.expire(clock.now() if now is None else now)
+        return self._start[k], len(self._ts)
+
+    def count(self, window: float | None = None, now: float | None = None) -> int:
+        i, n = self._range(window, now)
+        return n - i
+
+    def volume(self, window: float | None = None, now: float | None = None) -> float:
+        i, n = self._range(window, now)
+        return self._v[n] - self._v[i]
+
+    def signed_volume(self, window: float | None = None, now: float | None = None) -> float:
+        i, n = self._range(window, now)
+        return self._sv[n] - self._sv[i]
+
+    def vwap(self, window: float | None = None, now: float | None = None) -> float:
+        i, n = self._range(window, now)
+        v = self._v[n] - self._v[i]
+        if v <= 0:
+            return 0.0
+        return (self._pv[n] - self._pv[i]) / v
+
+    def imbalance(self, window: float | None = None, now: float | None = None) -> float:
+        # signed volume / volume, in [-1, 1]
+        i, n = self._range(window, now)
+        v = self._v[n] - self._v[i]
+        if v <= 0:
+            return 0.0
+        return max(-1.0, min(1.0, (self._sv[n] - self._sv[i]) / v))
+
+    def realized_vol(self, window: float | None = None, now: float | None = None) -> float:
+        # sqrt of summed squared trade-to-trade log returns inside the window
+        i, n = self._range(window, now)
+        return math.sqrt(max(0.0, self._r2[n] - self._r2[i]))